@@ -0,0 +1,239 @@
+# headless_logger.py
+
+# Headless acquisition and logging daemon. Runs the same connection, polling, decoding and logging
+# code as main_gui.py without importing PyQt5, for in-car use on a Raspberry Pi or a closed laptop.
+#
+# Usage: python headless_logger.py [-c headless.ini]
+#
+# Signals:
+#   SIGINT / SIGTERM  Stop polling, close the log and disconnect.
+#   SIGHUP            Close the current log and continue in a new numbered file.
+#   SIGUSR1           Toggle logging on/off while polling continues.
+
+import argparse
+import configparser
+import os
+import signal
+import time
+
+from lib.data_manager import DataManager
+from lib.channel_decoder import ChannelDecoder
+from lib.data_logger import CsvLogger, next_log_filename
+from lib.transport_timing import TransportProfile
+from lib.engine_simulator import EngineSimulator
+from lib.timeseries_store import TimeSeriesStore
+from lib.trigger_capture import TriggerCapture, pre_trigger_capacity
+from lib.alarms import AlarmEngine
+from lib.diagnostics import configure as configure_diagnostics
+
+DEFAULT_CONFIG_PATH = "headless.ini"
+
+DEFAULT_CONFIG = {
+    "source": {
+        "type": "mock_can",  # real_can, mock_can or offline_edit
+        "interface": "usb2can",
+        "channel": "can0",
+        "bitrate": "500000",
+        "ram_dump_path": "ram/calram.bin",
+        "reconnect_interval_s": "5",
+        "symbol_map_path": "",  # Firmware symbol map for definitions that name symbols, see lib/symbol_map.py
+        # Real-bus timing for the file sources, see lib/transport_timing.py
+        "emulate_transport": "no",
+        "emulate_bitrate": "500000",
+        "emulate_latency_ms": "2",
+        "emulate_drop_rate": "0",
+        # Seeded engine model for the mock_can source, see lib/engine_simulator.py
+        "simulate_engine": "no",
+        "simulate_rate_hz": "100",
+        "simulate_seed": "0",
+        # Read BROADCAST_DEFINITIONS channels from the ECU's broadcast frames instead of polling them
+        "listen_broadcast": "no",
+    },
+    "logging": {
+        "log_dir": "logs",
+        "poll_interval_ms": "100",
+        "autostart": "yes",
+        "trigger_capture": "no",  # Also write LOG_TRIGGERS event logs, see lib/trigger_capture.py
+    },
+}
+
+
+def load_config(path):
+    config = configparser.ConfigParser()
+    config.read_dict(DEFAULT_CONFIG)
+    if path and os.path.exists(path):
+        config.read(path)
+        print(f"Headless: Loaded config from {path}")
+    else:
+        print(f"Headless: Config file {path} not found, using defaults.")
+    return config
+
+
+class HeadlessLogger:
+    def __init__(self, config):
+        self.config = config
+        self.diagnostics = configure_diagnostics()
+        self.data_manager = DataManager()
+        symbol_map_path = config.get("source", "symbol_map_path")
+        if symbol_map_path: # Must resolve definition symbols before the decoder splits them
+            self.data_manager.load_symbol_map(symbol_map_path)
+        self.decoder = ChannelDecoder()
+        self.data_logger = CsvLogger()
+
+        self.poll_interval = config.getint("logging", "poll_interval_ms") / 1000.0
+        self.log_dir = config.get("logging", "log_dir")
+        self.logging_enabled = config.getboolean("logging", "autostart")
+        self.reconnect_interval = config.getfloat("source", "reconnect_interval_s")
+        self.alarms = AlarmEngine() # Raised and cleared alarms go to the console and the log's Alarms column
+        self.trigger_capture = None
+        self.timeseries = None # Recent history for the pre-trigger window, only kept while triggers are armed
+        if config.getboolean("logging", "trigger_capture"):
+            self.timeseries = TimeSeriesStore(capacity=pre_trigger_capacity(self.poll_interval), tiers=None)
+            self.trigger_capture = TriggerCapture(self.timeseries, poll_interval_s=self.poll_interval, log_dir=self.log_dir)
+
+        self._running = False
+        self._rotate_requested = False
+        self._toggle_requested = False
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        # SIGHUP and SIGUSR1 do not exist on Windows
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self._handle_rotate)
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, self._handle_toggle)
+
+    # Signal handlers only set flags, the poll loop acts on them between ticks
+    def _handle_stop(self, signum, frame):
+        self._running = False
+
+    def _handle_rotate(self, signum, frame):
+        self._rotate_requested = True
+
+    def _handle_toggle(self, signum, frame):
+        self._toggle_requested = True
+
+    def connect(self):
+        source = self.config["source"]
+        source_type = source.get("type")
+        if source_type == "real_can":
+            connected = self.data_manager.connect_source(
+                "real_can",
+                interface=source.get("interface"),
+                channel=source.get("channel"),
+                bitrate=source.getint("bitrate"),
+                listen_broadcast=source.getboolean("listen_broadcast")
+            )
+        else:
+            transport_profile = None
+            if source.getboolean("emulate_transport"):
+                transport_profile = TransportProfile(
+                    bitrate=source.getint("emulate_bitrate"),
+                    request_latency_s=source.getfloat("emulate_latency_ms") / 1000.0,
+                    drop_rate=source.getfloat("emulate_drop_rate")
+                )
+            engine_simulator = None
+            if source.getboolean("simulate_engine"):
+                engine_simulator = EngineSimulator(seed=source.getint("simulate_seed"),
+                                                   rate_hz=source.getfloat("simulate_rate_hz"))
+            connected = self.data_manager.connect_source(source_type, ram_dump_path=source.get("ram_dump_path"),
+                                                         transport_profile=transport_profile,
+                                                         engine_simulator=engine_simulator,
+                                                         listen_broadcast=source.getboolean("listen_broadcast"))
+
+        if not connected:
+            print(f"Headless: Connection failed: {self.data_manager.last_error}")
+        else:
+            self.decoder.reset() # Integrals and rates do not span the time the source was away
+            self.alarms.reset()
+        return connected
+
+    def start_log(self):
+        log_filename = next_log_filename(self.log_dir)
+        self.data_logger.open(log_filename)
+        print(f"Headless: Logging started to: {log_filename}")
+
+    def stop_log(self):
+        if self.data_logger.is_open:
+            print(f"Headless: Logging stopped ({self.data_logger.filename}).")
+            self.data_logger.close()
+
+    def run(self):
+        self._running = True
+        next_tick = time.monotonic()
+
+        while self._running:
+            if not self.data_manager.is_connected():
+                self.stop_log()
+                if not self.connect():
+                    self._sleep(self.reconnect_interval)
+                    continue
+                next_tick = time.monotonic()
+
+            if self._toggle_requested:
+                self._toggle_requested = False
+                self.logging_enabled = not self.logging_enabled
+                if not self.logging_enabled:
+                    self.stop_log()
+            if self._rotate_requested:
+                self._rotate_requested = False
+                self.stop_log()
+
+            if self.logging_enabled and not self.data_logger.is_open:
+                try:
+                    self.start_log()
+                except IOError as e:
+                    print(f"Headless: Failed to open log file: {e}")
+                    self.logging_enabled = False
+
+            self.diagnostics.flush() # Report messages the rate limiter held back
+            if self.data_manager.is_responding():
+                sample = self.decoder.poll(self.data_manager)
+                self.alarms.process(sample)
+                if self.data_logger.is_open:
+                    self.data_logger.write_sample(sample)
+                if self.trigger_capture is not None:
+                    self.timeseries.append_sample(sample)
+                    self.trigger_capture.process(sample)
+            # Otherwise the ECU is not answering; ticks are skipped until the background probe gets a response
+
+            # Fixed-rate schedule; if a tick overruns, start the next one immediately instead of drifting
+            next_tick += self.poll_interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._sleep(delay)
+            else:
+                next_tick = time.monotonic()
+
+        self.shutdown()
+
+    def _sleep(self, seconds):
+        # Sleep in short slices so a stop signal is acted on promptly
+        end = time.monotonic() + seconds
+        while self._running:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, 0.2))
+
+    def shutdown(self):
+        self.stop_log()
+        if self.trigger_capture is not None:
+            self.trigger_capture.close()
+        self.data_manager.shutdown()
+        print("Headless: Stopped.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless T6e acquisition and logging daemon.")
+    parser.add_argument("-c", "--config", default=DEFAULT_CONFIG_PATH, help="Path to the INI config file.")
+    args = parser.parse_args()
+
+    headless = HeadlessLogger(load_config(args.config))
+    headless.install_signal_handlers()
+    headless.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# lib/alarms.py
+
+# Alarm engine evaluated on every polled sample. Each alarm in ALARM_DEFINITIONS has a raise rule and, for
+# hysteresis, an optional clear rule (e.g. raise above 110 °C, clear below 105 °C; without one it clears when the
+# raise rule stops holding). on_delay_s is how long the raise rule must hold before the alarm goes active
+# (debounce, or a duration condition such as "lean for 2 s"); off_delay_s likewise for clearing. All rules are
+# compiled into two lib.conditions.ConditionSets and the state machine runs on arrays, so the cost per sample
+# barely moves with the number of alarms.
+
+import numpy as np
+
+from lib.conditions import ConditionSet
+from lib.diagnostics import get_logger
+from lib.ecu_definitions import ALARM_DEFINITIONS, ECU_DEFINITIONS
+
+log = get_logger("alarms")
+
+SEVERITIES = ("warning", "critical")
+
+
+class AlarmChange:
+    def __init__(self, name, severity, active, timestamp):
+        self.name = name
+        self.severity = severity
+        self.active = active # True when raised, False when cleared
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f"AlarmChange({self.name!r}, {'raised' if self.active else 'cleared'})"
+
+
+class AlarmEngine:
+    def __init__(self, alarms=None, definitions=None):
+        self.alarms = alarms if alarms is not None else ALARM_DEFINITIONS
+        definitions = definitions if definitions is not None else ECU_DEFINITIONS
+        for alarm in self.alarms:
+            if alarm.get("severity", "warning") not in SEVERITIES:
+                raise ValueError(f"Alarm '{alarm['name']}' has unknown severity '{alarm['severity']}'.")
+
+        self.names = [a["name"] for a in self.alarms]
+        self.severities = [a.get("severity", "warning") for a in self.alarms]
+        self._raise_rules = ConditionSet([a["when"] for a in self.alarms], definitions)
+        self._has_clear = np.array(["clear_when" in a for a in self.alarms], dtype=bool)
+        self._clear_rules = ConditionSet([a["clear_when"] for a in self.alarms if "clear_when" in a], definitions)
+        self._on_delay = np.array([a.get("on_delay_s", 0.0) for a in self.alarms])
+        self._off_delay = np.array([a.get("off_delay_s", 0.0) for a in self.alarms])
+
+        count = len(self.alarms)
+        self.active = np.zeros(count, dtype=bool)
+        self._raise_since = np.full(count, np.nan) # When the raise rule started holding for an inactive alarm
+        self._clear_since = np.full(count, np.nan) # When the clear rule started holding for an active alarm
+
+    def process(self, sample):
+        """Updates alarm states from one sample, sets sample.alarms to the active names and returns the AlarmChanges."""
+        if not self.alarms:
+            sample.alarms = ()
+            return []
+        t = sample.timestamp
+        raising = self._raise_rules.evaluate(sample)
+        clearing = ~raising
+        if self._has_clear.any():
+            clearing[self._has_clear] = self._clear_rules.evaluate(sample)
+
+        raised = self._settle(~self.active & raising, self._raise_since, self._on_delay, t)
+        cleared = self._settle(self.active & clearing, self._clear_since, self._off_delay, t)
+        changes = []
+        if raised.any() or cleared.any():
+            self.active = (self.active | raised) & ~cleared
+            self._raise_since[raised] = np.nan
+            self._clear_since[cleared] = np.nan
+            for i in np.flatnonzero(raised | cleared):
+                change = AlarmChange(self.names[i], self.severities[i], bool(raised[i]), t)
+                changes.append(change)
+                if change.active:
+                    (log.error if change.severity == "critical" else log.warning)("Alarm raised: %s", change.name)
+                else:
+                    log.info("Alarm cleared: %s", change.name)
+        sample.alarms = self.active_names()
+        return changes
+
+    @staticmethod
+    def _settle(candidate, since, delay, t):
+        """Tracks how long each candidate has held; True where it has held for its delay."""
+        since[~candidate] = np.nan
+        since[candidate & np.isnan(since)] = t
+        return candidate & (t - since >= delay)
+
+    def active_names(self):
+        return tuple(self.names[i] for i in np.flatnonzero(self.active))
+
+    def active_severity(self):
+        """'critical' if any critical alarm is active, else 'warning' if any alarm is, else None."""
+        severities = {self.severities[i] for i in np.flatnonzero(self.active)}
+        return "critical" if "critical" in severities else ("warning" if severities else None)
+
+    def reset(self):
+        self.active[:] = False
+        self._raise_since[:] = np.nan
+        self._clear_since[:] = np.nan
+        self._raise_rules.reset()
+        self._clear_rules.reset()
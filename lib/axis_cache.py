@@ -0,0 +1,63 @@
+# lib/axis_cache.py
+
+# Session cache of maptable axes. Many maps share their breakpoints (the same RPM axis block feeds VE, timing
+# and airmass), so axes are keyed by (address, length, element size, scale, offset): each raw block is read once
+# and each decoding computed once, then shared by every map using it. The DataManager drops entries whose bytes
+# are written, so an edited axis is read again on the next load.
+
+import threading
+
+from lib.map_codec import axis_block, decode_block
+
+
+class AxisCache:
+    def __init__(self):
+        self._lock = threading.Lock() # Loads run on the map loader thread and, synchronously, on the GUI thread
+        self._raw = {}     # (address, length) -> raw bytes
+        self._decoded = {} # (address, length, element_size, scale, offset) -> read-only scaled array
+        self.reads = 0     # Axis blocks read from the bus
+        self.hits = 0      # Axis lookups served without a read
+
+    def axis(self, definition, axis, read_block):
+        """
+        Decoded axis ('x_axis' or 'y_axis') of a maptable, read with read_block(address, length) only if no map
+        has read that block yet. Returns None if the map has no such axis or the read fails.
+        """
+        block = axis_block(definition, axis)
+        if block is None:
+            return None
+        address, length, element_size, scale, offset = block
+        with self._lock:
+            decoded = self._decoded.get(block)
+            raw = self._raw.get((address, length))
+        if decoded is not None:
+            self.hits += 1
+            return decoded
+
+        if raw is None:
+            raw = read_block(address, length)
+            if raw is None or len(raw) != length:
+                return None
+            self.reads += 1
+        else:
+            self.hits += 1
+        decoded = decode_block(raw, element_size, scale, offset)
+        decoded.flags.writeable = False # Shared between maps
+        with self._lock:
+            self._raw[(address, length)] = bytes(raw)
+            self._decoded[block] = decoded
+        return decoded
+
+    def invalidate(self, address, data):
+        """Write listener: drops every cached axis the written bytes overlap."""
+        end = address + len(data)
+        with self._lock:
+            for key in [k for k in self._raw if k[0] < end and address < k[0] + k[1]]:
+                del self._raw[key]
+            for key in [k for k in self._decoded if k[0] < end and address < k[0] + k[1]]:
+                del self._decoded[key]
+
+    def clear(self):
+        with self._lock:
+            self._raw.clear()
+            self._decoded.clear()
@@ -0,0 +1,124 @@
+# lib/broadcast_decoder.py
+
+# Passive decoding of the frames the ECU broadcasts on the powertrain bus. BROADCAST_DEFINITIONS describes them the
+# way a DBC file does: a frame ID and cycle time per message, and per signal a start bit, length, byte order,
+# signedness, scale and offset. Decoded signals are kept as the latest value per channel; while a channel is fresh
+# (received within its message's timeout) the channel decoder takes it from here instead of polling it, so it
+# costs no bus bandwidth. A channel whose frames stop arriving goes stale and is polled again.
+#
+# Bit numbering follows DBC: for little_endian (Intel) signals start_bit is the least significant bit, counted
+# from bit 0 of byte 0; for big_endian (Motorola) signals it is the most significant bit, with bit 7 of byte 0
+# being the first bit on the wire.
+
+import threading
+import time
+
+from lib.ecu_definitions import BROADCAST_DEFINITIONS
+
+DEFAULT_TIMEOUT_CYCLES = 3 # A message is stale after this many missed cycles, unless it sets "timeout_ms"
+MIN_TIMEOUT_S = 0.1
+
+
+class _Signal:
+    def __init__(self, spec):
+        self.channel = spec["channel"]
+        self.length = spec["length"]
+        self.little_endian = spec.get("byte_order", "little_endian") == "little_endian"
+        self.signed = spec.get("signed", False)
+        self.scale = spec.get("scale", 1.0)
+        self.offset = spec.get("offset", 0.0)
+        start_bit = spec["start_bit"]
+        if self.little_endian:
+            self.shift = start_bit # Position of the LSB in the frame read as a little-endian 64-bit integer
+        else:
+            msb = (7 - start_bit // 8) * 8 + start_bit % 8 # Position of the MSB in the frame read big-endian
+            self.shift = msb - self.length + 1
+        if not 1 <= self.length <= 64 or self.shift < 0 or self.shift + self.length > 64:
+            raise ValueError(f"Signal '{self.channel}' does not fit in an 8-byte frame.")
+        self.mask = (1 << self.length) - 1
+
+    def decode(self, frame_le, frame_be):
+        raw = ((frame_le if self.little_endian else frame_be) >> self.shift) & self.mask
+        if self.signed and raw >> (self.length - 1):
+            raw -= 1 << self.length
+        return raw * self.scale + self.offset
+
+    def encode(self, value):
+        """Bits of value placed in the 64-bit frame integer of this signal's byte order."""
+        raw = int(round((value - self.offset) / self.scale))
+        low, high = (-(1 << (self.length - 1)), (1 << (self.length - 1)) - 1) if self.signed else (0, self.mask)
+        return (min(max(raw, low), high) & self.mask) << self.shift
+
+
+class BroadcastMessage:
+    def __init__(self, spec):
+        self.name = spec.get("name", f"0x{spec['frame_id']:X}")
+        self.frame_id = spec["frame_id"]
+        self.cycle_s = spec.get("cycle_ms", 100) / 1000.0
+        self.timeout_s = spec["timeout_ms"] / 1000.0 if "timeout_ms" in spec else max(MIN_TIMEOUT_S, DEFAULT_TIMEOUT_CYCLES * self.cycle_s)
+        self.signals = [_Signal(s) for s in spec["signals"]]
+
+    def decode(self, data):
+        """{channel: value} of every signal in one frame's data."""
+        data = bytes(data).ljust(8, b"\0")
+        frame_le = int.from_bytes(data, 'little')
+        frame_be = int.from_bytes(data, 'big')
+        return {signal.channel: signal.decode(frame_le, frame_be) for signal in self.signals}
+
+    def encode(self, values):
+        """Frame data carrying values ({channel: value}); signals without a value are left zero."""
+        frame_le = frame_be = 0
+        for signal in self.signals:
+            value = values.get(signal.channel)
+            if value is None:
+                continue
+            if signal.little_endian:
+                frame_le |= signal.encode(value)
+            else:
+                frame_be |= signal.encode(value)
+        return bytes(a | b for a, b in zip(frame_le.to_bytes(8, 'little'), frame_be.to_bytes(8, 'big')))
+
+
+class BroadcastDecoder:
+    def __init__(self, messages=None):
+        specs = messages if messages is not None else BROADCAST_DEFINITIONS
+        self.messages = {}
+        for spec in specs:
+            message = BroadcastMessage(spec)
+            if message.frame_id in self.messages:
+                raise ValueError(f"Broadcast frame 0x{message.frame_id:X} is defined twice.")
+            self.messages[message.frame_id] = message
+        self._lock = threading.Lock()
+        self._latest = {}      # channel -> (value, monotonic receive time, timeout)
+        self.frame_counts = {} # frame ID -> frames decoded, for diagnostics
+
+    @property
+    def frame_ids(self):
+        return list(self.messages)
+
+    @property
+    def channels(self):
+        return [signal.channel for message in self.messages.values() for signal in message.signals]
+
+    def on_frame(self, frame_id, data):
+        """Decodes one received frame. Frames with IDs not in the definitions are ignored. Thread safe."""
+        message = self.messages.get(frame_id)
+        if message is None:
+            return
+        received = time.monotonic()
+        decoded = message.decode(data)
+        with self._lock:
+            for channel, value in decoded.items():
+                self._latest[channel] = (value, received, message.timeout_s)
+            self.frame_counts[frame_id] = self.frame_counts.get(frame_id, 0) + 1
+
+    def values(self, now=None):
+        """{channel: value} of every channel received within its message's timeout."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return {channel: value for channel, (value, received, timeout) in self._latest.items() if now - received <= timeout}
+
+    def reset(self):
+        with self._lock:
+            self._latest.clear()
+            self.frame_counts.clear()
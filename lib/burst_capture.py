@@ -0,0 +1,154 @@
+# lib/burst_capture.py
+
+# Burst capture: polls one or a few definitions back to back, as fast as the transport answers, for a set duration,
+# to catch transients the 100 ms poll misses (per-cylinder knock during tip-in, injector pulse steps). The loop only
+# reads and copies raw bytes into a preallocated array; decoding runs once at the end, vectorized over all rows.
+# Normal polling should be paused while a burst runs so the two do not share the bus.
+
+import csv
+import threading
+import time
+
+import numpy as np
+
+from lib.channel_decoder import GAUGE_TYPES, table_channel_name
+
+DEFAULT_DURATION_S = 2.0
+MAX_SAMPLES = 200000 # Preallocated rows; a burst ends early when they are used up
+
+
+def burst_capable(definition):
+    """Polled gauges with plain scaling and 1D tables. Formula channels need other channels and are not captured."""
+    if "address" not in definition or "length" not in definition:
+        return False
+    if definition.get("type") in GAUGE_TYPES:
+        return "calculation" not in definition
+    return definition.get("type") == "table"
+
+
+def _big_endian(block):
+    """Unsigned integers from the rows of a (samples, bytes) uint8 array."""
+    values = np.zeros(len(block), dtype=np.int64)
+    for column in range(block.shape[1]):
+        values = (values << 8) | block[:, column]
+    return values
+
+
+class BurstResult:
+    def __init__(self, times, channels, values, ok, duration_s):
+        self.times = times           # Seconds since the burst started, at the end of each row's reads
+        self.channels = channels     # (definition description, channel name) per column of values
+        self.values = values         # (samples, channels), NaN for rows with a failed read
+        self.ok = ok                 # True for rows where every read succeeded
+        self.duration_s = duration_s
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def failed_count(self):
+        return int(len(self.ok) - self.ok.sum())
+
+    @property
+    def rate_hz(self):
+        """Rows completed per second of burst."""
+        return len(self.times) / self.duration_s if self.duration_s > 0 else 0.0
+
+    def interval_stats(self):
+        """(mean, standard deviation, min, max) of the time between consecutive rows, in seconds. Jitter is the std."""
+        if len(self.times) < 2:
+            return (float("nan"),) * 4
+        intervals = np.diff(self.times)
+        return float(intervals.mean()), float(intervals.std()), float(intervals.min()), float(intervals.max())
+
+    def summary(self):
+        mean, jitter, shortest, longest = self.interval_stats()
+        text = f"{len(self)} samples in {self.duration_s:.2f} s ({self.rate_hz:.0f} Hz)"
+        if len(self) >= 2:
+            text += (f", interval {mean * 1000:.2f} ms, jitter {jitter * 1000:.2f} ms "
+                     f"(min {shortest * 1000:.2f}, max {longest * 1000:.2f})")
+        if self.failed_count:
+            text += f", {self.failed_count} failed"
+        return text
+
+    def save_csv(self, filename):
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Time"] + [name for _, name in self.channels])
+            for t, row in zip(self.times.tolist(), self.values.tolist()):
+                writer.writerow([f"{t:.6f}"] + ["N/A" if v != v else f"{v:.2f}" for v in row])
+
+
+class BurstCapture:
+    def __init__(self, definitions, duration_s=DEFAULT_DURATION_S, max_samples=MAX_SAMPLES):
+        if not definitions:
+            raise ValueError("Burst capture needs at least one definition.")
+        unsupported = [d.get("description") for d in definitions if not burst_capable(d)]
+        if unsupported:
+            raise ValueError(f"Cannot burst capture: {', '.join(map(str, unsupported))}")
+        self.definitions = list(definitions)
+        self.duration_s = duration_s
+
+        self._reads = [] # (address, length, byte offset in a row)
+        offset = 0
+        for definition in self.definitions:
+            self._reads.append((definition["address"], definition["length"], offset))
+            offset += definition["length"]
+        self._raw = np.zeros((max_samples, offset), dtype=np.uint8)
+        self._times = np.empty(max_samples)
+        self._ok = np.zeros(max_samples, dtype=bool)
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Ends a running burst after the current row. Safe to call from another thread."""
+        self._stop.set()
+
+    def run(self, data_manager):
+        """Polls until the duration has passed, the rows are used up, stop() is called or the ECU stops answering."""
+        self._stop.clear()
+        read, raw, times, ok = data_manager.read_data, self._raw, self._times, self._ok
+        reads = self._reads
+        capacity = len(times)
+        start = time.perf_counter()
+        deadline = start + self.duration_s
+        count = 0
+        now = start
+        while count < capacity and not self._stop.is_set():
+            row_ok = True
+            for address, length, offset in reads:
+                data = read(address, length)
+                if data is None or len(data) != length:
+                    row_ok = False
+                    break
+                raw[count, offset:offset + length] = np.frombuffer(data, dtype=np.uint8)
+            now = time.perf_counter()
+            times[count] = now - start
+            ok[count] = row_ok
+            count += 1
+            if now >= deadline or not data_manager.is_responding():
+                break
+        return self._decode(count, now - start)
+
+    def _decode(self, count, duration_s):
+        raw = self._raw[:count]
+        channels, columns = [], []
+        for definition, (_, length, offset) in zip(self.definitions, self._reads):
+            description = definition["description"]
+            block = raw[:, offset:offset + length]
+            scale = definition.get("scale", 1.0)
+            if definition.get("type") == "table":
+                element_size = definition.get("element_size", 1)
+                offsets = definition.get("offset", [])
+                for index, column_name in enumerate(definition["columns"]):
+                    element = block[:, index * element_size:(index + 1) * element_size]
+                    column_offset = offsets[index] if isinstance(offsets, list) and index < len(offsets) else 0
+                    channels.append((description, table_channel_name(description, column_name)))
+                    columns.append(_big_endian(element) * scale + column_offset)
+            else:
+                channels.append((description, description))
+                columns.append(_big_endian(block) * scale + definition.get("offset", 0))
+
+        values = np.column_stack(columns) if columns else np.empty((count, 0))
+        ok = self._ok[:count].copy()
+        values[~ok] = np.nan
+        return BurstResult(self._times[:count].copy(), channels, values, ok, duration_s)
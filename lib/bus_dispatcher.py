@@ -0,0 +1,192 @@
+# lib/bus_dispatcher.py
+
+# Single reader thread for a python-can bus. Every received frame goes through one dispatcher: broadcast frames to
+# a handler, response frames to the request waiting for them. The ECU's responses carry no request ID, so one
+# request is outstanding at a time: requests from several threads queue for their turn, and each response frame is
+# matched to the outstanding request by the DLC it expects next (4/2/1 for word/half/byte reads, 8 then the
+# remainder for buffer reads). A frame that no request expects is an orphan and is discarded.
+#
+# A request that times out stays as a ghost for a grace period, and the next request is not sent until the ghost
+# has absorbed its late frames or expired. A late answer is then never taken as the answer to a newer request, and
+# a dropped answer costs one timeout rather than every request after it. An answer arriving after the grace period
+# cannot be told apart from the next response; it is taken as that response only if the next request expects the
+# same DLC. Sends that expect no response (writes) take the same turn, and multi-frame sends (buffer writes) go out
+# without other frames in between.
+
+import threading
+import time
+
+from lib.diagnostics import get_logger
+
+log = get_logger("bus")
+
+RESPONSE_TIMEOUT_S = 1.0 # A request fails when no response frame has been matched for this long
+GHOST_GRACE_S = 0.5      # How long a timed-out request keeps absorbing its late frames, holding off the next request
+POLL_INTERVAL_S = 0.1    # Reader thread wake-up interval while the bus is idle
+
+
+class BusClosed(Exception):
+    pass
+
+
+class PendingRequest:
+    """A request's expected response frames and, once complete, their data. Returned by BusDispatcher.submit."""
+    def __init__(self, expected_dlcs, label):
+        self.expected = list(expected_dlcs)
+        self.label = label
+        self.data = bytearray()
+        self.error = None
+        self.ghost_until = None # Set when the requester gave up; the request then only absorbs frames
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def _finish(self, error=None):
+        self.error = error
+        self._done.set()
+
+
+class BusDispatcher:
+    def __init__(self, bus, response_id, frame_handler=None, ghost_grace_s=GHOST_GRACE_S):
+        self.bus = bus
+        self.response_id = response_id
+        self.frame_handler = frame_handler # Called with (arbitration ID, data) for every non-response frame
+        self.ghost_grace_s = ghost_grace_s
+        self._lock = threading.Lock()      # Guards the outstanding request and sending
+        self._settled = threading.Condition(self._lock) # Notified when a ghost completes
+        self._outstanding = None           # The request awaiting response frames, or a ghost
+        self._turn = threading.BoundedSemaphore(1) # Held from submit() until result() returns, and during send()
+        self._last_progress = time.monotonic() # When a response frame was last matched
+        self._stop = threading.Event()
+        self._thread = None
+        self.orphan_count = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._read_loop, name="can-reader", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stops the reader thread and fails the outstanding request. The bus itself is left open."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        with self._lock:
+            request, self._outstanding = self._outstanding, None
+            if request is not None and not request.done:
+                request._finish(BusClosed("CAN bus closed"))
+            self._settled.notify_all()
+
+    def send(self, *messages):
+        """
+        Sends frames that expect no response, back to back. They take a turn like a request, so they never go out
+        while a request, or the ghost of one, is waiting for its response.
+        """
+        if self._stop.is_set():
+            raise BusClosed("CAN bus closed")
+        with self._turn:
+            with self._lock:
+                self._wait_for_ghost_locked()
+                for message in messages:
+                    self.bus.send(message)
+
+    def submit(self, message, expected_dlcs, label="request"):
+        """
+        Sends a request once no other request is outstanding and returns its PendingRequest; pass it to result() to
+        wait for the response. Every submit() must be followed by result(), which hands the turn to the next request.
+        """
+        if self._stop.is_set():
+            raise BusClosed("CAN bus closed")
+        self._turn.acquire()
+        request = PendingRequest(expected_dlcs, label)
+        try:
+            with self._lock:
+                self._wait_for_ghost_locked()
+                self._outstanding = request
+                self._last_progress = time.monotonic()
+                self.bus.send(message)
+        except Exception:
+            self._abandon(request)
+            raise
+        return request
+
+    def result(self, request, timeout=RESPONSE_TIMEOUT_S):
+        """
+        Waits for a submitted request's response data. Raises TimeoutError when no response frame was matched for
+        timeout seconds, BusClosed if the bus closes.
+        """
+        try:
+            while not request._done.wait(timeout=min(timeout, POLL_INTERVAL_S)):
+                if time.monotonic() - self._last_progress >= timeout:
+                    raise TimeoutError(f"No response to {request.label}")
+            if request.error is not None:
+                raise request.error
+            return bytes(request.data)
+        finally:
+            self._abandon(request)
+
+    def request(self, message, expected_dlcs, label="request", timeout=RESPONSE_TIMEOUT_S):
+        return self.result(self.submit(message, expected_dlcs, label), timeout)
+
+    def _abandon(self, request):
+        """Hands the turn to the next request; an unfinished outstanding request becomes a ghost."""
+        with self._lock:
+            if request.ghost_until is not None:
+                return
+            if request is self._outstanding and not request.done:
+                request.ghost_until = time.monotonic() + self.ghost_grace_s
+            else:
+                request.ghost_until = 0.0 # Marks the turn as handed on
+        self._turn.release()
+
+    def _wait_for_ghost_locked(self):
+        """Waits until a ghost left by a timed-out request has completed or expired."""
+        while self._outstanding is not None:
+            if self._stop.is_set():
+                raise BusClosed("CAN bus closed")
+            remaining = self._outstanding.ghost_until - time.monotonic()
+            if remaining <= 0:
+                self._outstanding = None
+                break
+            self._settled.wait(timeout=min(remaining, POLL_INTERVAL_S))
+
+    def _read_loop(self):
+        while not self._stop.is_set():
+            try:
+                message = self.bus.recv(timeout=POLL_INTERVAL_S)
+            except Exception as e:
+                if self._stop.is_set():
+                    return
+                log.warning("CAN receive error: %s", e)
+                time.sleep(POLL_INTERVAL_S)
+                continue
+            if message is None:
+                continue
+            if message.arbitration_id != self.response_id:
+                if self.frame_handler is not None:
+                    try:
+                        self.frame_handler(message.arbitration_id, message.data)
+                    except Exception as e:
+                        log.error("Error handling frame 0x%X: %s", message.arbitration_id, e)
+                continue
+            self._on_response(message)
+
+    def _on_response(self, message):
+        with self._lock:
+            request = self._outstanding
+            if request is not None and request.ghost_until is not None and time.monotonic() >= request.ghost_until:
+                request = self._outstanding = None # Expired ghost: its answer is not coming
+            if request is not None and request.expected and request.expected[0] == message.dlc:
+                request.expected.pop(0)
+                request.data.extend(message.data[:message.dlc])
+                self._last_progress = time.monotonic()
+                if not request.expected:
+                    self._outstanding = None
+                    if request.ghost_until is None:
+                        request._finish()
+                    else:
+                        self._settled.notify_all() # A late answer completed the ghost, the next request may go
+                return
+            self.orphan_count += 1
+        log.warning("Discarded orphan response frame (DLC %d)", message.dlc)
@@ -2,27 +2,28 @@
 
 import can
 
+from lib.bus_dispatcher import BusClosed, BusDispatcher
+from lib.memory_zones import ZONES
+from lib.transport_timing import MAX_BUFFER_CHUNK
+
 BO_BE = 'big'
+RESPONSE_ID = 0x7A0 # The ECU answers every request on this ID
 
 class ECUException(Exception):
     """Custom exception for ECU communication errors."""
     pass
 
 class LiveTuningAccess: # Handles DMA over canbus
-    zones = [
-        ("T6: L0-L1 (Bootloader)", 0x00000000, 0x010000, "bootldr.bin"), # Don't touch
-        ("T6: L2 (Learned)"      , 0x00010000, 0x00C000, "decram.bin"), # Adaptation values
-        ("T6: L3 (Coding)"       , 0x0001C000, 0x004000, "coding.bin"), # Coding values
-        ("T6: L4 (Calibration)"  , 0x00020000, 0x010000, "calrom.bin"), # Calibration (tuning) values
-        ("T6: M0-H3 (Program)"   , 0x00040000, 0x0C0000, "prog.bin"), # Program data, modify for patches
-        ("T6: RAM (Main RAM)"    , 0x40000000, 0x010000, "calram.bin"), # SRAM data
-        ("T6: L0-H3 (Full ROM)"  , 0x00000000, 0x100000, "dump.bin")
-    ]
+    zones = ZONES
 
     def __init__(self):
         self.bus = None
+        self.dispatcher = None    # Reader thread matching responses to requests, while the bus is open
+        self.frame_handler = None # Called with (arbitration ID, data) for received broadcast frames
+        self.concurrent_requests = True # The dispatcher queues requests from several threads itself, one at a time
 
-    def open_can(self, interface, channel, bitrate):
+    def open_can(self, interface, channel, bitrate, broadcast_ids=()):
+        """Opens the bus. broadcast_ids are frame IDs to receive besides responses, for frame_handler."""
         if self.bus is not None:
             self.close_can() # Ensure previous bus is closed
         print(f"Opening CAN bus: {interface} {channel} @ {bitrate//1000:d} kbit/s")
@@ -32,13 +33,15 @@ class LiveTuningAccess: # Handles DMA over canbus
                 channel=channel,
                 can_filters=[{
                     "extended": False,
-                    "can_id": 0x7A0,
+                    "can_id": can_id,
                     "can_mask": 0x7FF
-                }],
+                } for can_id in [RESPONSE_ID, *broadcast_ids]],
                 bitrate=bitrate
             )
             # Workaround for socketcan interface, kept from T4e app
             self.bus._is_filtered = False
+            self.dispatcher = BusDispatcher(self.bus, RESPONSE_ID, frame_handler=self._on_frame)
+            self.dispatcher.start()
             print("CAN bus opened successfully.")
         except Exception as e:
             raise ECUException(f"Failed to open CAN bus: {e}")
@@ -47,12 +50,34 @@ class LiveTuningAccess: # Handles DMA over canbus
         if self.bus is None:
             return
         print("Closing CAN bus.")
+        if self.dispatcher is not None:
+            self.dispatcher.close() # Fails requests still waiting, before the bus goes away
+            self.dispatcher = None
         self.bus.shutdown()
         self.bus = None
 
     def shutdown(self):  # Shutdown method for consistency with DataManager
         self.close_can()
 
+    def _on_frame(self, arbitration_id, data):
+        if self.frame_handler is not None:
+            self.frame_handler(arbitration_id, data)
+
+    def drain_broadcast(self):
+        """Nothing to do: the reader thread hands broadcast frames to frame_handler as they arrive."""
+
+    def _request(self, arbitration_id, payload, expected_dlcs, label):
+        """Sends one read request and returns its response data, matched by the dispatcher."""
+        if self.dispatcher is None:
+            raise ECUException("CAN bus is not open. Cannot read memory.")
+        msg = can.Message(is_extended_id=False, arbitration_id=arbitration_id, data=payload)
+        try:
+            return self.dispatcher.request(msg, expected_dlcs, label)
+        except TimeoutError:
+            raise ECUException(f"{label} failed: No response!")
+        except BusClosed as e:
+            raise ECUException(f"{label} failed: {e}")
+
     def read_memory(self, address, size):
         if self.bus is None:
             raise ECUException("CAN bus is not open. Cannot read memory.")
@@ -63,77 +88,23 @@ class LiveTuningAccess: # Handles DMA over canbus
 
         while bytes_read < original_size:
             # Determine the chunk size for this read.
-            # The maximum buffer read size is 255 bytes per request.
-            chunk_size = min(original_size - bytes_read, 255)
+            # The maximum buffer read size is 255 bytes per request (see lib.transport_timing for the frame model).
+            chunk_size = min(original_size - bytes_read, MAX_BUFFER_CHUNK)
+            chunk_address = (address + bytes_read).to_bytes(4, BO_BE)
 
             if chunk_size == 4:
-                msg = can.Message(
-                    is_extended_id=False, arbitration_id=0x50,
-                    data=(address + bytes_read).to_bytes(4, BO_BE)
-                )
-                self.bus.send(msg)
-                msg = self.bus.recv(timeout=1.0)
-                if msg is None:
-                    raise ECUException("ECU Read Word failed: No response!")
-                if msg.dlc != 4:
-                    raise ECUException(f"ECU Read Word failed: Unexpected answer DLC {msg.dlc} (expected 4)!")
-                data.extend(msg.data)
-                bytes_read += 4
+                data.extend(self._request(0x50, chunk_address, [4], "ECU Read Word"))
             elif chunk_size == 2:
-                msg = can.Message(
-                    is_extended_id=False, arbitration_id=0x51,
-                    data=(address + bytes_read).to_bytes(4, BO_BE)
-                )
-                self.bus.send(msg)
-                msg = self.bus.recv(timeout=1.0)
-                if msg is None:
-                    raise ECUException("ECU Read Half failed: No response!")
-                if msg.dlc != 2:
-                    raise ECUException(f"ECU Read Half failed: Unexpected answer DLC {msg.dlc} (expected 2)!")
-                data.extend(msg.data)
-                bytes_read += 2
+                data.extend(self._request(0x51, chunk_address, [2], "ECU Read Half"))
             elif chunk_size == 1:
-                msg = can.Message(
-                    is_extended_id=False, arbitration_id=0x52,
-                    data=(address + bytes_read).to_bytes(4, BO_BE)
-                )
-                self.bus.send(msg)
-                msg = self.bus.recv(timeout=1.0)
-                if msg is None:
-                    raise ECUException("ECU Read Byte failed: No response!")
-                if msg.dlc != 1:
-                    raise ECUException(f"ECU Read Byte failed: Unexpected answer DLC {msg.dlc} (expected 1)!")
-                data.extend(msg.data)
-                bytes_read += 1
-            elif chunk_size > 0: # Buffer read logic for up to 255 bytes
-                msg = can.Message(
-                    is_extended_id=False, arbitration_id=0x53,
-                    data=(address + bytes_read).to_bytes(4, BO_BE) + chunk_size.to_bytes(1, BO_BE)
-                )
-                self.bus.send(msg)
-                
-                chunk_data = bytearray()
-                sub_chunk_bytes_read = 0
-                while sub_chunk_bytes_read < chunk_size:
-                    expected_dlc = min(8, chunk_size - sub_chunk_bytes_read)
-                    msg = self.bus.recv(timeout=1.0)
-                    if msg is None:
-                        raise ECUException(f"ECU Read Buffer failed: No response for chunk starting at 0x{address + bytes_read:X}!")
-                    
-                    # For the last sub-chunk, dlc might be less than 8
-                    if msg.dlc != expected_dlc and (chunk_size - sub_chunk_bytes_read) > 8:
-                        raise ECUException(f"ECU Read Buffer failed: Unexpected answer DLC {msg.dlc} (expected {expected_dlc}) for chunk starting at 0x{address + bytes_read:X}!")
-                    
-                    chunk_data.extend(msg.data)
-                    sub_chunk_bytes_read += msg.dlc
-                
-                if len(chunk_data) != chunk_size:
-                    raise ECUException(f"ECU Read Buffer failed: Read {len(chunk_data)} bytes, expected {chunk_size} bytes for chunk starting at 0x{address + bytes_read:X}!")
-                
-                data.extend(chunk_data)
-                bytes_read += chunk_size
+                data.extend(self._request(0x52, chunk_address, [1], "ECU Read Byte"))
+            elif chunk_size > 0: # Buffer read logic for up to 255 bytes, answered in 8-byte frames
+                expected_dlcs = [8] * (chunk_size // 8) + ([chunk_size % 8] if chunk_size % 8 else [])
+                data.extend(self._request(0x53, chunk_address + chunk_size.to_bytes(1, BO_BE), expected_dlcs,
+                                          f"ECU Read Buffer at 0x{address + bytes_read:X}"))
             else:
                 break # Should not happen if size is positive
+            bytes_read += chunk_size
 
         if len(data) != original_size:
             raise ECUException(f"ECU Read failed: Read {len(data)} bytes in total, expected {original_size} bytes!")
@@ -141,56 +112,42 @@ class LiveTuningAccess: # Handles DMA over canbus
 
 
     def write_memory(self, address, data, verify=False):
-        if self.bus is None:
+        if self.bus is None or self.dispatcher is None:
             raise ECUException("CAN bus is not open. Cannot write memory.")
 
         total_size = len(data)
         bytes_written = 0
 
         while bytes_written < total_size:
-            chunk_size = min(total_size - bytes_written, 255) # Max 255 bytes per buffer write
+            chunk_size = min(total_size - bytes_written, MAX_BUFFER_CHUNK) # Max 255 bytes per buffer write
 
             current_address = address + bytes_written
             current_data = data[bytes_written : bytes_written + chunk_size]
 
-            if chunk_size == 4:
-                msg = can.Message(
-                    is_extended_id = False, arbitration_id = 0x54,
-                    data = current_address.to_bytes(4, BO_BE) + current_data
-                )
-                self.bus.send(msg)
-            elif chunk_size == 2:
-                msg = can.Message(
-                    is_extended_id = False, arbitration_id = 0x55,
+            if chunk_size in (4, 2, 1):
+                arbitration_id = {4: 0x54, 2: 0x55, 1: 0x56}[chunk_size]
+                messages = [can.Message(
+                    is_extended_id = False, arbitration_id = arbitration_id,
                     data = current_address.to_bytes(4, BO_BE) + current_data
-                )
-                self.bus.send(msg)
-            elif chunk_size == 1:
-                msg = can.Message(
-                    is_extended_id = False, arbitration_id = 0x56,
-                    data = current_address.to_bytes(4, BO_BE) + current_data
-                )
-                self.bus.send(msg)
+                )]
             elif chunk_size > 0:
-                offset_in_chunk = 0
-                # Send initial message with address and total size for this chunk
-                msg = can.Message(
+                # Initial message with address and total size for this chunk, then the data in 8-byte sub-chunks
+                messages = [can.Message(
                     is_extended_id = False, arbitration_id = 0x57,
                     data = current_address.to_bytes(4, BO_BE) + chunk_size.to_bytes(1, BO_BE)
-                )
-                self.bus.send(msg)
-                # Send data in 8-byte sub-chunks for this chunk
-                while(offset_in_chunk < chunk_size):
-                    sub_chunk_size = min(8, chunk_size - offset_in_chunk)
-                    msg = can.Message(
+                )]
+                for offset_in_chunk in range(0, chunk_size, 8):
+                    messages.append(can.Message(
                         is_extended_id = False, arbitration_id = 0x57,
-                        data = current_data[offset_in_chunk : offset_in_chunk + sub_chunk_size]
-                    )
-                    self.bus.send(msg)
-                    offset_in_chunk += sub_chunk_size
+                        data = current_data[offset_in_chunk : offset_in_chunk + 8]
+                    ))
             else:
                 break # Should not happen if data is not empty
 
+            try:
+                self.dispatcher.send(*messages) # Back to back, never while a read awaits its response
+            except BusClosed as e:
+                raise ECUException(f"ECU Write failed: {e}")
             bytes_written += chunk_size
 
         # Write Verification
@@ -0,0 +1,207 @@
+# lib/channel_decoder.py
+
+# Reads and decodes every live channel in ECU_DEFINITIONS without any GUI dependency.
+# Used by both the PyQt5 interface and the headless logger so that values are identical in both.
+
+import re
+import time
+
+from lib.derived_channels import DerivedChannels, is_derived
+from lib.diagnostics import get_logger
+from lib.ecu_definitions import ECU_DEFINITIONS
+
+log = get_logger("decoder")
+
+GAUGE_TYPES = ("gauge_bar", "gauge_chart")
+
+
+def table_channel_name(description, column_name):
+    """Channel name for one column of a 1D table, e.g. 'Knock Retard_1'. Also used as the log column label."""
+    return f"{description}_{re.sub(r'[^0-9]', '', column_name)}"
+
+
+class Sample:
+    """One decoded poll of every live channel."""
+    def __init__(self, timestamp):
+        self.timestamp = timestamp
+        self.values = {}     # description -> scaled value, None if unavailable
+        self.raw = {}        # description -> raw integer value
+        self.tables = {}     # description -> list of scaled column values, None if unavailable
+        self.errors = set()  # descriptions whose calculation raised an exception
+        self.alarms = ()     # names of active alarms, set by lib.alarms.AlarmEngine
+        self.table_channel_names = {} # description -> per-column channel names, shared by all samples of a decoder
+
+    def channel_items(self):
+        """Yields (channel name, value) for every scalar channel and every table column."""
+        yield from self.values.items()
+        for description, column_values in self.tables.items():
+            yield from zip(self.table_channel_names[description], column_values)
+
+
+class ChannelDecoder:
+    def __init__(self, definitions=None):
+        self.definitions = definitions if definitions is not None else ECU_DEFINITIONS
+
+        # Split definitions once so the per-tick loops only touch what they need
+        self.polled_definitions = [d for d in self.definitions if "address" in d and "length" in d]
+        self.calculated_definitions = [d for d in self.definitions if d.get("type") in GAUGE_TYPES and "calculation" in d and not is_derived(d)]
+        self.table_definitions = [d for d in self.definitions if d.get("type") == "table"]
+        self.gauge_definitions = [d for d in self.definitions if d.get("type") in GAUGE_TYPES]
+        self._gauge_descriptions = {d["description"] for d in self.gauge_definitions}
+        self.table_channel_names = {
+            d["description"]: [table_channel_name(d["description"], c) for c in d["columns"]] for d in self.table_definitions
+        }
+
+        self._compiled_formulas = {} # formula_string -> code object
+        self.derived = DerivedChannels(self.definitions) # Moving averages, rates and integrals, stateful across polls
+
+    def poll(self, data_manager, timestamp=None):
+        """
+        Reads every polled definition from the data manager and returns a decoded Sample. Channels the ECU is
+        currently broadcasting are taken from the broadcast frames instead of being polled.
+        """
+        broadcast_values = data_manager.poll_broadcast()
+        raw_blocks = {}
+        for definition in self.polled_definitions:
+            if definition["description"] in broadcast_values:
+                continue # Already on the bus for free
+            raw_blocks[definition["description"]] = data_manager.read_data(definition["address"], definition["length"])
+        return self.decode(raw_blocks, timestamp, broadcast_values)
+
+    def decode(self, raw_blocks, timestamp=None, broadcast_values=None):
+        """
+        Decodes a {description: raw bytes} mapping into a Sample. broadcast_values ({description: value}) are
+        scaled values of gauges received passively; they take the place of the polled or calculated value.
+        """
+        sample = Sample(timestamp if timestamp is not None else time.time())
+        sample.table_channel_names = self.table_channel_names
+        broadcast_values = {d: v for d, v in (broadcast_values or {}).items() if d in self._gauge_descriptions}
+
+        # Pass 1: Raw values and simple scaled gauges
+        for definition in self.polled_definitions:
+            description = definition.get("description", "Unknown")
+            if description in broadcast_values:
+                continue
+            raw_bytes = raw_blocks.get(description)
+
+            if raw_bytes is None or len(raw_bytes) != definition["length"]:
+                log.warning("Could not read %s bytes for '%s'. Length mismatch or None. Skipping raw data for this definition.", definition.get('length'), description)
+                if definition.get("type") in GAUGE_TYPES and "calculation" not in definition:
+                    sample.values[description] = None
+                continue
+
+            if definition.get("type") in GAUGE_TYPES:
+                int_value = int.from_bytes(raw_bytes, byteorder='big', signed=False)
+                sample.raw[description] = int_value
+
+                if "calculation" not in definition:
+                    scale = definition.get("scale", 1.0)
+                    offset = definition.get("offset", 0)
+                    sample.values[description] = (int_value * scale) + offset
+            elif definition.get("type") == "table":
+                sample.tables[description] = self._decode_table(definition, raw_bytes)
+
+        sample.values.update(broadcast_values)
+
+        # Pass 2: Calculated gauges
+        for definition in self.calculated_definitions:
+            description = definition.get("description", "Unknown Calculated Gauge")
+            if description in broadcast_values:
+                continue
+            try:
+                sample.values[description] = self._evaluate_calculation(definition, sample)
+            except Exception as e:
+                log.error("Critical Error updating calculated gauge '%s': %s", description, e)
+                sample.values[description] = None
+                sample.errors.add(description)
+
+        # Pass 3: Derived channels, after formulas so they can use them
+        self.derived.update(sample)
+
+        # Tables whose block could not be read are reported as unavailable per column
+        for definition in self.table_definitions:
+            if definition["description"] not in sample.tables:
+                sample.tables[definition["description"]] = [None] * len(definition["columns"])
+
+        return sample
+
+    def _decode_table(self, definition, raw_bytes):
+        element_size = definition.get("element_size", 1)
+        definition_scale = definition.get("scale", 1.0)
+        definition_offsets = definition.get("offset", [])
+
+        values = []
+        for col_idx, _ in enumerate(definition["columns"]):
+            start_byte = col_idx * element_size
+            end_byte = start_byte + element_size
+            if end_byte > len(raw_bytes):
+                values.append(None)
+                continue
+
+            element_int_val = int.from_bytes(raw_bytes[start_byte:end_byte], byteorder='big', signed=False)
+
+            current_offset = 0
+            if isinstance(definition_offsets, list) and col_idx < len(definition_offsets):
+                current_offset = definition_offsets[col_idx]
+            else:
+                log.warning("Offset list too short or invalid for column %d in '%s'. Using default 0 offset.", col_idx, definition['description'])
+
+            values.append((element_int_val * definition_scale) + current_offset)
+        return values
+
+    def reset(self):
+        """Forgets derived channel history, e.g. when a new source is connected."""
+        self.derived.reset()
+
+    def _evaluate_calculation(self, definition, sample):
+        description = definition["description"]
+        calculation_info = definition["calculation"]
+
+        if calculation_info.get("type") != "formula":
+            log.error("Calculated gauge '%s' has unsupported calculation type '%s'.", description, calculation_info.get('type'))
+            return None
+
+        formula_string = calculation_info.get("formula_string")
+        if not formula_string:
+            log.error("Calculated gauge '%s' has no 'formula_string'. Skipping.", description)
+            return None
+
+        formula_scope = {}
+        for key, value in calculation_info.items():
+            if key not in ["type", "formula_string", "dependencies"]:
+                formula_scope[key] = value
+
+        for dep_desc in calculation_info.get("dependencies", []):
+            value_key = f"{dep_desc}_VALUE"
+            if sample.values.get(dep_desc) is not None:
+                formula_scope[value_key] = sample.values[dep_desc]
+            elif value_key in formula_string:
+                log.warning("Error updating calculated gauge '%s': Missing or None dependency: '%s'. Formula: '%s'", description, value_key, formula_string)
+                return None
+
+            raw_key = f"{dep_desc}_RAW"
+            if sample.raw.get(dep_desc) is not None:
+                formula_scope[raw_key] = sample.raw[dep_desc]
+            elif raw_key in formula_string:
+                log.warning("Error updating calculated gauge '%s': Missing or None dependency: '%s'. Formula: '%s'", description, raw_key, formula_string)
+                return None
+
+        for var_name in set(re.findall(r'\b[A-Za-z_][A-Za-z0-9_]*\b', formula_string)):
+            if var_name not in formula_scope:
+                log.error("Error updating calculated gauge '%s': Variable '%s' from formula is not in scope. Formula: '%s', Scope: %s", description, var_name, formula_string, formula_scope)
+                return None
+
+        for key, value in list(formula_scope.items()):
+            if isinstance(value, (int, float)):
+                continue
+            try:
+                formula_scope[key] = float(value)
+            except (ValueError, TypeError):
+                log.error("Could not convert '%s' value '%s' to number for '%s' calculation. Setting to N/A.", key, value, description)
+                return None
+
+        code = self._compiled_formulas.get(formula_string)
+        if code is None:
+            code = compile(formula_string, f"<formula:{description}>", "eval")
+            self._compiled_formulas[formula_string] = code
+        return eval(code, {"__builtins__": None}, formula_scope)
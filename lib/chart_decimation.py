@@ -0,0 +1,49 @@
+# lib/chart_decimation.py
+
+# Pixel-column decimation for line charts. Keeps the first, minimum, maximum and last sample of every
+# pixel column (M4 decimation), which draws identically to the full series at a bounded point count.
+
+import numpy as np
+
+
+def visible_range(times, t_start, t_end):
+    """Index range [lo, hi) of a time-ordered array within [t_start, t_end], found by binary search."""
+    return int(np.searchsorted(times, t_start, side='left')), int(np.searchsorted(times, t_end, side='right'))
+
+
+def minmax_decimate(times, values, t_start, t_end, width):
+    """
+    Reduces the samples of a time-ordered series visible in [t_start, t_end] to at most four points per pixel column.
+    Returns (x, values) arrays with x in pixels from 0 to width, in time order. NaN samples are skipped.
+    """
+    empty = np.empty(0, dtype=np.float64)
+    if width <= 0 or t_end <= t_start:
+        return empty, empty
+
+    lo, hi = visible_range(times, t_start, t_end)
+    lo = max(0, lo - 1) # Include the sample just before the window so the line enters from the left edge
+    times = np.asarray(times[lo:hi], dtype=np.float64)
+    values = np.asarray(values[lo:hi], dtype=np.float64)
+
+    finite = np.isfinite(values)
+    if not finite.all():
+        times = times[finite]
+        values = values[finite]
+    if len(times) == 0:
+        return empty, empty
+
+    x = (times - t_start) * (width / (t_end - t_start))
+    columns = np.floor(x).astype(np.int64)
+
+    # Columns are non-decreasing, so each column is one contiguous run of samples
+    run_starts = np.flatnonzero(np.r_[True, columns[1:] != columns[:-1]])
+    run_ends = np.r_[run_starts[1:], len(columns)] - 1
+
+    # Sorting by (column, value) puts each run's minimum first and maximum last
+    run_ids = np.repeat(np.arange(len(run_starts)), np.diff(np.r_[run_starts, len(columns)]))
+    order = np.lexsort((values, run_ids))
+    run_mins = order[run_starts]
+    run_maxs = order[run_ends]
+
+    keep = np.unique(np.concatenate((run_starts, run_mins, run_maxs, run_ends))) # Sorted, so points stay in time order
+    return x[keep], values[keep]
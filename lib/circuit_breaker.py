@@ -0,0 +1,63 @@
+# lib/circuit_breaker.py
+
+# Failure tracking for the ECU link. After FAILURE_THRESHOLD consecutive failed requests the breaker trips:
+# DataManager then fails reads and writes immediately instead of waiting out a 1 s timeout per request, and a
+# background probe retries a cheap 4-byte read at growing intervals until the ECU answers again.
+
+import threading
+import time
+
+FAILURE_THRESHOLD = 3
+INITIAL_BACKOFF_S = 0.5
+MAX_BACKOFF_S = 8.0
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, initial_backoff_s=INITIAL_BACKOFF_S, max_backoff_s=MAX_BACKOFF_S):
+        self.failure_threshold = failure_threshold
+        self.initial_backoff_s = initial_backoff_s
+        self.max_backoff_s = max_backoff_s
+        self._lock = threading.Lock() # Poll loop, map loader and probe thread all report here
+        self.failures = 0 # Consecutive failures
+        self.trips = 0    # Times the breaker has tripped this session
+        self._open = False
+        self._backoff_s = initial_backoff_s
+        self._next_probe_at = None
+
+    @property
+    def is_open(self):
+        return self._open
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+
+    def record_failure(self):
+        """Counts a failed request. Returns True if this failure tripped the breaker."""
+        with self._lock:
+            self.failures += 1
+            if self._open or self.failures < self.failure_threshold:
+                return False
+            self._open = True
+            self.trips += 1
+            self._backoff_s = self.initial_backoff_s
+            return True
+
+    def next_probe_delay(self):
+        """Delay before the next probe, doubling on each call up to max_backoff_s."""
+        with self._lock:
+            delay = self._backoff_s
+            self._backoff_s = min(self._backoff_s * 2, self.max_backoff_s)
+            self._next_probe_at = time.monotonic() + delay
+            return delay
+
+    def seconds_to_probe(self):
+        next_probe_at = self._next_probe_at
+        return max(0.0, next_probe_at - time.monotonic()) if self._open and next_probe_at is not None else 0.0
+
+    def reset(self):
+        with self._lock:
+            self._open = False
+            self.failures = 0
+            self._backoff_s = self.initial_backoff_s
+            self._next_probe_at = None
@@ -0,0 +1,118 @@
+# lib/conditions.py
+
+# Threshold rules over decoded samples, compiled into NumPy arrays so that any number of rules costs one gather of
+# the channels they use plus a handful of vector operations per sample. Shared by trigger capture and alarms.
+#
+# A rule is one clause or a list of clauses that must all hold. A clause tests one channel; for a 1D table
+# (e.g. "Knock Retard") it holds if any column passes:
+#   {"channel": "Coolant", "above": 110}               value > 110
+#   {"channel": "O2-Bank1", "below": 0.1}              value < 0.1
+#   {"channel": "AFR Target", "outside": (11.0, 15.0)}
+#   {"channel": "TPS", "inside": (0.0, 2.0)}           inclusive
+#   {"channel": "RPM", "crosses_above": 6500}          true only on the sample where the value goes above
+#   {"channel": "RPM", "crosses_below": 900}
+# Unavailable values (None) never satisfy a clause.
+
+import numpy as np
+
+_TESTS = ("above", "below", "outside", "inside", "crosses_above", "crosses_below")
+
+
+class ConditionError(ValueError):
+    pass
+
+
+def _clause_bounds(clause):
+    """(low, high, inside, edge) of one clause: outside tests value < low or value > high, inside the opposite."""
+    tests = [t for t in _TESTS if t in clause]
+    if len(tests) != 1:
+        raise ConditionError(f"Clause on '{clause.get('channel')}' needs exactly one of {', '.join(_TESTS)}: {clause}")
+    test = tests[0]
+    argument = clause[test]
+    if test in ("above", "crosses_above"):
+        return -np.inf, float(argument), False, test == "crosses_above"
+    if test in ("below", "crosses_below"):
+        return float(argument), np.inf, False, test == "crosses_below"
+    low, high = (float(v) for v in argument)
+    return low, high, test == "inside", False
+
+
+class ConditionSet:
+    def __init__(self, rules, definitions):
+        """rules: list of rule specs (a clause dict or a list of clause dicts), evaluated in this order."""
+        tables = {d["description"]: len(d["columns"]) for d in definitions if d.get("type") == "table"}
+        scalars = {d["description"] for d in definitions if "description" in d and d.get("type") != "table"}
+
+        self.slots = [] # (description, column index or None) gathered from each sample, each once
+        slot_index = {}
+        lows, highs, inside, edge = [], [], [], []
+        clause_slots = []   # Slot of every clause column, clause columns contiguous
+        column_starts = []  # First clause column of every clause
+        clause_starts = []  # First clause of every rule
+        for rule in rules:
+            clauses = rule if isinstance(rule, (list, tuple)) else [rule]
+            if not clauses:
+                raise ConditionError("A rule needs at least one clause.")
+            clause_starts.append(len(column_starts))
+            for clause in clauses:
+                channel = clause.get("channel")
+                if channel in tables:
+                    columns = [(channel, c) for c in range(tables[channel])]
+                elif channel in scalars:
+                    columns = [(channel, None)]
+                else:
+                    raise ConditionError(f"Unknown channel '{channel}' in clause {clause}")
+                low, high, is_inside, is_edge = _clause_bounds(clause)
+                column_starts.append(len(clause_slots))
+                for slot in columns:
+                    if slot not in slot_index:
+                        slot_index[slot] = len(self.slots)
+                        self.slots.append(slot)
+                    clause_slots.append(slot_index[slot])
+                    lows.append(low)
+                    highs.append(high)
+                    inside.append(is_inside)
+                edge.append(is_edge)
+
+        self.rule_count = len(clause_starts)
+        self._clause_slots = np.array(clause_slots, dtype=np.intp)
+        self._low = np.array(lows)
+        self._high = np.array(highs)
+        self._inside = np.array(inside, dtype=bool)
+        self._column_starts = np.array(column_starts, dtype=np.intp)
+        self._clause_starts = np.array(clause_starts, dtype=np.intp)
+        self._edge = np.array(edge, dtype=bool)
+        self._previous = np.zeros(len(column_starts), dtype=bool) # Clause results of the previous sample, for edges
+        self._values = np.empty(len(self.slots))
+
+    def gather(self, sample):
+        """Values of every slot the rules use, NaN where unavailable."""
+        values = self._values
+        for i, (description, column) in enumerate(self.slots):
+            if column is None:
+                value = sample.values.get(description)
+            else:
+                columns = sample.tables.get(description)
+                value = columns[column] if columns else None
+            values[i] = np.nan if value is None else value
+        return values
+
+    def evaluate(self, sample):
+        """Boolean array with one entry per rule: True where the rule holds for this sample."""
+        if self.rule_count == 0:
+            return np.zeros(0, dtype=bool)
+        return self.evaluate_values(self.gather(sample))
+
+    def evaluate_values(self, values):
+        v = values[self._clause_slots]
+        with np.errstate(invalid='ignore'):
+            outside = (v < self._low) | (v > self._high)
+        passed = np.where(self._inside, ~outside, outside) & ~np.isnan(v)
+        clauses = np.logical_or.reduceat(passed, self._column_starts) # Any column of a table
+        now = clauses.copy()
+        clauses[self._edge] &= ~self._previous[self._edge] # Crossings hold only on the rising sample
+        self._previous = now
+        return np.logical_and.reduceat(clauses, self._clause_starts) # All clauses of a rule
+
+    def reset(self):
+        self._previous[:] = False
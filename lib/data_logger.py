@@ -0,0 +1,106 @@
+# lib/data_logger.py
+
+# CSV logger for decoded samples, shared by the GUI and the headless logger.
+
+import csv
+import os
+
+import numpy as np
+
+from lib.channel_decoder import GAUGE_TYPES, table_channel_name
+from lib.ecu_definitions import ECU_DEFINITIONS
+
+
+def next_log_filename(log_dir="logs", base_filename="gauge_log", extension=".csv"):
+    """Returns the first unused numbered log filename in log_dir."""
+    os.makedirs(log_dir, exist_ok=True)
+    i = 1
+    while True:
+        filename = os.path.join(log_dir, f"{base_filename}_{i:03d}{extension}")
+        if not os.path.exists(filename):
+            return filename
+        i += 1
+
+
+def read_log(filename):
+    """
+    Reads a CsvLogger log back as (timestamps, {column: values}), all float arrays with NaN for 'N/A'. The Alarms
+    column is left out. Table columns keep the logged sign (Ignition Timing is logged negated).
+    """
+    with open(filename, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        rows = [row for row in reader if row]
+    if not header:
+        return np.empty(0), {}
+    columns = {}
+    for index, name in enumerate(header):
+        if name == "Alarms":
+            continue
+        columns[name] = np.array([float(row[index]) if index < len(row) and row[index] not in ("", "N/A") else np.nan
+                                  for row in rows])
+    return columns.pop("Timestamp"), columns
+
+
+class CsvLogger:
+    def __init__(self, definitions=None):
+        self.definitions = definitions if definitions is not None else ECU_DEFINITIONS
+        self.filename = None
+        self.log_file = None
+        self.log_writer = None
+        self.header_written = False
+
+    @property
+    def is_open(self):
+        return self.log_file is not None
+
+    def open(self, filename):
+        self.close()
+        self.log_file = open(filename, 'w', newline='')
+        self.log_writer = csv.writer(self.log_file)
+        self.filename = filename
+        self.header_written = False
+
+    def close(self):
+        if self.log_file:
+            self.log_file.close()
+        self.log_file = None
+        self.log_writer = None
+        self.header_written = False
+
+    def header(self):
+        log_header = ["Timestamp"]
+        for def_item in self.definitions:
+            if def_item.get("type") in GAUGE_TYPES:
+                log_header.append(def_item["description"])
+            elif def_item.get("type") == "table":
+                for col_name in def_item["columns"]:
+                    log_header.append(table_channel_name(def_item["description"], col_name))
+        log_header.append("Alarms")
+        return log_header
+
+    def row(self, sample):
+        row_data = [sample.timestamp]
+        for def_item in self.definitions:
+            if def_item.get("type") in GAUGE_TYPES:
+                value_to_log = sample.values.get(def_item["description"])
+                row_data.append(f"{value_to_log:.2f}" if value_to_log is not None else "N/A")
+            elif def_item.get("type") == "table":
+                table_values = sample.tables.get(def_item["description"]) or [None] * len(def_item["columns"])
+                for value_to_log in table_values:
+                    if isinstance(value_to_log, (int, float)):
+                        if def_item["description"] == "Ignition Timing":
+                            value_to_log = -value_to_log
+                        row_data.append(f"{value_to_log:.2f}")
+                    else:
+                        row_data.append("N/A")
+        row_data.append("|".join(sample.alarms))
+        return row_data
+
+    def write_sample(self, sample):
+        if not self.log_writer:
+            return
+        if not self.header_written:
+            self.log_writer.writerow(self.header())
+            self.header_written = True
+        self.log_writer.writerow(self.row(sample))
@@ -1,86 +1,323 @@
 # lib/data_manager.py
 
-import os
-import can
-from lib.can_interface import LiveTuningAccess, ECUException
-from lib.mock_can_interface import MockLiveTuningAccess # For mock data source
-from PyQt5.QtWidgets import QMessageBox
+# Kept free of any GUI import so the headless logger can use it. Communicator modules are imported
+# lazily in connect_source so a mock session never pulls in python-can.
+
+import contextlib
+import threading
+import time
+
+from lib.axis_cache import AxisCache
+from lib.circuit_breaker import CircuitBreaker
+from lib.diagnostics import get_logger
+from lib.edit_journal import EditJournal
+from lib.ecu_definitions import FIRMWARE_DEFINITION_SETS
+from lib.firmware_id import calibration_fingerprint, ident_address, identify
+from lib.map_cache import MapCache
+
+log = get_logger("data_manager")
 
 class DataManager:
     def __init__(self):
         self.active_communicator = None
         self._is_connected = False
+        # Serialises communicator access between the poll loop and background map loads, so request/response
+        # frames from different threads never interleave on the bus. Writes always take it; reads skip it on
+        # communicators that serialise and match requests themselves (concurrent_requests = True).
+        self._io_lock = threading.RLock()
+        self.last_error = None # Message of the most recent connection failure, for the caller to display
+        self.journal = EditJournal() # Undo/redo history of committed write transactions
         self.sram_dump_path = "ram/calram.bin" # Default path for mock or initial load
+        self.sym_map = None # SymbolMap of the firmware, handed to each communicator that connects
+        self.firmware = None    # FirmwareIdentity read on connect, None if identification failed
+        self.definitions = None # Definition set matching the firmware ID, None if the firmware is unknown
+        self.map_cache = None   # MapCache for the connected calibration, None when disabled or unidentified
+        self.use_map_cache = True
+        self._write_listeners = [] # Called with (address, data_bytes) after every successful write
+        self.breaker = CircuitBreaker() # Trips after consecutive failures; reads and writes then fail fast
+        self._probe_stop = threading.Event() # Set to end the background probe and fingerprinting of the current connection
+        self.axis_cache = AxisCache() # Decoded maptable axes shared between maps, for the current connection
+        self.broadcast = None # BroadcastDecoder while listening to the ECU's broadcast frames
+        self.add_write_listener(self.axis_cache.invalidate)
 
     # Modified connect_source method to accept ram_dump_path
-    def connect_source(self, source_type, interface=None, channel=None, bitrate=None, ram_dump_path=None):
+    def connect_source(self, source_type, interface=None, channel=None, bitrate=None, ram_dump_path=None, transport_profile=None, engine_simulator=None,
+                       listen_broadcast=False):
         self.disconnect_source() # Always disconnect existing before connecting new
+        self.last_error = None
+        self.journal.clear() # Undo history belongs to the memory it was recorded against
+        if self.map_cache is not None:
+            self.remove_write_listener(self.map_cache.apply_write)
+            self.map_cache.flush()
+        self.firmware = None
+        self.definitions = None
+        self.map_cache = None
+        self.axis_cache.clear()
+        self.breaker.reset()
+        self._probe_stop = threading.Event()
+        self.broadcast = None
 
         try:
+            broadcast = None
+            if listen_broadcast:
+                from lib.broadcast_decoder import BroadcastDecoder
+                broadcast = BroadcastDecoder()
+
             if source_type == "real_can":
                 # Ensure LiveTuningAccess and can are imported and available
                 from lib.can_interface import LiveTuningAccess
                 self.active_communicator = LiveTuningAccess()
-                self.active_communicator.open_can(interface, channel, bitrate)
+                self.active_communicator.open_can(interface, channel, bitrate,
+                                                  broadcast_ids=broadcast.frame_ids if broadcast is not None else ())
                 # Live CAN usually doesn't load a full dump, it reads as needed
                 # But if you have an initial dump for setup, you might load it here too.
                 # self.active_communicator.load_sram_content(self.sram_dump_path) # Example if real ECU has initial dump
-                print(f"Data Manager: Connected to Real CAN: {interface}/{channel} @ {bitrate} bps")
+                log.info("Connected to Real CAN: %s/%s @ %s bps", interface, channel, bitrate)
                 self._is_connected = True
 
-            elif source_type == "mock_can":
+            elif source_type in ("mock_can", "offline_edit"):
                 from lib.mock_can_interface import MockLiveTuningAccess
                 self.active_communicator = MockLiveTuningAccess()
                 # Use the provided ram_dump_path, or fall back to the default if not provided
                 path_to_load = ram_dump_path if ram_dump_path else self.sram_dump_path
-                self.active_communicator.load_sram_content(path_to_load) # Load mock RAM dump
+                # Offline editing writes straight into the image file, the mock keeps the dump untouched
+                persist = source_type == "offline_edit"
+                self.active_communicator.load_sram_content(path_to_load, persist=persist)
+                if self.sym_map is not None:
+                    self.active_communicator.set_sym_map(self.sym_map)
+                self.active_communicator.set_transport_profile(transport_profile) # Optional real-bus timing
+                if engine_simulator is not None and not persist: # Never let the model write into an edited image
+                    self.active_communicator.set_simulator(engine_simulator)
+                if broadcast is not None:
+                    self.active_communicator.set_broadcast(broadcast.messages.values())
                 self.active_communicator.open_can("mock_interface", "mock_channel", 500000) # Open mock bus
-                print(f"Data Manager: Connected to Mock CAN (loaded {path_to_load})")
+                timing = f", emulating {transport_profile.bitrate} bps bus timing" if transport_profile is not None else ""
+                if self.active_communicator.simulator is not None:
+                    timing += f", simulating engine at {engine_simulator.rate_hz:g} Hz (seed {engine_simulator.seed})"
+                log.info("Connected to %s (loaded %s%s)", "Offline Edit" if persist else "Mock CAN", path_to_load, timing)
                 self._is_connected = True
             else:
                 raise ValueError("Unknown source type")
 
+            if broadcast is not None:
+                self.active_communicator.frame_handler = broadcast.on_frame
+                self.broadcast = broadcast
+                log.info("Listening for broadcast frames %s", ", ".join(f"0x{i:03X}" for i in broadcast.frame_ids))
         except Exception as e:
-            print(f"Data Manager: Failed to connect to source: {e}")
+            log.error("Failed to connect to source: %s", e)
             self._is_connected = False
             self.active_communicator = None # Ensure communicator is reset on failure
-            QMessageBox.critical(None, "Connection Error", f"Failed to connect to data source: {e}")
+            self.last_error = str(e)
             return False
+        self._identify_firmware()
         return True
 
+    def _identify_firmware(self):
+        """Reads the firmware ID, selects the definition set and starts fingerprinting the calibration for the map cache."""
+        self.firmware = identify(self)
+        if self.firmware is None:
+            log.warning("Could not read the firmware identification, maps will be read from the ECU.")
+            return
+        self.definitions = FIRMWARE_DEFINITION_SETS.get(self.firmware.firmware_id)
+        known = "" if self.definitions is not None else " (no definition set for this firmware)"
+        log.info("Firmware %s%s", self.firmware.firmware_id, known)
+        if self.use_map_cache:
+            # Unbound until the calibration is fingerprinted; maps loaded before then are read from the ECU
+            self.map_cache = MapCache(firmware_id=self.firmware.firmware_id)
+            self.add_write_listener(self.map_cache.apply_write) # Writes evict the cached maps they touch
+            threading.Thread(target=self._fingerprint_calibration, args=(self.firmware, self.map_cache, self._probe_stop),
+                             name="calibration-fingerprint", daemon=True).start()
+
+    def _fingerprint_calibration(self, identity, cache, stop):
+        """Reads the calibration zone in the background and binds the map cache to its fingerprint."""
+        started = time.monotonic()
+        fingerprint = calibration_fingerprint(self, identity, stop)
+        if stop.is_set():
+            return
+        if fingerprint is None:
+            log.warning("Could not read the calibration to fingerprint it; maps will be read from the ECU.")
+            return
+        identity.fingerprint = fingerprint
+        cache.bind(fingerprint)
+        log.info("Calibration %s fingerprinted in %.1f s, %d maps cached.", fingerprint[:12], time.monotonic() - started, len(cache))
+
+    def flush_map_cache(self):
+        """Saves map cache changes; called once per map load and write transaction rather than per block."""
+        if self.map_cache is not None:
+            self.map_cache.flush()
+
+    def add_write_listener(self, listener):
+        self._write_listeners.append(listener)
+
+    def remove_write_listener(self, listener):
+        if listener in self._write_listeners:
+            self._write_listeners.remove(listener)
+
+    def load_symbol_map(self, path, definitions=None):
+        """
+        Loads a firmware symbol map and resolves the symbol keys of definitions (ECU_DEFINITIONS by default) in
+        place. Call before anything splits the definitions by address. Returns False if the file cannot be read.
+        """
+        from lib.symbol_map import SymbolMap, resolve_definitions
+        if definitions is None:
+            from lib.ecu_definitions import ECU_DEFINITIONS
+            definitions = ECU_DEFINITIONS
+        try:
+            self.sym_map = SymbolMap.from_file(path)
+        except OSError as e:
+            log.error("Failed to load symbol map '%s': %s", path, e)
+            self.last_error = str(e)
+            return False
+        missing = resolve_definitions(definitions, self.sym_map)
+        if missing:
+            log.warning("Symbols not in map, keeping hard-coded addresses: %s", ", ".join(sorted(set(missing))))
+        return True
+
+    def format_address(self, address):
+        """Address labelled with its symbol when a symbol map is loaded."""
+        return self.sym_map.format_address(address) if self.sym_map is not None else f"0x{address:08X}"
+
     def read_data(self, address, length):
         if not self.active_communicator or not self._is_connected:
-            print("Data Manager: Not connected to a source. Cannot read data.")
+            log.warning("Not connected to a source. Cannot read data.")
             return None
+        if self.breaker.is_open:
+            return None # ECU not responding; the probe resumes requests once it answers
+        communicator = self.active_communicator
         try:
-            return self.active_communicator.read_memory(address, length)
+            with self._read_lock(communicator):
+                data = communicator.read_memory(address, length)
+            self.breaker.record_success()
+            return data
         except Exception as e:
-            print(f"Data Manager: Error reading data from 0x{address:X} (length {length}): {e}")
+            log.warning("Error reading data from 0x%X (length %d): %s", address, length, e)
+            self._record_failure()
             return None
 
+    def _read_lock(self, communicator):
+        return contextlib.nullcontext() if getattr(communicator, "concurrent_requests", False) else self._io_lock
+
     def write_data(self, address, data_bytes):
         if not self.active_communicator or not self._is_connected:
-            print("Data Manager: Not connected to a source. Cannot write data.")
+            log.warning("Not connected to a source. Cannot write data.")
+            return False
+        if self.breaker.is_open:
+            log.warning("ECU not responding, write to 0x%X not sent.", address)
+            return False
+        try:
+            with self._io_lock:
+                self.active_communicator.write_memory(address, data_bytes)
+        except Exception as e:
+            log.warning("Error writing data to 0x%X: %s", address, e)
+            self._record_failure()
             return False
+        log.debug("Wrote %d bytes to 0x%X", len(data_bytes), address)
+        # The ECU has accepted the write; a failing listener must not report it as failed or trigger a rollback
+        for listener in self._write_listeners:
+            try:
+                listener(address, data_bytes)
+            except Exception as e:
+                log.error("Write listener %s failed for 0x%X: %s", getattr(listener, "__qualname__", listener), address, e)
+        return True
+
+    def poll_broadcast(self):
+        """
+        Decodes the broadcast frames received since the last call and returns {channel: value} of every fresh
+        broadcast channel; empty when not listening. The channel decoder skips polling these.
+        """
+        if self.broadcast is None or not self._is_connected:
+            return {}
+        communicator = self.active_communicator
         try:
-            self.active_communicator.write_memory(address, data_bytes)
-            print(f"Data Manager: Wrote {len(data_bytes)} bytes to 0x{address:X}")
-            return True
+            with self._read_lock(communicator):
+                communicator.drain_broadcast()
         except Exception as e:
-            print(f"Data Manager: Error writing data to 0x{address:X}: {e}")
+            log.warning("Error receiving broadcast frames: %s", e)
+        return self.broadcast.values()
+
+    def is_responding(self):
+        """False while the circuit breaker is open, i.e. polling should pause."""
+        return not self.breaker.is_open
+
+    def _record_failure(self):
+        if not self.breaker.record_failure():
+            return
+        log.error("ECU not responding after %d consecutive failures. Pausing requests and probing in the background.",
+                  self.breaker.failures)
+        self.last_error = "ECU not responding."
+        threading.Thread(target=self._probe_loop, args=(self.active_communicator, self._probe_stop),
+                         name="ecu-probe", daemon=True).start()
+
+    def _probe_loop(self, communicator, stop):
+        """Retries a 4-byte read with backoff until the ECU answers, the source changes or stop is set."""
+        address = self.firmware.address if self.firmware is not None else ident_address(self.sym_map)
+        while True:
+            delay = self.breaker.next_probe_delay()
+            if stop.wait(delay):
+                return
+            with self._io_lock:
+                if stop.is_set() or self.active_communicator is not communicator:
+                    return
+                try:
+                    communicator.read_memory(address, 4)
+                except Exception as e:
+                    log.info("Probe failed (%s), retrying in %.1f s.", e, min(delay * 2, self.breaker.max_backoff_s))
+                    continue
+            self.breaker.reset()
+            log.warning("ECU responding again, resuming requests.")
+            return
+
+    def begin_transaction(self, label="Edit", record=True):
+        """
+        Starts a WriteTransaction: stage writes to any number of maps, then commit() them as one verified batch.
+        With record=True the committed changes become one undo step in the journal, named label.
+        """
+        from lib.write_transaction import WriteTransaction
+        return WriteTransaction(self, label=label, journal=self.journal if record else None)
+
+    def undo(self):
+        """Writes back the old bytes of the newest journal group. Returns the group, or None if nothing was undone."""
+        group = self.journal.peek_undo()
+        if group is None or not self._replay(group, lambda delta: delta[1]):
+            return None
+        self.journal.mark_undone()
+        return group
+
+    def redo(self):
+        """Writes the new bytes of the most recently undone group again. Returns the group, or None."""
+        group = self.journal.peek_redo()
+        if group is None or not self._replay(group, lambda delta: delta[2]):
+            return None
+        self.journal.mark_redone()
+        return group
+
+    def _replay(self, group, pick):
+        transaction = self.begin_transaction(record=False)
+        for delta in group.deltas:
+            transaction.stage(delta[0], pick(delta))
+        if not transaction.commit():
+            log.error("Failed to replay '%s': %s", group.label, transaction.error)
+            self.last_error = transaction.error
             return False
+        return True
 
     def is_connected(self):
         return self._is_connected
 
     def shutdown(self):
         """Shuts down the active communicator when the application closes."""
+        with self._io_lock: # Wait for any in-flight read or write to finish
+            self._shutdown_communicator()
+        self.flush_map_cache()
+
+    def _shutdown_communicator(self):
+        self._probe_stop.set()
         if self.active_communicator:
             try:
                 self.active_communicator.shutdown()
-                print("Data Manager: Communicator shut down.")
+                log.info("Communicator shut down.")
             except Exception as e:
-                print(f"Error during communicator shutdown: {e}")
+                log.error("Error during communicator shutdown: %s", e)
             finally:
                 self.active_communicator = None
         self._is_connected = False # Ensure connection state is reset
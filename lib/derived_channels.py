@@ -0,0 +1,262 @@
+# lib/derived_channels.py
+
+# Stateful derived channels declared in ECU_DEFINITIONS with a "calculation" of one of DERIVED_TYPES. Live, each
+# channel is updated once per sample in O(1) (amortized for window min/max); over a recorded log the same
+# definitions are computed on whole NumPy columns. Both paths do the same arithmetic in the same order, so results
+# are identical, except the vectorized EMA, which matches to floating-point rounding.
+#
+#   {"type": "ema", "source": "O2-Bank1", "alpha": 0.2}              per-sample smoothing factor, or
+#   {"type": "ema", "source": "O2-Bank1", "time_constant_s": 0.5}    time based, independent of the poll rate
+#   {"type": "window_mean", "source": "RPM", "window": 20}           also window_min / window_max, over N samples
+#   {"type": "derivative", "source": "RPM"}                          per second
+#   {"type": "integral", "source": ["Injector Pulse B1", "RPM"]}     trapezoidal, running since connect
+#
+# "source" is a channel description, or a list of them whose product is used. An optional "scale" multiplies the
+# result. Unavailable source values are skipped: the channel is None for that sample and its state carries over.
+# Derived channels are computed after formulas, in definition order, so one may use another declared before it.
+
+import collections
+import math
+
+import numpy as np
+
+from lib.diagnostics import get_logger
+
+log = get_logger("derived")
+
+DERIVED_TYPES = ("ema", "window_mean", "window_min", "window_max", "derivative", "integral")
+_EMA_BLOCK_DECAY = 300.0 # Largest decay (in e-folds) in one closed-form EMA block, keeps exp() far from overflow
+
+
+def is_derived(definition):
+    calculation = definition.get("calculation")
+    return isinstance(calculation, dict) and calculation.get("type") in DERIVED_TYPES
+
+
+class _Ema:
+    def __init__(self, calculation):
+        self.alpha = calculation.get("alpha")
+        self.time_constant_s = calculation.get("time_constant_s")
+        if (self.alpha is None) == (self.time_constant_s is None):
+            raise ValueError("ema needs exactly one of 'alpha' and 'time_constant_s'.")
+        if self.alpha is not None and not 0 < self.alpha <= 1:
+            raise ValueError("ema 'alpha' must be in (0, 1].")
+        if self.time_constant_s is not None and self.time_constant_s <= 0:
+            raise ValueError("ema 'time_constant_s' must be positive.")
+        self.reset()
+
+    def reset(self):
+        self._value = None
+        self._time = None
+
+    def step(self, t, x):
+        if self._value is None:
+            self._value = x # The first sample seeds the average
+        else:
+            if self.alpha is not None:
+                alpha = self.alpha
+            else:
+                alpha = -math.expm1(-max(t - self._time, 0.0) / self.time_constant_s)
+            self._value = self._value + alpha * (x - self._value)
+        self._time = t
+        return self._value
+
+    def series(self, t, x):
+        """
+        Closed form of y[k] = exp(d[k]) * y[k-1] + g[k] * x[k], with d the log decay and g = 1 - exp(d), evaluated
+        with cumulative sums in blocks short enough for exp(-decay) to stay finite.
+        """
+        n = len(x)
+        y = np.empty(n)
+        if n == 0:
+            return y
+        if self.alpha is not None:
+            decay = np.full(n, max(math.log1p(-self.alpha), -_EMA_BLOCK_DECAY) if self.alpha < 1 else -_EMA_BLOCK_DECAY)
+        else:
+            decay = np.empty(n)
+            decay[1:] = -np.maximum(np.diff(t), 0.0) / self.time_constant_s
+        gain = -np.expm1(decay)
+        decay[0], gain[0] = 0.0, 1.0
+        cumulative = np.cumsum(decay) # Non-increasing
+        start, carry = 0, 0.0
+        while start < n:
+            base = cumulative[start - 1] if start else 0.0
+            end = max(int(np.searchsorted(-cumulative, _EMA_BLOCK_DECAY - base, side='right')), start + 1)
+            e = cumulative[start:end] - base
+            y[start:end] = np.exp(e) * (carry + np.cumsum(gain[start:end] * x[start:end] * np.exp(-e)))
+            carry = y[end - 1]
+            start = end
+        return y
+
+
+class _WindowMean:
+    def __init__(self, calculation):
+        self.window = _window_length(calculation)
+        self.reset()
+
+    def reset(self):
+        self._total = 0.0
+        self._prefix = collections.deque([0.0], maxlen=self.window + 1) # Running totals, oldest first
+
+    def step(self, t, x):
+        self._total = self._total + x
+        self._prefix.append(self._total)
+        return (self._total - self._prefix[0]) / (len(self._prefix) - 1)
+
+    def series(self, t, x):
+        prefix = np.concatenate(([0.0], np.cumsum(x)))
+        ends = np.arange(1, len(x) + 1)
+        starts = np.maximum(ends - self.window, 0)
+        return (prefix[ends] - prefix[starts]) / (ends - starts)
+
+
+class _WindowExtreme:
+    def __init__(self, calculation):
+        self.window = _window_length(calculation)
+        self.is_max = calculation["type"] == "window_max"
+        self.reset()
+
+    def reset(self):
+        self._index = 0
+        self._candidates = collections.deque() # (index, value), monotonic, front is the current extreme
+
+    def step(self, t, x):
+        candidates = self._candidates
+        while candidates and (candidates[-1][1] <= x if self.is_max else candidates[-1][1] >= x):
+            candidates.pop()
+        candidates.append((self._index, x))
+        if candidates[0][0] <= self._index - self.window:
+            candidates.popleft()
+        self._index += 1
+        return candidates[0][1]
+
+    def series(self, t, x):
+        padded = np.concatenate((np.full(self.window - 1, -np.inf if self.is_max else np.inf), x))
+        windows = np.lib.stride_tricks.sliding_window_view(padded, self.window)
+        return windows.max(axis=1) if self.is_max else windows.min(axis=1)
+
+
+class _Derivative:
+    def __init__(self, calculation):
+        self.reset()
+
+    def reset(self):
+        self._previous = None # (time, value)
+
+    def step(self, t, x):
+        previous, self._previous = self._previous, (t, x)
+        if previous is None or t <= previous[0]:
+            return None
+        return (x - previous[1]) / (t - previous[0])
+
+    def series(self, t, x):
+        y = np.full(len(x), np.nan)
+        if len(x) > 1:
+            dt = np.diff(t)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                y[1:] = np.where(dt > 0, np.diff(x) / dt, np.nan)
+        return y
+
+
+class _Integral:
+    def __init__(self, calculation):
+        self.reset()
+
+    def reset(self):
+        self._total = 0.0
+        self._previous = None
+
+    def step(self, t, x):
+        if self._previous is not None:
+            self._total = self._total + 0.5 * (x + self._previous[1]) * (t - self._previous[0])
+        self._previous = (t, x)
+        return self._total
+
+    def series(self, t, x):
+        areas = 0.5 * (x[1:] + x[:-1]) * (t[1:] - t[:-1])
+        return np.concatenate(([0.0], np.cumsum(areas))) if len(x) else np.empty(0)
+
+
+_KINDS = {
+    "ema": _Ema,
+    "window_mean": _WindowMean,
+    "window_min": _WindowExtreme,
+    "window_max": _WindowExtreme,
+    "derivative": _Derivative,
+    "integral": _Integral,
+}
+
+
+def _window_length(calculation):
+    window = calculation.get("window")
+    if not isinstance(window, int) or window < 1:
+        raise ValueError(f"{calculation['type']} needs a positive integer 'window'.")
+    return window
+
+
+class DerivedChannels:
+    def __init__(self, definitions):
+        scalars = set()
+        self.channels = [] # (description, source descriptions, scale, state)
+        for definition in definitions:
+            if is_derived(definition):
+                description = definition["description"]
+                calculation = definition["calculation"]
+                sources = calculation.get("source")
+                sources = [sources] if isinstance(sources, str) else list(sources or [])
+                unknown = [s for s in sources if s not in scalars]
+                if not sources or unknown:
+                    raise ValueError(f"Derived channel '{description}' needs sources declared before it, got {unknown or 'none'}.")
+                try:
+                    state = _KINDS[calculation["type"]](calculation)
+                except ValueError as e:
+                    raise ValueError(f"Derived channel '{description}': {e}") from None
+                self.channels.append((description, sources, float(calculation.get("scale", 1.0)), state))
+            if "description" in definition and definition.get("type") != "table":
+                scalars.add(definition["description"])
+
+    def update(self, sample):
+        """Sets sample.values for every derived channel from the sample's values, advancing each channel's state."""
+        values = sample.values
+        for description, sources, scale, state in self.channels:
+            x = values.get(sources[0])
+            for source in sources[1:]:
+                factor = values.get(source)
+                x = None if x is None or factor is None else x * factor
+            if x is None or x != x: # Unavailable or NaN: skip, keeping state
+                values[description] = None
+                continue
+            try:
+                value = state.step(sample.timestamp, float(x))
+            except Exception as e:
+                log.error("Error updating derived channel '%s': %s", description, e)
+                values[description] = None
+                sample.errors.add(description)
+                continue
+            values[description] = None if value is None else value * scale
+
+    def series(self, times, columns):
+        """
+        Derived channels over recorded samples. times and columns ({description: values}) are equal-length arrays
+        with NaN where unavailable, e.g. from lib.data_logger.read_log. Returns {description: values} of every
+        derived channel whose sources are present; recorded columns of derived channels are recomputed, not reused.
+        CsvLogger rounds values to two decimals, so results from a log match the live ones to that precision.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        columns = {name: np.asarray(values, dtype=np.float64) for name, values in columns.items()}
+        derived = {}
+        for description, sources, scale, state in self.channels:
+            if any(s not in columns for s in sources):
+                continue
+            x = columns[sources[0]]
+            for source in sources[1:]:
+                x = x * columns[source]
+            valid = ~np.isnan(x)
+            y = np.full(len(x), np.nan)
+            y[valid] = state.series(times[valid], x[valid]) * scale
+            columns[description] = derived[description] = y
+        return derived
+
+    def reset(self):
+        for _, _, _, state in self.channels:
+            state.reset()
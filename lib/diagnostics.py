@@ -0,0 +1,132 @@
+# lib/diagnostics.py
+
+# Diagnostics for the poll, read/write and map paths, built on the standard logging module under the "ecu"
+# logger. Messages repeated from the same call site are rate limited: the first few in each window pass, the rest
+# are counted and reported as one line ("... repeated 240x in the last 10 s"). Records are kept in a bounded ring
+# for the Diagnostics tab. Call sites log with %-style arguments, so a disabled level costs one level check.
+
+import collections
+import logging
+import sys
+import threading
+import time
+
+ROOT_LOGGER_NAME = "ecu"
+RATE_WINDOW_S = 10.0
+RATE_BURST = 3        # Records per call site and message that pass in each window
+RING_CAPACITY = 1000
+CONSOLE_FORMAT = "%(levelname)s %(name)s: %(message)s"
+
+
+def get_logger(name):
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Passes at most burst records per (call site, message) in each window. When a window with suppressed
+    records ends, the next record from that site carries the count, and flush() reports sites that went quiet.
+    """
+    def __init__(self, window_s=RATE_WINDOW_S, burst=RATE_BURST):
+        super().__init__()
+        self.window_s = window_s
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._sites = {} # key -> [window start, passed, suppressed, logger name, level, message]
+
+    def filter(self, record):
+        decision = getattr(record, "_rate_limited", None)
+        if decision is not None: # Already decided by the first handler that saw the record
+            return decision
+        message = record.getMessage()
+        key = (record.name, record.pathname, record.lineno, message)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or record.created - site[0] >= self.window_s:
+                if site is not None and site[2]:
+                    record.msg, record.args = f"{message} (repeated {site[1] + site[2]}x in the last {record.created - site[0]:.0f} s)", None
+                self._sites[key] = [record.created, 1, 0, record.name, record.levelno, message]
+                decision = True
+            elif site[1] < self.burst:
+                site[1] += 1
+                decision = True
+            else:
+                site[2] += 1
+                decision = False
+        record._rate_limited = decision
+        return decision
+
+    def flush(self, now=None):
+        """Logs a summary for every site whose window has ended with suppressed records, and forgets idle sites."""
+        now = time.time() if now is None else now
+        summaries = []
+        with self._lock:
+            for key, site in list(self._sites.items()):
+                if now - site[0] < self.window_s:
+                    continue
+                if site[2]:
+                    summaries.append((site[3], site[4], f"{site[5]} (repeated {site[1] + site[2]}x in the last {now - site[0]:.0f} s)"))
+                del self._sites[key]
+        for name, level, message in summaries:
+            record = logging.getLogger(name).makeRecord(name, level, "", 0, message, None, None)
+            record._rate_limited = True
+            logging.getLogger(name).handle(record)
+
+
+class RingHandler(logging.Handler):
+    """Keeps the newest records as (time, level name, logger name, message) for display."""
+    def __init__(self, capacity=RING_CAPACITY):
+        super().__init__()
+        self.records = collections.deque(maxlen=capacity)
+        self.version = 0 # Bumped on every record, so a panel can skip redraws when nothing changed
+
+    def emit(self, record):
+        try:
+            self.records.append((record.created, record.levelname, record.name, record.getMessage()))
+            self.version += 1
+        except Exception:
+            self.handleError(record)
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.records)
+
+
+class Diagnostics:
+    """The configured "ecu" logger with its rate limiter, console handler and ring."""
+    def __init__(self, level=logging.INFO, console=True, ring_capacity=RING_CAPACITY):
+        self.logger = logging.getLogger(ROOT_LOGGER_NAME)
+        self.logger.setLevel(level)
+        self.logger.propagate = False
+        self.rate_filter = RateLimitFilter()
+        self.ring = RingHandler(ring_capacity)
+        self.ring.addFilter(self.rate_filter)
+        self.logger.addHandler(self.ring)
+        self.console = None
+        if console:
+            self.console = logging.StreamHandler(sys.stdout)
+            self.console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+            self.console.addFilter(self.rate_filter)
+            self.logger.addHandler(self.console)
+
+    def set_level(self, level):
+        self.logger.setLevel(level)
+
+    def flush(self):
+        self.rate_filter.flush()
+
+    def close(self):
+        for handler in (self.ring, self.console):
+            if handler is not None:
+                self.logger.removeHandler(handler)
+
+
+_diagnostics = None
+
+
+def configure(level=logging.INFO, console=True, ring_capacity=RING_CAPACITY):
+    """Sets up diagnostics once per process and returns the Diagnostics; later calls return the same one."""
+    global _diagnostics
+    if _diagnostics is None:
+        _diagnostics = Diagnostics(level, console, ring_capacity)
+    return _diagnostics
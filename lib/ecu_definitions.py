@@ -10,6 +10,7 @@ MAPTABLE_COLOR_GRADIENT = [
 ECU_DEFINITIONS = [
     {
         "description": "RPM",
+        "symbol": "engine_speed", # Overrides the address when a symbol map defines it
         "address": 0x400015bc,
         "length": 2,  # 2 bytes
         "scale": 0.25,
@@ -21,6 +22,7 @@ ECU_DEFINITIONS = [
     },
     {
         "description": "Load",
+        "symbol": "engine_load",
         "address": 0x400019bc,
         "length": 2, 
         "scale": 1,
@@ -32,6 +34,7 @@ ECU_DEFINITIONS = [
     },
     {
         "description": "Coolant",
+        "symbol": "coolant",
         "address": 0x4000167e,
         "length": 1,
         "scale": 0.625,
@@ -43,6 +46,7 @@ ECU_DEFINITIONS = [
     },
     {
         "description": "Air Temp",
+        "symbol": "air",
         "address": 0x40001682,
         "length": 1,
         "scale": 0.625,
@@ -198,6 +202,60 @@ ECU_DEFINITIONS = [
         "min_val": 0,
         "max_val": 6,
     },
+    {
+        "description": "Vehicle Speed", # Not in polled memory; only available from the broadcast frames below
+        "unit": "km/h",
+        "type": "gauge_bar",
+        "min_val": 0,
+        "max_val": 280,
+    },
+    {
+        "description": "RPM Rate",
+        "unit": "RPM/s",
+        "type": "gauge_chart",
+        "min_val": -4000,
+        "max_val": 4000,
+        "calculation": {    # Stateful derived channel, see lib/derived_channels.py. Sharp drops mark gear changes.
+            "type": "derivative",
+            "source": "RPM",
+        }
+    },
+    {
+        "description": "O2-Bank1 Smoothed",
+        "unit": "v",
+        "type": "gauge_chart",
+        "min_val": 0,
+        "max_val": 1,
+        "calculation": {
+            "type": "ema",
+            "source": "O2-Bank1",
+            "time_constant_s": 0.5,
+        }
+    },
+    {
+        "description": "O2-Bank2 Smoothed",
+        "unit": "v",
+        "type": "gauge_chart",
+        "min_val": 0,
+        "max_val": 1,
+        "calculation": {
+            "type": "ema",
+            "source": "O2-Bank2",
+            "time_constant_s": 0.5,
+        }
+    },
+    {
+        "description": "Fuel Used",
+        "unit": "g",
+        "type": "gauge_bar",
+        "min_val": 0,
+        "max_val": 5000,
+        "calculation": {    # Pulse (us) x RPM / 120 injections per second x 6 injectors x ~5 g/s injector flow
+            "type": "integral",
+            "source": ["Injector Pulse B1", "RPM"],
+            "scale": 1e-6 / 120 * 6 * 5.0,
+        }
+    },
     {
         "description": "Ignition Timing",
         "address": 0x40002cdc,
@@ -366,4 +424,74 @@ ECU_DEFINITIONS = [
             "x_axis": "ECT",
         }
     },
-]
\ No newline at end of file
+]
+
+# Event-triggered logging (lib/trigger_capture.py): when a trigger's condition holds, the pre_s seconds before it and
+# the post_s seconds after it are written to logs/event_<time>_<name>.csv. Condition syntax is in lib/conditions.py.
+LOG_TRIGGERS = [
+    {"name": "Knock", "when": {"channel": "Knock Retard", "above": 2.0}, "pre_s": 5.0, "post_s": 3.0},
+    {"name": "Lean under load", "when": [{"channel": "O2-Bank1", "below": 0.1}, {"channel": "Load", "above": 600}],
+     "pre_s": 5.0, "post_s": 3.0},
+    {"name": "Lean under load", "when": [{"channel": "O2-Bank2", "below": 0.1}, {"channel": "Load", "above": 600}],
+     "pre_s": 5.0, "post_s": 3.0},
+    {"name": "AFR target out of band", "when": {"channel": "AFR Target", "outside": (11.0, 15.5)}},
+    {"name": "Over-rev", "when": {"channel": "RPM", "crosses_above": 6800}, "pre_s": 3.0, "post_s": 2.0},
+]
+
+# Alarms evaluated on every sample by lib/alarms.py. "when" raises, the optional "clear_when" clears (hysteresis;
+# without it the alarm clears when "when" stops holding). on_delay_s / off_delay_s: how long the rule must hold first.
+ALARM_DEFINITIONS = [
+    {"name": "Coolant over temperature", "severity": "critical", "when": {"channel": "Coolant", "above": 110},
+     "clear_when": {"channel": "Coolant", "below": 105}, "on_delay_s": 1.0},
+    {"name": "Coolant hot", "severity": "warning", "when": {"channel": "Coolant", "above": 102},
+     "clear_when": {"channel": "Coolant", "below": 98}, "on_delay_s": 2.0},
+    {"name": "Knock", "severity": "warning", "when": {"channel": "Knock Retard", "above": 2.0}, "off_delay_s": 2.0},
+    {"name": "Heavy knock", "severity": "critical", "when": {"channel": "Knock Retard", "above": 5.0},
+     "on_delay_s": 0.3, "off_delay_s": 3.0},
+    {"name": "Lean under load B1", "severity": "critical",
+     "when": [{"channel": "O2-Bank1", "below": 0.1}, {"channel": "Load", "above": 600}], "on_delay_s": 2.0},
+    {"name": "Lean under load B2", "severity": "critical",
+     "when": [{"channel": "O2-Bank2", "below": 0.1}, {"channel": "Load", "above": 600}], "on_delay_s": 2.0},
+    {"name": "Over-rev", "severity": "critical", "when": {"channel": "RPM", "above": 6800},
+     "clear_when": {"channel": "RPM", "below": 6500}},
+    {"name": "Air temperature high", "severity": "warning", "when": {"channel": "Air Temp", "above": 60},
+     "clear_when": {"channel": "Air Temp", "below": 55}, "on_delay_s": 5.0},
+]
+
+# Frames the ECU broadcasts on the powertrain bus, DBC style, decoded passively by lib/broadcast_decoder.py when
+# listening is enabled. A signal's channel names a gauge above; while its frames keep arriving it is not polled.
+BROADCAST_DEFINITIONS = [
+    {
+        "name": "EngineData",
+        "frame_id": 0x0A0,
+        "cycle_ms": 10,
+        "signals": [
+            {"channel": "RPM", "start_bit": 7, "length": 16, "byte_order": "big_endian", "scale": 0.25},
+            {"channel": "TPS", "start_bit": 23, "length": 16, "byte_order": "big_endian", "scale": 0.0978},
+            {"channel": "PPS", "start_bit": 39, "length": 16, "byte_order": "big_endian", "scale": 0.0978},
+        ],
+    },
+    {
+        "name": "EngineTemperatures",
+        "frame_id": 0x0A2,
+        "cycle_ms": 100,
+        "signals": [
+            {"channel": "Coolant", "start_bit": 7, "length": 8, "byte_order": "big_endian", "scale": 0.625, "offset": -40},
+            {"channel": "Air Temp", "start_bit": 15, "length": 8, "byte_order": "big_endian", "scale": 0.625, "offset": -40},
+        ],
+    },
+    {
+        "name": "VehicleSpeed",
+        "frame_id": 0x0B0,
+        "cycle_ms": 20,
+        "signals": [
+            {"channel": "Vehicle Speed", "start_bit": 0, "length": 16, "byte_order": "little_endian", "scale": 0.01},
+            {"channel": "Gear", "start_bit": 16, "length": 4, "byte_order": "little_endian"},
+        ],
+    },
+]
+
+# Definition sets by firmware ID, as read by lib/firmware_id.py on connect. Addresses above are for P138.
+FIRMWARE_DEFINITION_SETS = {
+    "P138": ECU_DEFINITIONS,
+}
@@ -0,0 +1,102 @@
+# lib/edit_journal.py
+
+# Undo/redo history of memory writes. Each user action is one group of (address, old bytes, new bytes) deltas,
+# trimmed to the bytes that actually changed, so undo and redo replay only those bytes instead of re-reading
+# or rewriting whole maps. The journal keeps to a byte budget by forgetting the oldest undo groups first.
+
+import numpy as np
+
+DEFAULT_BUDGET_BYTES = 4 * 1024 * 1024
+DELTA_OVERHEAD_BYTES = 64 # Rough per-delta cost of the tuple and two bytes objects, counted against the budget
+SPLIT_GAP = 16 # Unchanged runs longer than this split a delta in two; shorter ones are cheaper to keep inline
+
+
+def compact_delta(address, old, new, split_gap=SPLIT_GAP):
+    """Splits one (address, old, new) write into deltas covering only the changed bytes."""
+    old_arr = np.frombuffer(old, dtype=np.uint8)
+    new_arr = np.frombuffer(new, dtype=np.uint8)
+    if len(old_arr) != len(new_arr):
+        raise ValueError("Old and new data must be the same length")
+    changed = np.flatnonzero(old_arr != new_arr)
+    if len(changed) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(changed) > split_gap + 1)
+    starts = np.r_[changed[0], changed[breaks + 1]]
+    ends = np.r_[changed[breaks], changed[-1]] + 1
+    return [(address + int(s), bytes(old[s:e]), bytes(new[s:e])) for s, e in zip(starts, ends)]
+
+
+class EditGroup:
+    """The deltas written by one user action."""
+    def __init__(self, label, deltas):
+        self.label = label
+        self.deltas = deltas
+
+    @property
+    def size_bytes(self):
+        return sum(len(old) + len(new) + DELTA_OVERHEAD_BYTES for address, old, new in self.deltas)
+
+    def address_ranges(self):
+        return [(address, address + len(new)) for address, old, new in self.deltas]
+
+
+class EditJournal:
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self._undo = [] # Oldest first
+        self._redo = [] # Next redo last
+        self._size = 0
+
+    def record(self, label, writes):
+        """Records the (address, old, new) writes of one action. A new action clears the redo history."""
+        deltas = []
+        for address, old, new in writes:
+            deltas.extend(compact_delta(address, old, new))
+        if not deltas:
+            return None
+
+        group = EditGroup(label, deltas)
+        for dropped in self._redo:
+            self._size -= dropped.size_bytes
+        self._redo.clear()
+        self._undo.append(group)
+        self._size += group.size_bytes
+        self._trim()
+        return group
+
+    def _trim(self):
+        # Always keep the newest group, even if it alone is over budget
+        while self._size > self.budget_bytes and len(self._undo) > 1:
+            self._size -= self._undo.pop(0).size_bytes
+        while self._size > self.budget_bytes and self._redo:
+            self._size -= self._redo.pop(0).size_bytes
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def peek_undo(self):
+        return self._undo[-1] if self._undo else None
+
+    def peek_redo(self):
+        return self._redo[-1] if self._redo else None
+
+    def mark_undone(self):
+        """Moves the newest undo group to the redo stack, once its old bytes have been written back."""
+        self._redo.append(self._undo.pop())
+
+    def mark_redone(self):
+        self._undo.append(self._redo.pop())
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._size = 0
+
+    @property
+    def memory_bytes(self):
+        return self._size
@@ -0,0 +1,196 @@
+# lib/engine_simulator.py
+
+# Seeded engine model for the mock source. A driver model picks throttle targets, and everything else follows
+# from them in blocks of samples computed with NumPy: vehicle speed and gear, RPM, airmass load, MAF, fuelling,
+# closed-loop O2/trims, warm-up temperatures and per-cylinder timing with occasional knock. The same seed and
+# rate always produce the same sample sequence, and the latest sample is written into mock memory at the
+# addresses given in ECU_DEFINITIONS, so the GUI, logger and analysis tools see coherent signals.
+#
+# The definitions decode every channel as unsigned, so values below a channel's offset (e.g. negative fuel
+# trims) read back clipped to that offset.
+
+import numpy as np
+
+from lib.ecu_definitions import ECU_DEFINITIONS
+
+DEFAULT_RATE_HZ = 100.0
+
+IDLE_RPM = 800.0
+REDLINE_RPM = 7000.0
+GEAR_RATIOS = np.array([0.0, 120.0, 78.0, 57.0, 45.0, 37.0, 31.0]) # RPM per km/h, index 0 unused
+UPSHIFT_KMH = np.array([25.0, 50.0, 75.0, 100.0, 130.0])           # Speeds at which gears 2-6 are selected
+INJECTOR_FLOW_MG_PER_MS = 6.0
+INJECTOR_DEAD_TIME_US = 450.0
+CYLINDER_TIMING_SPREAD = np.array([0.0, -0.5, 0.25, -0.25, 0.5, -0.75]) # Per-cylinder trim of the base advance
+CYLINDER_KNOCK_SENSITIVITY = np.array([1.0, 0.6, 0.8, 1.2, 0.7, 0.9])
+KNOCK_STEP_DEG = 3.0
+
+
+class _Lag:
+    """
+    First-order lag applied as an exponential FIR over whole blocks, carrying its history between blocks.
+    With normalize=False the kernel is not scaled to unit gain, so isolated impulses decay from their own height.
+    """
+    def __init__(self, tau_s, rate_hz, normalize=True):
+        taps = max(1, int(5 * tau_s * rate_hz))
+        kernel = np.exp(-np.arange(taps) / max(tau_s * rate_hz, 1e-9))
+        self.kernel = kernel / kernel.sum() if normalize else kernel
+        self.normalize = normalize
+        self.history = None
+
+    def apply(self, x):
+        if self.history is None:
+            # Start settled at the first value, or at rest for impulse trains
+            self.history = np.full(len(self.kernel) - 1, x[0] if self.normalize else 0.0)
+        padded = np.concatenate([self.history, x])
+        if len(self.kernel) > 1:
+            self.history = padded[-(len(self.kernel) - 1):]
+        return np.convolve(padded, self.kernel, mode='valid')
+
+
+_STREAMS = ("driver", "pedal", "rpm", "load", "o2_bank1", "o2_bank2", "air", "knock", "session")
+
+
+class EngineSimulator:
+    def __init__(self, seed=0, rate_hz=DEFAULT_RATE_HZ, definitions=None):
+        self.seed = seed
+        self.rate_hz = rate_hz
+        self.definitions = definitions if definitions is not None else ECU_DEFINITIONS
+        # One generator per random input, so the sample sequence does not depend on how it is split into blocks
+        streams = [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(len(_STREAMS))]
+        self._rng = dict(zip(_STREAMS, streams))
+        self.tick = 0 # Samples generated so far
+
+        # Driver model: current throttle target and how many samples it still holds for
+        self._target = 0.0
+        self._target_left = 0
+
+        self._pedal_lag = _Lag(0.15, rate_hz)
+        self._throttle_lag = _Lag(0.05, rate_hz)
+        self._speed_lag = _Lag(6.0, rate_hz)
+        self._knock_decay = _Lag(1.0, rate_hz, normalize=False)
+        self._ltft = self._rng["session"].uniform(-3.0, 3.0, size=2) # Learned trims, fixed for the session
+        self._o2_phase = self._rng["session"].uniform(0, 2 * np.pi, size=2)
+
+        self.latest = {} # description -> latest value (scalar, or array for per-cylinder tables)
+
+    def _throttle_targets(self, n):
+        """Piecewise-constant pedal targets: idle, cruise and acceleration phases of random length."""
+        targets = np.empty(n)
+        filled = 0
+        while filled < n:
+            if self._target_left == 0:
+                driver = self._rng["driver"]
+                phase = driver.choice(3, p=[0.25, 0.5, 0.25])
+                self._target = (0.0, driver.uniform(12, 35), driver.uniform(55, 100))[phase]
+                self._target_left = max(1, int(driver.exponential(4.0) * self.rate_hz))
+            take = min(self._target_left, n - filled)
+            targets[filled:filled + take] = self._target
+            self._target_left -= take
+            filled += take
+        return targets
+
+    def generate(self, n):
+        """Advances the model by n samples. Returns {description: array}, per-cylinder tables as (n, 6) arrays."""
+        t = (self.tick + np.arange(n)) / self.rate_hz
+        self.tick += n
+        noise = lambda stream: self._rng[stream].standard_normal(n)
+
+        pps = np.clip(self._pedal_lag.apply(self._throttle_targets(n)) + 0.2 * noise("pedal"), 0, 100)
+        tps = np.clip(self._throttle_lag.apply(pps), 0, 100)
+
+        # Vehicle speed follows throttle slowly, the gearbox picks a gear for it, and RPM follows from both
+        speed = self._speed_lag.apply(tps * 1.8)
+        gear = 1 + np.searchsorted(UPSHIFT_KMH, speed)
+        rpm = np.clip(np.maximum(IDLE_RPM, speed * GEAR_RATIOS[gear]) + 8.0 * noise("rpm"), IDLE_RPM - 50, REDLINE_RPM)
+        gear = np.where(speed < 3.0, 0, gear) # Neutral when stationary
+
+        # Airmass per stroke rises with throttle, with a volumetric efficiency peak around 4500 RPM
+        ve = 0.8 + 0.2 * np.exp(-((rpm - 4500.0) / 2500.0) ** 2)
+        load = np.clip((90.0 + 720.0 * (tps / 100.0) ** 0.7) * ve + 2.0 * noise("load"), 60, 1000)
+        maf = load * rpm / 20000.0 # g/s: 3 intake strokes per revolution on a V6
+
+        # Open-loop enrichment above 70% of full load, stoichiometric otherwise
+        afr_target = np.where(load > 560.0, 14.7 - (load - 560.0) / 440.0 * 2.4, 14.7)
+
+        # Closed-loop narrowband switching around stoich, pinned rich while enriched
+        closed_loop = afr_target >= 14.69
+        o2, stft = [], []
+        for bank in range(2):
+            wave = np.sin(2 * np.pi * 1.2 * t + self._o2_phase[bank])
+            sensor_noise = 0.02 * noise(f"o2_bank{bank + 1}")
+            o2.append(np.where(closed_loop, 0.45 + 0.35 * np.tanh(4 * wave), 0.85) + sensor_noise)
+            stft.append(np.where(closed_loop, 2.5 * np.sin(2 * np.pi * 1.2 * t + self._o2_phase[bank] - np.pi / 2), 0.0))
+
+        fuel_mg = load / afr_target
+        pulse = [fuel_mg * (1 + (stft[b] + self._ltft[b]) / 100.0) / INJECTOR_FLOW_MG_PER_MS * 1000.0 + INJECTOR_DEAD_TIME_US
+                 for b in range(2)]
+
+        # Warm-up from a cold start, intake air warming slowly with heat soak
+        coolant = 90.0 - 70.0 * np.exp(-t / 300.0)
+        air = 22.0 + 10.0 * (1 - np.exp(-t / 900.0)) + 0.3 * noise("air")
+
+        # Knock events at high load pull timing, recovering over about a second
+        knock_events = (load > 650.0) & (self._rng["knock"].random(n) < 0.3 / self.rate_hz)
+        knock = np.minimum(self._knock_decay.apply(knock_events * KNOCK_STEP_DEG), 10.0)
+        knock_retard = knock[:, np.newaxis] * CYLINDER_KNOCK_SENSITIVITY[np.newaxis, :]
+
+        timing_base = np.clip(10.0 + rpm / 250.0 - load / 40.0, -5.0, 40.0)
+        timing = timing_base[:, np.newaxis] + CYLINDER_TIMING_SPREAD[np.newaxis, :] - knock_retard
+
+        values = {
+            "RPM": rpm, "Load": load, "MAF": maf, "TPS": tps, "PPS": pps,
+            "Injector Pulse B1": pulse[0], "Injector Pulse B2": pulse[1],
+            "O2-Bank1": o2[0], "O2-Bank2": o2[1],
+            "STFT-B1": stft[0], "STFT-B2": stft[1],
+            "LTFT-B1": np.full(n, self._ltft[0]), "LTFT-B2": np.full(n, self._ltft[1]),
+            "AFR Target": afr_target, "Gear": gear.astype(np.float64), "Vehicle Speed": speed,
+            "Coolant": coolant, "Air Temp": air,
+            "Ignition Timing": timing, "Knock Retard": knock_retard,
+        }
+        self.latest = {name: series[-1] for name, series in values.items()}
+        return values
+
+    def advance_to(self, elapsed_s, max_catch_up_s=60.0):
+        """
+        Generates every sample due by elapsed_s since the start. Returns True if there is a new latest sample.
+        After a gap longer than max_catch_up_s (e.g. a suspended laptop) the skipped time is dropped rather than
+        simulated, which shifts the rest of the session but keeps reads fast.
+        """
+        due = int(elapsed_s * self.rate_hz) + 1 - self.tick
+        if due <= 0:
+            return False
+        max_due = int(max_catch_up_s * self.rate_hz)
+        if due > max_due:
+            self.tick += due - max_due
+            due = max_due
+        self.generate(due)
+        return True
+
+    def memory_writes(self):
+        """(address, bytes) encoding the latest sample of every channel in the definitions, as the ECU stores it."""
+        writes = []
+        for definition in self.definitions:
+            value = self.latest.get(definition["description"])
+            if value is None or "address" not in definition:
+                continue
+            if definition["type"] == "table":
+                element_size = definition["element_size"]
+                raw = (np.asarray(value) - np.asarray(definition["offset"])) / definition["scale"]
+            elif definition["description"] in _RAW_FROM_VALUE:
+                element_size = definition["length"]
+                raw = _RAW_FROM_VALUE[definition["description"]](value, self.latest)
+            elif "scale" in definition:
+                element_size = definition["length"]
+                raw = (value - definition["offset"]) / definition["scale"]
+            else:
+                continue
+            raw = np.clip(np.rint(np.atleast_1d(raw)), 0, (1 << (8 * element_size)) - 1)
+            writes.append((definition["address"], raw.astype(f">u{element_size}").tobytes()))
+        return writes
+
+
+# Raw encodings of calculated channels, the inverse of their formula in ECU_DEFINITIONS
+_RAW_FROM_VALUE = {
+    "MAF": lambda maf, latest: maf * 120000.0 / (max(latest["RPM"], 1.0) * 1.5), # MAF_RAW * RPM_VALUE * 1.5 / 120000
+}
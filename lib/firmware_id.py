@@ -0,0 +1,74 @@
+# lib/firmware_id.py
+
+# Identifies the firmware and calibration on the ECU when a source connects. The calibration zone starts with a
+# 4-byte firmware ID (e.g. b"P138") followed by the calibration header, and both come back from one buffer read.
+# The header alone does not change when a calibration is edited or reflashed by another tool, so the fingerprint
+# that keys the map cache (lib/map_cache.py) is the SHA-256 of the identification block and the whole calibration
+# zone, read in buffer-sized chunks. That is a few seconds on a real bus, so the DataManager fingerprints in the
+# background after identify() returns; without a complete fingerprint the map cache is not used.
+
+import hashlib
+
+from lib.memory_zones import CALIBRATION_ZONE
+from lib.transport_timing import MAX_BUFFER_CHUNK
+
+FIRMWARE_ID_LENGTH = 4
+IDENT_LENGTH = 32 # Firmware ID plus calibration header, well inside one 255-byte buffer request
+
+
+class FirmwareIdentity:
+    def __init__(self, firmware_id, fingerprint, address, ident_block=b""):
+        self.firmware_id = firmware_id # e.g. "P138", or None if the ID bytes are not printable
+        self.fingerprint = fingerprint # Hex digest of the calibration contents, None until calibration_fingerprint
+        self.address = address
+        self.ident_block = ident_block
+
+    def __repr__(self):
+        return f"FirmwareIdentity({self.firmware_id!r}, {self.fingerprint[:12] if self.fingerprint else None}...)"
+
+
+def ident_address(sym_map=None):
+    """Start of the identification block: the cal_base symbol when the symbol map has it, else the calibration zone."""
+    if sym_map is not None:
+        try:
+            return sym_map.get_sym_addr("cal_base")
+        except KeyError:
+            pass
+    return CALIBRATION_ZONE[1]
+
+
+def parse_identity(raw, address, fingerprint=None):
+    firmware_bytes = bytes(raw[:FIRMWARE_ID_LENGTH])
+    printable = all(0x20 <= b < 0x7F for b in firmware_bytes)
+    firmware_id = firmware_bytes.decode('ascii') if printable else None
+    return FirmwareIdentity(firmware_id, fingerprint, address, bytes(raw))
+
+
+def calibration_fingerprint(data_manager, identity, stop=None):
+    """
+    SHA-256 hex digest of the identification block and the calibration zone, or None if any chunk fails to read
+    or stop (a threading.Event) is set.
+    """
+    _, base, size, _ = CALIBRATION_ZONE
+    digest = hashlib.sha256(identity.ident_block)
+    for offset in range(0, size, MAX_BUFFER_CHUNK):
+        if stop is not None and stop.is_set():
+            return None
+        length = min(MAX_BUFFER_CHUNK, size - offset)
+        chunk = data_manager.read_data(base + offset, length)
+        if chunk is None or len(chunk) != length:
+            return None
+        digest.update(bytes(chunk))
+    return digest.hexdigest()
+
+
+def identify(data_manager):
+    """
+    Reads the identification block in one request. Returns a FirmwareIdentity without a fingerprint, or None if
+    the read fails.
+    """
+    address = ident_address(data_manager.sym_map)
+    raw = data_manager.read_data(address, IDENT_LENGTH)
+    if raw is None or len(raw) != IDENT_LENGTH:
+        return None
+    return parse_identity(raw, address)
@@ -0,0 +1,132 @@
+# lib/history_tiers.py
+
+# Multi-resolution history for long trend views. Recent data stays at full resolution in the ChannelHistory
+# ring; this keeps progressively coarser min/mean/max buckets (1 s, 10 s, 1 min by default) for older data.
+# Only the finest tier sees raw samples, each completed bucket is folded into the next tier, so an append is O(1).
+
+import math
+
+import numpy as np
+
+# (bucket length in seconds, number of buckets kept): 30 min of 1 s, 3 h of 10 s and 24 h of 1 min buckets
+DEFAULT_TIERS = ((1.0, 1800), (10.0, 1080), (60.0, 1440))
+
+
+class AggregateTier:
+    """Ring buffer of fixed-length time buckets holding the min, mean and max of the samples in each bucket."""
+    def __init__(self, bucket_s, capacity):
+        self.bucket_s = bucket_s
+        self.capacity = capacity
+        self.starts = np.empty(capacity, dtype=np.float64)
+        self.mins = np.empty(capacity, dtype=np.float64)
+        self.means = np.empty(capacity, dtype=np.float64)
+        self.maxs = np.empty(capacity, dtype=np.float64)
+        self._head = 0
+        self.count = 0
+
+        # Bucket currently being accumulated
+        self._start = None
+        self._min = math.inf
+        self._max = -math.inf
+        self._sum = 0.0
+        self._n = 0
+
+        self.next_tier = None # Receives each completed bucket
+
+    @property
+    def span_s(self):
+        return self.bucket_s * self.capacity
+
+    def add(self, timestamp, minimum, maximum, total, n):
+        """Folds an aggregate (or a single sample with n=1) into the bucket containing timestamp."""
+        bucket_start = math.floor(timestamp / self.bucket_s) * self.bucket_s
+        if self._start is None:
+            self._start = bucket_start
+        elif bucket_start != self._start:
+            self._complete_bucket()
+            self._start = bucket_start
+
+        if n:
+            if minimum < self._min:
+                self._min = minimum
+            if maximum > self._max:
+                self._max = maximum
+            self._sum += total
+            self._n += n
+
+    def _complete_bucket(self):
+        i = self._head
+        self.starts[i] = self._start
+        if self._n:
+            self.mins[i] = self._min
+            self.means[i] = self._sum / self._n
+            self.maxs[i] = self._max
+        else:
+            self.mins[i] = self.means[i] = self.maxs[i] = np.nan # Bucket with no valid samples leaves a gap
+        self._head = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+        if self.next_tier is not None:
+            self.next_tier.add(self._start, self._min, self._max, self._sum, self._n)
+
+        self._min = math.inf
+        self._max = -math.inf
+        self._sum = 0.0
+        self._n = 0
+
+    def clear(self):
+        self._head = 0
+        self.count = 0
+        self._start = None
+        self._min = math.inf
+        self._max = -math.inf
+        self._sum = 0.0
+        self._n = 0
+
+    def window(self, t_start, t_end):
+        """
+        Returns (starts, mins, means, maxs) for buckets starting in [t_start - bucket_s, t_end], oldest first,
+        including the bucket still being accumulated.
+        """
+        if self.count < self.capacity:
+            order = np.arange(self.count)
+        else:
+            order = np.r_[self._head:self.capacity, 0:self._head]
+        starts = self.starts[order]
+        lo = int(np.searchsorted(starts, t_start - self.bucket_s, side='left'))
+        hi = int(np.searchsorted(starts, t_end, side='right'))
+        columns = [starts[lo:hi], self.mins[order][lo:hi], self.means[order][lo:hi], self.maxs[order][lo:hi]]
+
+        if self._start is not None and self._n and t_start - self.bucket_s <= self._start <= t_end:
+            partial = (self._start, self._min, self._sum / self._n, self._max)
+            columns = [np.append(column, value) for column, value in zip(columns, partial)]
+        return tuple(columns)
+
+
+class TieredHistory:
+    """Cascade of AggregateTiers, finest first."""
+    def __init__(self, tiers=DEFAULT_TIERS):
+        self.tiers = [AggregateTier(bucket_s, capacity) for bucket_s, capacity in tiers]
+        for finer, coarser in zip(self.tiers, self.tiers[1:]):
+            finer.next_tier = coarser
+
+    def append(self, timestamp, value):
+        if value != value: # NaN still advances the bucket so gaps show up
+            self.tiers[0].add(timestamp, 0.0, 0.0, 0.0, 0)
+        else:
+            self.tiers[0].add(timestamp, value, value, value, 1)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def select_tier(self, window_s, max_buckets):
+        """Finest tier that covers window_s with no more than max_buckets buckets, else the coarsest."""
+        for tier in self.tiers:
+            if tier.span_s >= window_s and window_s / tier.bucket_s <= max_buckets:
+                return tier
+        return self.tiers[-1]
+
+    def memory_bytes(self):
+        return sum(t.starts.nbytes + t.mins.nbytes + t.means.nbytes + t.maxs.nbytes for t in self.tiers)
@@ -0,0 +1,178 @@
+# lib/map_cache.py
+
+# Local cache of raw maptable blocks (axes and data), one JSON file per calibration fingerprint under map_cache/.
+# Reconnecting to a car whose calibration was seen before serves every map from the cache instead of the bus.
+# The fingerprint covers the whole flash calibration (lib/firmware_id.py), but maps are read from RAM, which only
+# matches flash until it is edited and is back to flash after a power cycle. So only unedited maps are cached: the
+# DataManager reports every successful write, which evicts the blocks it overlaps and records the range as edited,
+# and blocks overlapping an edited range are not cached again until the cache is cleared. Only the most recently
+# saved calibrations are kept.
+#
+# Blocks are added from the map loader thread and evicted from whichever thread writes, so all state is guarded by
+# one lock. Changes are written to disk by flush(), once per map load or write transaction, not per block.
+#
+# Fingerprinting reads the whole calibration zone and runs in the background, so a cache is created unbound on
+# connect: until bind() gives it the fingerprint it serves and stores nothing, but still records edited ranges.
+
+import bisect
+import json
+import os
+import tempfile
+import threading
+
+from lib.diagnostics import get_logger
+
+log = get_logger("map_cache")
+
+DEFAULT_CACHE_ROOT = "map_cache"
+MAX_CACHED_CALIBRATIONS = 16
+
+
+class MapCache:
+    def __init__(self, fingerprint=None, firmware_id=None, root=DEFAULT_CACHE_ROOT):
+        self.fingerprint = None
+        self.firmware_id = firmware_id
+        self.root = root
+        self.path = None
+        self._blocks = {} # address -> bytes
+        self._edited = [] # Sorted, disjoint [start, end) ranges written since the cache was created
+        self._dirty = False # True when blocks or edited ranges changed since the last save
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        if fingerprint is not None:
+            self.bind(fingerprint)
+
+    @property
+    def is_bound(self):
+        return self.fingerprint is not None
+
+    def bind(self, fingerprint):
+        """Keys the cache by the calibration fingerprint and loads what was cached for it before."""
+        with self._lock:
+            self.fingerprint = fingerprint
+            self.path = os.path.join(self.root, f"{fingerprint}.json")
+            edited, self._edited = self._edited, []
+            self._load()
+            for start, end in edited: # Writes made before the fingerprint was known
+                for address, block in list(self._blocks.items()):
+                    if address < end and start < address + len(block):
+                        del self._blocks[address]
+                self._add_edited(start, end)
+                self._dirty = True
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                stored = json.load(f)
+            self._blocks = {int(address, 16): bytes.fromhex(data) for address, data in stored["blocks"].items()}
+            self._edited = [[int(start, 16), int(end, 16)] for start, end in stored.get("edited", [])]
+            log.info("%d cached blocks for calibration %s.", len(self._blocks), self.fingerprint[:12])
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("Ignoring unreadable cache '%s': %s", self.path, e)
+            self._blocks = {}
+            self._edited = []
+
+    def flush(self):
+        """Saves the cache if it changed since the last save. Returns False, after logging why, if saving failed."""
+        with self._lock:
+            if not self._dirty or not self.is_bound:
+                return True
+            try:
+                self.save()
+            except OSError as e:
+                log.warning("Failed to save map cache '%s': %s", self.path, e)
+                return False
+            return True
+
+    def save(self):
+        with self._lock:
+            new_file = not os.path.exists(self.path)
+            os.makedirs(self.root, exist_ok=True)
+            stored = {
+                "fingerprint": self.fingerprint,
+                "firmware_id": self.firmware_id,
+                "blocks": {f"0x{address:08X}": data.hex() for address, data in sorted(self._blocks.items())},
+                "edited": [[f"0x{start:08X}", f"0x{end:08X}"] for start, end in self._edited],
+            }
+            # A temporary file of its own, so another process saving the same calibration cannot collide with it
+            fd, temp_path = tempfile.mkstemp(prefix=f"{self.fingerprint[:12]}.", suffix=".tmp", dir=self.root)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(stored, f, indent=1)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            self._dirty = False
+            if new_file:
+                self._prune()
+
+    def _prune(self):
+        """Removes the least recently saved calibrations beyond MAX_CACHED_CALIBRATIONS."""
+        paths = [os.path.join(self.root, name) for name in os.listdir(self.root) if name.endswith(".json")]
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[MAX_CACHED_CALIBRATIONS:]:
+            if path != self.path:
+                os.remove(path)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._blocks)
+
+    def get(self, address, length):
+        """Cached bytes of a block read before with the same address and length, or None."""
+        with self._lock:
+            data = self._blocks.get(address)
+            if data is None or len(data) != length:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return data
+
+    def put(self, address, data):
+        """Caches a block read from the ECU, unless it overlaps a range edited since the cache was created."""
+        with self._lock:
+            if not self.is_bound or self._is_edited(address, address + len(data)):
+                return
+            self._blocks[address] = bytes(data)
+            self._dirty = True
+
+    def apply_write(self, address, data):
+        """Write listener: evicts every cached block the written bytes overlap and records the range as edited."""
+        end = address + len(data)
+        with self._lock:
+            for start, block in list(self._blocks.items()):
+                if start < end and address < start + len(block):
+                    del self._blocks[start]
+            self._add_edited(address, end)
+            self._dirty = True
+
+    def _is_edited(self, start, end):
+        index = bisect.bisect_right(self._edited, [start, float('inf')])
+        if index and self._edited[index - 1][1] > start:
+            return True
+        return index < len(self._edited) and self._edited[index][0] < end
+
+    def _add_edited(self, start, end):
+        """Merges [start, end) into the edited ranges, joining ranges it overlaps or touches."""
+        lo = bisect.bisect_left(self._edited, [start, start])
+        if lo and self._edited[lo - 1][1] >= start:
+            lo -= 1
+        hi = lo
+        while hi < len(self._edited) and self._edited[hi][0] <= end:
+            hi += 1
+        if lo < hi:
+            start, end = min(start, self._edited[lo][0]), max(end, self._edited[hi - 1][1])
+        self._edited[lo:hi] = [[start, end]]
+
+    def clear(self):
+        with self._lock:
+            self._blocks = {}
+            self._edited = []
+            self._dirty = False
+            if self.path is not None and os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,81 @@
+# lib/map_codec.py
+
+# Vectorised conversion between raw ECU bytes and scaled maptable/axis values.
+# All maptable and axis elements are unsigned big-endian integers.
+
+import numpy as np
+
+_DTYPES = {1: '>u1', 2: '>u2', 4: '>u4'}
+
+
+def element_dtype(element_size):
+    try:
+        return np.dtype(_DTYPES[element_size])
+    except KeyError:
+        raise ValueError(f"Unsupported element size: {element_size}")
+
+
+def decode_block(raw_bytes, element_size, scale, offset):
+    """Decodes a block of unsigned big-endian elements to scaled float64 values (raw * scale + offset)."""
+    raw = np.frombuffer(raw_bytes, dtype=element_dtype(element_size))
+    return raw.astype(np.float64) * scale + offset
+
+
+def encode_block(scaled_values, reverse_scale, reverse_offset, element_size):
+    """
+    Quantises scaled values back to raw bytes: round((value - reverse_offset) * reverse_scale), clamped to the
+    element's unsigned range. This is the single conversion path used for every maptable write.
+    """
+    dtype = element_dtype(element_size)
+    raw = np.rint((np.asarray(scaled_values, dtype=np.float64) - reverse_offset) * reverse_scale)
+    raw = np.clip(raw, 0, np.iinfo(dtype).max)
+    return raw.astype(dtype).tobytes()
+
+
+def data_block_length(definition):
+    return definition["data_rows"] * definition["data_cols"] * definition["data_element_size"]
+
+
+def axis_block(definition, axis):
+    """(address, length, element_size, scale, offset) of a maptable axis ('x_axis' or 'y_axis'), or None if undefined."""
+    if f"{axis}_address" not in definition:
+        return None
+    return (
+        definition[f"{axis}_address"],
+        definition[f"{axis}_length"],
+        definition[f"{axis}_element_size"],
+        definition[f"{axis}_scale"],
+        definition[f"{axis}_offset"],
+    )
+
+
+class DecodedMap:
+    """Axes and data of one maptable decoded to scaled NumPy arrays. Parts that failed to read are None."""
+    def __init__(self, definition, x_axis=None, y_axis=None, data=None, raw_data=None):
+        self.definition = definition
+        self.x_axis = x_axis       # 1D array, or None if the read failed
+        self.y_axis = y_axis       # 1D array, or None if the read failed or the map has no Y axis
+        self.data = data           # 2D array (rows x cols), or None if the read failed
+        self.raw_data = raw_data   # bytes of the data block as read
+
+    @property
+    def has_y_axis(self):
+        return "y_axis_address" in self.definition
+
+
+def decode_axis(definition, axis, raw_bytes):
+    address, length, element_size, scale, offset = axis_block(definition, axis)
+    if raw_bytes is None or len(raw_bytes) != length:
+        return None
+    return decode_block(raw_bytes, element_size, scale, offset)
+
+
+def decode_map_data(definition, raw_bytes):
+    if raw_bytes is None or len(raw_bytes) != data_block_length(definition):
+        return None
+    values = decode_block(raw_bytes, definition["data_element_size"], definition["data_scale"], definition["data_offset"])
+    return values.reshape(definition["data_rows"], definition["data_cols"])
+
+
+def encode_map_data(definition, scaled_values):
+    return encode_block(scaled_values, definition["data_reverse_scale"], definition["data_reverse_offset"], definition["data_element_size"])
@@ -0,0 +1,75 @@
+# lib/map_loader.py
+
+# Reads and decodes one maptable (X axis, Y axis, data block) off the GUI thread. Reads are issued in
+# buffer-sized chunks so a cancelled job stops at the next chunk and other bus users are not held off
+# for the whole block. Blocks found in the DataManager's map cache for the connected calibration are not
+# read at all, and axes shared by several maps come from its axis cache after the first read.
+
+import threading
+
+from lib.map_codec import DecodedMap, data_block_length, decode_map_data
+from lib.transport_timing import MAX_BUFFER_CHUNK
+
+READ_CHUNK_SIZE = MAX_BUFFER_CHUNK # One buffer request per chunk
+
+
+class MapLoadCancelled(Exception):
+    pass
+
+
+class MapLoadJob:
+    def __init__(self, definition, data_manager):
+        self.definition = definition
+        self.data_manager = data_manager
+        self._cancel_event = threading.Event()
+        self.result = None # DecodedMap once run() completes
+        self.error = None  # Exception raised by run(), if any
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        """Reads and decodes the map. Raises MapLoadCancelled if cancel() is called while reading."""
+        definition = self.definition
+
+        axis_cache = self.data_manager.axis_cache
+        try:
+            x_axis = axis_cache.axis(definition, "x_axis", self._read_block)
+            y_axis = axis_cache.axis(definition, "y_axis", self._read_block)
+            data_raw = self._read_block(definition["data_address"], data_block_length(definition))
+        finally:
+            self.data_manager.flush_map_cache() # Blocks read by this load are saved together
+
+        self.result = DecodedMap(
+            definition,
+            x_axis=x_axis,
+            y_axis=y_axis,
+            data=decode_map_data(definition, data_raw),
+            raw_data=data_raw,
+        )
+        return self.result
+
+    def _read_block(self, address, length):
+        """Reads a block chunk by chunk, returns None if any chunk fails."""
+        cache = self.data_manager.map_cache
+        if cache is not None:
+            cached = cache.get(address, length)
+            if cached is not None:
+                return cached
+
+        data = bytearray()
+        while len(data) < length:
+            if self.cancelled:
+                raise MapLoadCancelled(f"Load of '{self.definition['description']}' cancelled.")
+            chunk_size = min(READ_CHUNK_SIZE, length - len(data))
+            chunk = self.data_manager.read_data(address + len(data), chunk_size)
+            if chunk is None or len(chunk) != chunk_size:
+                return None
+            data.extend(chunk)
+        if cache is not None:
+            cache.put(address, data)
+        return bytes(data)
@@ -0,0 +1,192 @@
+# lib/map_transforms.py
+
+# Vectorised bulk edits on decoded maptable arrays. Every transform takes the scaled 2D values and a boolean
+# selection mask of the same shape, and returns a new array in which only the selected cells have changed.
+# Quantisation back to raw bytes goes through lib.map_codec.encode_map_data, and changed_runs turns the old and
+# new raw blocks into one write per run of changed elements, so unchanged cells are never written from a copy.
+
+import numpy as np
+
+
+def selection_mask(shape, ranges=None):
+    """Boolean mask from (top_row, bottom_row, left_col, right_col) inclusive ranges; the whole map if ranges is None."""
+    if ranges is None:
+        return np.ones(shape, dtype=bool)
+    mask = np.zeros(shape, dtype=bool)
+    for top, bottom, left, right in ranges:
+        mask[top:bottom + 1, left:right + 1] = True
+    return mask
+
+
+def _bounding_boxes(mask):
+    """Inclusive (top, bottom, left, right) boxes of the selection, one per run of selected rows with identical columns."""
+    boxes = []
+    rows = np.flatnonzero(mask.any(axis=1))
+    for r in rows:
+        cols = np.flatnonzero(mask[r])
+        box = (r, r, int(cols[0]), int(cols[-1]))
+        if boxes and boxes[-1][1] == r - 1 and boxes[-1][2:] == box[2:]:
+            boxes[-1] = (boxes[-1][0], r, box[2], box[3])
+        else:
+            boxes.append(box)
+    return boxes
+
+
+def apply_where(values, mask, new_values):
+    return np.where(mask, new_values, values)
+
+
+def increment(values, mask, amount):
+    return apply_where(values, mask, values + amount)
+
+
+def decrement(values, mask, amount):
+    return apply_where(values, mask, values - amount)
+
+
+def scale(values, mask, factor):
+    return apply_where(values, mask, values * factor)
+
+
+def set_value(values, mask, value):
+    return apply_where(values, mask, value)
+
+
+def clamp(values, mask, minimum, maximum):
+    return apply_where(values, mask, np.clip(values, minimum, maximum))
+
+
+# Simple per-cell operations taking one value, by the names the GUI buttons use
+OPERATIONS = {
+    "increment": increment,
+    "decrement": decrement,
+    "scale": scale,
+    "set": set_value,
+}
+
+
+def blend(values, mask, target, factor):
+    """Moves the selected cells factor (0..1) of the way toward the same cells of target."""
+    target = np.asarray(target, dtype=np.float64)
+    if target.shape != values.shape:
+        raise ValueError(f"Blend target shape {target.shape} does not match map shape {values.shape}")
+    return apply_where(values, mask, values + (target - values) * factor)
+
+
+def gaussian_kernel(sigma, radius=None):
+    if sigma <= 0:
+        return np.ones(1)
+    if radius is None:
+        radius = max(1, int(np.ceil(2 * sigma)))
+    x = np.arange(-radius, radius + 1, dtype=np.float64)
+    kernel = np.exp(-0.5 * (x / sigma) ** 2)
+    return kernel / kernel.sum()
+
+
+def _convolve_axis(values, kernel, axis):
+    radius = len(kernel) // 2
+    pad = [(0, 0), (0, 0)]
+    pad[axis] = (radius, radius)
+    padded = np.pad(values, pad, mode='edge') # Edge cells are smoothed against themselves, not against zero
+    length = values.shape[axis]
+    out = np.zeros_like(values)
+    for i, weight in enumerate(kernel):
+        out += weight * (padded[i:i + length, :] if axis == 0 else padded[:, i:i + length])
+    return out
+
+
+def smooth(values, mask, sigma=1.0, kernel=None):
+    """Separable kernel smoothing (Gaussian by default) of the selected cells, using neighbouring cells as input."""
+    if kernel is None:
+        kernel = gaussian_kernel(sigma)
+    kernel = np.asarray(kernel, dtype=np.float64)
+    if kernel.ndim == 1:
+        smoothed = _convolve_axis(_convolve_axis(values, kernel, 0), kernel, 1)
+    else:
+        # Arbitrary 2D kernel, summed over shifted views of the edge-padded map
+        ry, rx = kernel.shape[0] // 2, kernel.shape[1] // 2
+        padded = np.pad(values, ((ry, ry), (rx, rx)), mode='edge')
+        smoothed = np.zeros_like(values)
+        rows, cols = values.shape
+        for i in range(kernel.shape[0]):
+            for j in range(kernel.shape[1]):
+                smoothed += kernel[i, j] * padded[i:i + rows, j:j + cols]
+        smoothed /= kernel.sum()
+    return apply_where(values, mask, smoothed)
+
+
+def _axis_positions(axis_values, start, stop):
+    """Fractional positions 0..1 across [start, stop] from axis breakpoints, or evenly spaced if unavailable."""
+    count = stop - start + 1
+    if count == 1:
+        return np.zeros(1)
+    if axis_values is not None and len(axis_values) >= stop + 1:
+        segment = np.asarray(axis_values[start:stop + 1], dtype=np.float64)
+        span = segment[-1] - segment[0]
+        if span != 0:
+            return (segment - segment[0]) / span
+    return np.linspace(0.0, 1.0, count)
+
+
+def interpolate_bilinear(values, mask, x_axis=None, y_axis=None):
+    """
+    Replaces each selected rectangle with a bilinear surface through its four corner cells.
+    Positions follow the axis breakpoints when given, so non-uniform RPM/load spacing is respected.
+    """
+    result = values.copy()
+    for top, bottom, left, right in _bounding_boxes(mask):
+        u = _axis_positions(x_axis, left, right)[np.newaxis, :]
+        v = _axis_positions(y_axis, top, bottom)[:, np.newaxis]
+        top_left, top_right = values[top, left], values[top, right]
+        bottom_left, bottom_right = values[bottom, left], values[bottom, right]
+        surface = (top_left * (1 - u) * (1 - v) + top_right * u * (1 - v) +
+                   bottom_left * (1 - u) * v + bottom_right * u * v)
+        result[top:bottom + 1, left:right + 1] = surface
+    return apply_where(values, mask, result)
+
+
+def fill_linear(values, mask, along="rows", x_axis=None, y_axis=None):
+    """Linear fill between the first and last selected cell of each row ('rows') or column ('cols')."""
+    result = values.copy()
+    for top, bottom, left, right in _bounding_boxes(mask):
+        if along == "rows":
+            t = _axis_positions(x_axis, left, right)[np.newaxis, :]
+            start = values[top:bottom + 1, left][:, np.newaxis]
+            end = values[top:bottom + 1, right][:, np.newaxis]
+        else:
+            t = _axis_positions(y_axis, top, bottom)[:, np.newaxis]
+            start = values[top, left:right + 1][np.newaxis, :]
+            end = values[bottom, left:right + 1][np.newaxis, :]
+        result[top:bottom + 1, left:right + 1] = start + (end - start) * t
+    return apply_where(values, mask, result)
+
+
+def minimal_write_span(old_raw, new_raw):
+    """
+    Returns (offset, bytes) covering the first to the last differing byte of two equal-length blocks,
+    or None if they are identical.
+    """
+    old = np.frombuffer(old_raw, dtype=np.uint8)
+    new = np.frombuffer(new_raw, dtype=np.uint8)
+    if len(old) != len(new):
+        raise ValueError("Blocks must be the same length")
+    changed = np.flatnonzero(old != new)
+    if len(changed) == 0:
+        return None
+    first, last = int(changed[0]), int(changed[-1])
+    return first, bytes(new_raw[first:last + 1])
+
+
+def changed_runs(old_raw, new_raw, element_size=1):
+    """
+    Returns [(offset, bytes)] of every run of consecutive elements that differ between two equal-length blocks,
+    each covering whole elements of element_size bytes. Empty if the blocks are identical.
+    """
+    old = np.frombuffer(old_raw, dtype=np.uint8)
+    new = np.frombuffer(new_raw, dtype=np.uint8)
+    if len(old) != len(new) or len(old) % element_size:
+        raise ValueError("Blocks must be the same length, a whole number of elements")
+    changed = (old != new).reshape(-1, element_size).any(axis=1)
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], changed, [False])).astype(np.int8)))
+    return [(int(start) * element_size, bytes(new_raw[start * element_size:end * element_size]))
+            for start, end in zip(edges[0::2], edges[1::2])]
@@ -0,0 +1,19 @@
+# lib/memory_zones.py
+
+# T6e memory layout, shared by the CAN and mock communicators, snapshots and offline editing.
+# Kept free of any python-can import.
+
+# (name, base address, size, dump file name)
+ZONES = [
+    ("T6: L0-L1 (Bootloader)", 0x00000000, 0x010000, "bootldr.bin"), # Don't touch
+    ("T6: L2 (Learned)"      , 0x00010000, 0x00C000, "decram.bin"), # Adaptation values
+    ("T6: L3 (Coding)"       , 0x0001C000, 0x004000, "coding.bin"), # Coding values
+    ("T6: L4 (Calibration)"  , 0x00020000, 0x010000, "calrom.bin"), # Calibration (tuning) values
+    ("T6: M0-H3 (Program)"   , 0x00040000, 0x0C0000, "prog.bin"), # Program data, modify for patches
+    ("T6: RAM (Main RAM)"    , 0x40000000, 0x010000, "calram.bin"), # SRAM data
+    ("T6: L0-H3 (Full ROM)"  , 0x00000000, 0x100000, "dump.bin")
+]
+
+CALIBRATION_ZONE = ZONES[3]
+RAM_ZONE = ZONES[5]
+
@@ -2,11 +2,25 @@
 
 # This facilitates mock access to ECU SRAM, allows development and testing of UI without connection to ECU.
 # To mockup the UI on a specific car the user must download calram (ECU memory) using LotusECU-T4e
+# The image is memory-mapped rather than read in, so even the 1 MB full ROM opens instantly. Reads return
+# memoryview slices of the mapping (copy with bytes() to keep them), and with persist=True writes go
+# straight to the file, which is how the offline-edit source keeps its edits across restarts.
 
+import hashlib
+import mmap
 import random
 import os
+import time
+
+from lib.diagnostics import get_logger
+from lib.firmware_id import IDENT_LENGTH, ident_address
+from lib.memory_zones import RAM_ZONE, ZONES
+from lib.transport_timing import TransportEmulator, TransportTimeout
+
+log = get_logger("mock")
 
 BO_BE = 'big'
+MOCK_FIRMWARE_ID = b"P138"
 
 class ECUException(Exception):
     pass
@@ -15,26 +29,115 @@ class MockLiveTuningAccess:
     def __init__(self):
         self.mock_memory = {}
         self.sym_map = None
-        self.sram_content = bytearray()
-        self.sram_base_addr = 0x40000000
+        self.sram_content = bytearray() # mmap of the image file, or a bytearray if the file could not be mapped
+        self.sram_base_addr = RAM_ZONE[1]
+        self._set_sram(self.sram_content)
+        self._sram_file = None
+        self.transport = None # TransportEmulator when emulating CAN timing, None to answer instantly
+        self.simulator = None # EngineSimulator writing live channels into SRAM, None for static memory
+        self._simulation_start = None
+        self._random = random.Random(0) # Filler for reads outside SRAM, seeded so sessions are repeatable
+        self._ident_block = MOCK_FIRMWARE_ID + bytes(IDENT_LENGTH - len(MOCK_FIRMWARE_ID))
         self.bus = None
+        self.frame_handler = None  # Called with (arbitration ID, data) for broadcast frames, as on the real bus
+        self.broadcast_messages = [] # BroadcastMessages to emit while the engine simulator runs
+        self._broadcast_sent = {}    # frame ID -> monotonic time the last frame was emitted
 
     def set_sym_map(self, sym_map_obj):
         self.sym_map = sym_map_obj
 
-    def load_sram_content(self, filepath): # Loads binary into mock SRAM
+    def set_simulator(self, simulator):
+        """Drives the live channels in SRAM from an EngineSimulator, or None to leave memory static."""
+        self.simulator = simulator
+        self._simulation_start = time.monotonic()
+
+    def _update_simulation(self):
+        if self.simulator.advance_to(time.monotonic() - self._simulation_start):
+            for address, data in self.simulator.memory_writes():
+                self._write_sram(address, data)
+
+    def set_broadcast(self, messages):
+        """Emits these BroadcastMessages, carrying the simulator's values, for drain_broadcast to deliver."""
+        self.broadcast_messages = list(messages)
+        self._broadcast_sent.clear()
+
+    def drain_broadcast(self):
+        """
+        Delivers the broadcast frames due since the last call to frame_handler. Only the newest frame of each
+        message is generated, which is all a listener keeps. A static image has no running engine, so nothing is
+        broadcast without the simulator. Like real broadcast traffic, this bypasses the emulated request transport.
+        """
+        if self.simulator is None or self.frame_handler is None:
+            return
+        self._update_simulation()
+        now = time.monotonic()
+        for message in self.broadcast_messages:
+            if now - self._broadcast_sent.get(message.frame_id, -1e9) >= message.cycle_s:
+                self._broadcast_sent[message.frame_id] = now
+                self.frame_handler(message.frame_id, message.encode(self.simulator.latest))
+
+    def set_transport_profile(self, profile):
+        """Emulates the latency, bandwidth and losses of a real bus (a TransportProfile), or None to disable."""
+        self.transport = TransportEmulator(profile) if profile is not None else None
+
+    def load_sram_content(self, filepath, persist=False, base_address=None):
+        """
+        Maps an image file as mock memory. persist=True writes edits back to the file, otherwise they stay in
+        memory (copy-on-write) like a live ECU's RAM. base_address defaults to the zone whose dump file name
+        matches the file (calrom.bin -> 0x20000, calram.bin -> 0x40000000), or the RAM zone.
+        """
+        self._release_sram()
+        # A calibration header per image, so each gets its own fingerprint and map cache. Without persist the
+        # edits vanish at the end of the session like a power-cycled ECU's RAM, so every session is a new calibration.
+        size = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+        session = "" if persist else os.urandom(8).hex()
+        header = hashlib.sha256(f"{os.path.abspath(filepath)}:{size}:{session}".encode())
+        self._ident_block = (MOCK_FIRMWARE_ID + header.digest())[:IDENT_LENGTH]
+        if base_address is None:
+            file_name = os.path.basename(filepath).lower()
+            zone = next((z for z in ZONES if z[3] == file_name), RAM_ZONE)
+            base_address = zone[1]
+        self.sram_base_addr = base_address
+
         if not os.path.exists(filepath):
-            print(f"DEBUG MODE: SRAM file not found at {filepath}. Initializing with 2KB empty data.")
-            self.sram_content = bytearray(2048)
+            zone_size = next((z[2] for z in ZONES if z[1] == base_address), 2048)
+            print(f"DEBUG MODE: SRAM file not found at {filepath}. Initializing with {zone_size} bytes of empty data.")
+            self._set_sram(bytearray(zone_size))
             return
 
         try:
-            with open(filepath, 'rb') as f:
-                self.sram_content = bytearray(f.read())
-            print(f"DEBUG MODE: Loaded {len(self.sram_content)} bytes of SRAM content from {filepath}.")
+            self._sram_file = open(filepath, 'r+b' if persist else 'rb')
+            access = mmap.ACCESS_WRITE if persist else mmap.ACCESS_COPY
+            self._set_sram(mmap.mmap(self._sram_file.fileno(), 0, access=access))
+            print(f"DEBUG MODE: Mapped {len(self.sram_content)} bytes of SRAM content from {filepath} at 0x{base_address:08X}"
+                  f"{' (edits saved to file)' if persist else ''}.")
         except Exception as e:
             print(f"DEBUG MODE: Error loading SRAM content from {filepath}: {e}")
-            self.sram_content = bytearray(2048)
+            self._release_sram()
+            self._set_sram(bytearray(2048))
+
+    def _set_sram(self, content):
+        self.sram_content = content
+        self._sram_view = memoryview(content)
+        self._sram_read_view = self._sram_view.toreadonly() # Handed out by read_memory, so callers cannot write through it
+
+    def _release_sram(self):
+        """Flushes and unmaps the current image, if any."""
+        self._sram_read_view.release()
+        self._sram_view.release()
+        if isinstance(self.sram_content, mmap.mmap):
+            try:
+                self.sram_content.flush()
+                self.sram_content.close()
+            except BufferError:
+                # A caller still holds a memoryview from read_memory; the mapping closes when it is released
+                print("DEBUG MODE: SRAM mapping still in use, leaving it to be closed when released.")
+            except ValueError:
+                pass # Already closed
+        if self._sram_file is not None:
+            self._sram_file.close()
+            self._sram_file = None
+        self._set_sram(bytearray())
 
     def open_can(self, interface, channel, bitrate):
         """Simulates opening a CAN device connection."""
@@ -47,6 +150,14 @@ class MockLiveTuningAccess:
         self.bus = None # Reset bus status to "closed"
 
     def read_memory(self, address, size):
+        if self.transport is not None:
+            try:
+                self.transport.read(size)
+            except TransportTimeout as e:
+                raise ECUException(f"ECU Read failed: {e}")
+        if self.simulator is not None:
+            self._update_simulation()
+
         # Check for SRAM content first if loaded and valid
         if self.sram_content:
             sram_end_addr = self.sram_base_addr + len(self.sram_content)
@@ -55,56 +166,57 @@ class MockLiveTuningAccess:
                 available_bytes = max(0, len(self.sram_content) - offset)
                 bytes_to_read = min(size, available_bytes)
 
-                if bytes_to_read > 0:
-                    read_data = self.sram_content[offset : offset + bytes_to_read]
-                    if len(read_data) < size:
-                        read_data += bytearray(size - len(read_data))
-                    return bytes(read_data)
+                if bytes_to_read == size:
+                    return self._sram_read_view[offset : offset + size] # Zero-copy view of the mapping
+                elif bytes_to_read > 0:
+                    return bytes(self._sram_view[offset : offset + bytes_to_read]) + bytes(size - bytes_to_read)
                 else:
-                    return bytes([random.randint(0, 255) for _ in range(size)])
-
-        cal_base_addr = None
-        if self.sym_map:
-            try:
-                cal_base_addr = self.sym_map.get_sym_addr("cal_base")
-            except KeyError:
-                pass
+                    return bytes(self._random.getrandbits(8) for _ in range(size))
 
-        if cal_base_addr is not None and address == cal_base_addr and size == 4:
-            return b"P138" # Simulate the correct ECU firmware ID
+        if address == ident_address(self.sym_map) and size <= IDENT_LENGTH:
+            return self._ident_block[:size] # Simulate the correct ECU firmware ID and a calibration header
 
         # Simulate sensor readings with random but plausible values, not required when user calram.bin is present
         if self.sym_map:
             try:
                 if address == self.sym_map.get_sym_addr("engine_speed"):
-                    return int(random.uniform(700, 6000)).to_bytes(2, BO_BE) # Random RPM (e.g., 700-6000)
+                    return int(self._random.uniform(700, 6000)).to_bytes(2, BO_BE) # Random RPM (e.g., 700-6000)
                 if address == self.sym_map.get_sym_addr("engine_load"):
-                    return int(random.uniform(100, 800)).to_bytes(2, BO_BE) # Random Load (e.g., 100-800)
+                    return int(self._random.uniform(100, 800)).to_bytes(2, BO_BE) # Random Load (e.g., 100-800)
                 if address == self.sym_map.get_sym_addr("coolant"):
-                    return int(max(0, min(255, random.uniform(80, 100) * 8 / 5 + 40 * 8 / 5))).to_bytes(1, BO_BE) 
+                    return int(max(0, min(255, self._random.uniform(80, 100) * 8 / 5 + 40 * 8 / 5))).to_bytes(1, BO_BE) 
                 if address == self.sym_map.get_sym_addr("air"):
-                    return int(max(0, min(255, random.uniform(20, 50) * 8 / 5 + 40 * 8 / 5))).to_bytes(1, BO_BE)
+                    return int(max(0, min(255, self._random.uniform(20, 50) * 8 / 5 + 40 * 8 / 5))).to_bytes(1, BO_BE)
             except KeyError:
                 pass
 
-        return bytes([random.randint(0, 255) for _ in range(size)])
+        return bytes(self._random.getrandbits(8) for _ in range(size))
 
     def write_memory(self, address, data_bytes, verify=False):
+        if self.transport is not None and not self.transport.write(len(data_bytes)):
+            return True # Lost on the bus: like the real ECU, nothing reports it, only a readback shows it
+
+        self._write_sram(address, data_bytes)
+        
+        if verify:
+            log.debug("Write verification skipped in mock mode.")
+        
+        return True 
+
+    def _write_sram(self, address, data_bytes):
         if self.sram_content:
             sram_end_addr = self.sram_base_addr + len(self.sram_content)
             if address >= self.sram_base_addr and address < sram_end_addr:
                 offset = address - self.sram_base_addr
                 if offset + len(data_bytes) <= len(self.sram_content):
-                    self.sram_content[offset : offset + len(data_bytes)] = data_bytes 
+                    self._sram_view[offset : offset + len(data_bytes)] = data_bytes # Lands in the file when persisting
                 else:
-                    print(f"DEBUG MODE: Simulated write to SRAM at 0x{address:08X} ignored (out of loaded SRAM bounds).")
-        
-        if verify:
-            print("DEBUG MODE: Write verification skipped in mock mode.") 
-        
-        return True 
+                    log.warning("Simulated write to SRAM at 0x%08X ignored (out of loaded SRAM bounds).", address)
 
     def shutdown(self):
         """Simulates shutting down the mock CAN bus."""
+        self._release_sram()
+        if self.transport is not None:
+            print(f"Mock CAN: Emulated transport: {self.transport.summary()}.")
         print("Mock CAN: Virtual bus shut down.")
         self.bus = None
@@ -0,0 +1,169 @@
+# lib/snapshot_store.py
+
+# Content-addressed store of memory images (RAM or any zone from lib.memory_zones). Each image is cut into
+# fixed-size blocks saved once under their SHA-256 in snapshots/blocks/, and a snapshot is just a small JSON
+# manifest listing its block hashes, so nearly identical snapshots share almost all of their storage.
+# Diffs compare block hashes first and only load and compare the blocks that differ.
+
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from lib.diagnostics import get_logger
+from lib.map_codec import axis_block, data_block_length
+
+log = get_logger(__name__)
+
+BLOCK_SIZE = 1024 # Small enough that one edited map costs a block or two per snapshot
+
+
+class SnapshotStore:
+    def __init__(self, root="snapshots", block_size=BLOCK_SIZE):
+        self.root = root
+        self.block_size = block_size
+        self.blocks_dir = os.path.join(root, "blocks")
+
+    def save(self, image, base_address, label=""):
+        """Stores an image read from base_address. Returns the new snapshot's id."""
+        os.makedirs(self.blocks_dir, exist_ok=True)
+        image = bytes(image)
+        hashes = []
+        for start in range(0, len(image), self.block_size):
+            block = image[start:start + self.block_size]
+            digest = hashlib.sha256(block).hexdigest()
+            path = os.path.join(self.blocks_dir, digest)
+            if not os.path.exists(path): # Blocks already in the store are shared, not rewritten
+                with open(path + ".tmp", 'wb') as f:
+                    f.write(block)
+                os.replace(path + ".tmp", path)
+            hashes.append(digest)
+
+        created = time.time()
+        image_digest = hashlib.sha256("".join(hashes).encode()).hexdigest()
+        snapshot_id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(created))}-{image_digest[:8]}"
+        suffix = 1
+        while os.path.exists(self._manifest_path(snapshot_id)): # Same image saved twice within a second
+            snapshot_id = f"{snapshot_id.rsplit('.', 1)[0]}.{suffix}"
+            suffix += 1
+        manifest = {
+            "id": snapshot_id,
+            "label": label,
+            "created": created,
+            "base_address": base_address,
+            "length": len(image),
+            "block_size": self.block_size,
+            "blocks": hashes,
+        }
+        with open(self._manifest_path(snapshot_id), 'w') as f:
+            json.dump(manifest, f, indent=1)
+        log.info("Saved snapshot '%s' (%d bytes at 0x%X).", snapshot_id, len(image), base_address)
+        return snapshot_id
+
+    def _manifest_path(self, snapshot_id):
+        return os.path.join(self.root, f"{snapshot_id}.json")
+
+    def manifest(self, snapshot_id):
+        with open(self._manifest_path(snapshot_id), 'r') as f:
+            return json.load(f)
+
+    def list_snapshots(self):
+        """Manifests of all snapshots, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        manifests = []
+        for name in os.listdir(self.root):
+            if name.endswith(".json"):
+                try:
+                    manifests.append(self.manifest(name[:-len(".json")]))
+                except (OSError, ValueError) as e:
+                    log.warning("Skipping unreadable manifest '%s': %s", name, e)
+        return sorted(manifests, key=lambda m: m["created"])
+
+    def _read_block(self, digest):
+        with open(os.path.join(self.blocks_dir, digest), 'rb') as f:
+            return f.read()
+
+    def load(self, snapshot_id):
+        """Reassembles a snapshot's image. Returns (base_address, bytes)."""
+        manifest = self.manifest(snapshot_id)
+        return manifest["base_address"], b"".join(self._read_block(d) for d in manifest["blocks"])
+
+    def storage_bytes(self):
+        """Bytes used by all stored blocks."""
+        if not os.path.isdir(self.blocks_dir):
+            return 0
+        return sum(os.path.getsize(os.path.join(self.blocks_dir, name)) for name in os.listdir(self.blocks_dir))
+
+    def diff(self, old_id, new_id):
+        """
+        Changed byte ranges between two snapshots of the same region, as (address, length) in address order.
+        Only blocks whose hashes differ are read.
+        """
+        old, new = self.manifest(old_id), self.manifest(new_id)
+        if (old["base_address"], old["length"], old["block_size"]) != (new["base_address"], new["length"], new["block_size"]):
+            raise ValueError("Snapshots cover different memory regions and cannot be diffed.")
+
+        ranges = []
+        base, block_size = new["base_address"], new["block_size"]
+        for index, (old_digest, new_digest) in enumerate(zip(old["blocks"], new["blocks"])):
+            if old_digest == new_digest:
+                continue
+            old_block = np.frombuffer(self._read_block(old_digest), dtype=np.uint8)
+            new_block = np.frombuffer(self._read_block(new_digest), dtype=np.uint8)
+            changed = np.flatnonzero(old_block != new_block)
+            # Runs of consecutive changed bytes
+            breaks = np.flatnonzero(np.diff(changed) > 1)
+            starts = np.r_[changed[0], changed[breaks + 1]]
+            ends = np.r_[changed[breaks], changed[-1]] + 1
+            block_address = base + index * block_size
+            for start, end in zip(starts, ends):
+                address = block_address + int(start)
+                if ranges and ranges[-1][0] + ranges[-1][1] == address: # Run continues across a block boundary
+                    ranges[-1] = (ranges[-1][0], ranges[-1][1] + int(end - start))
+                else:
+                    ranges.append((address, int(end - start)))
+        return ranges
+
+
+class MapChange:
+    """Cells of one maptable part ('data', 'x_axis' or 'y_axis') touched by a diff."""
+    def __init__(self, description, part, cells):
+        self.description = description
+        self.part = part
+        self.cells = cells # (row, col) for data, element index for axes
+
+    def __repr__(self):
+        return f"MapChange({self.description!r}, {self.part!r}, {len(self.cells)} cells)"
+
+
+def map_changes(ranges, definitions):
+    """Maps changed (address, length) ranges onto the maptable data and axis cells they overlap."""
+    changes = []
+    for definition in definitions:
+        if definition.get("type") != "maptable":
+            continue
+        parts = [("data", definition["data_address"], data_block_length(definition), definition["data_element_size"])]
+        for axis in ("x_axis", "y_axis"):
+            block = axis_block(definition, axis)
+            if block is not None:
+                parts.append((axis, block[0], block[1], block[2]))
+
+        for part, start, length, element_size in parts:
+            touched = np.zeros(length // element_size, dtype=bool)
+            for address, size in ranges:
+                lo, hi = max(address, start), min(address + size, start + length)
+                if lo < hi:
+                    touched[(lo - start) // element_size:(hi - start - 1) // element_size + 1] = True
+            indices = np.flatnonzero(touched)
+            if len(indices) == 0:
+                continue
+            if part == "data":
+                cols = definition["data_cols"]
+                cells = [(int(i) // cols, int(i) % cols) for i in indices]
+            else:
+                cells = [int(i) for i in indices]
+            changes.append(MapChange(definition["description"], part, cells))
+    return changes
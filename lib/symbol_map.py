@@ -0,0 +1,169 @@
+# lib/symbol_map.py
+
+# Symbol table of a firmware build (e.g. the P138 symbol list), loaded from a map file. Names resolve to addresses
+# through a dict, and addresses resolve back to "symbol+offset" by bisecting a sorted address list, so traces,
+# diffs and definitions can use names instead of raw addresses.
+#
+# Accepted line formats, one symbol per line (blank lines and #, ; or // comments are ignored, addresses are hex):
+#   engine_speed = 0x400015BC          name, address and optional size, separated by spaces, '=', ':' or ','
+#   0x400015BC engine_speed            address first, optional size between address and name
+#   400015bc 00000002 D engine_speed   nm / nm -S output
+
+import bisect
+import re
+
+DEFAULT_SYMBOL_MAP_PATH = "ram/symbols.map"
+
+_SEPARATORS = re.compile(r"[\s,=:]+")
+_NAME = re.compile(r"^[A-Za-z_.$][\w.$]*$")
+_NUMBER = re.compile(r"^(0[xX][0-9a-fA-F]+|[0-9a-fA-F]+)$")
+
+# Definition keys that may name a symbol, and the address key each one fills in
+SYMBOL_KEYS = {
+    "symbol": "address",
+    "data_symbol": "data_address",
+    "x_axis_symbol": "x_axis_address",
+    "y_axis_symbol": "y_axis_address",
+}
+
+
+def _parse_number(token, hex_default):
+    if token[:2].lower() == "0x":
+        return int(token, 16)
+    return int(token, 16 if hex_default else 10)
+
+
+def _strip_comment(line):
+    for marker in ("#", ";", "//"):
+        line = line.split(marker, 1)[0]
+    return line.strip()
+
+
+def parse_symbol_line(line):
+    """(name, address, size or None) from one map file line, or None if it holds no symbol."""
+    tokens = [t for t in _SEPARATORS.split(_strip_comment(line)) if t]
+    if len(tokens) < 2:
+        return None
+
+    # Address first (nm style, bare hex), name last; anything in between may be a size and a type letter
+    if _NUMBER.match(tokens[0]) and _NAME.match(tokens[-1]) and not _NUMBER.match(tokens[-1]):
+        size = None
+        if len(tokens) >= 3 and _NUMBER.match(tokens[1]) and len(tokens[1]) > 1:
+            size = _parse_number(tokens[1], hex_default=True)
+        return tokens[-1], _parse_number(tokens[0], hex_default=True), size
+
+    # Name first, then address and optional size (decimal unless 0x-prefixed)
+    if _NAME.match(tokens[0]) and _NUMBER.match(tokens[1]):
+        try:
+            size = _parse_number(tokens[2], hex_default=False) if len(tokens) >= 3 else None
+        except ValueError:
+            size = None
+        return tokens[0], _parse_number(tokens[1], hex_default=True), size
+    return None
+
+
+class SymbolMap:
+    def __init__(self, symbols=None):
+        self._addresses_by_name = {} # name -> address
+        self._sizes = {}             # name -> size in bytes, for symbols whose size is known
+        self._sorted_addresses = []  # Reverse index: ascending addresses ...
+        self._sorted_names = []      # ... and the symbol at each
+        self._addresses_by_name.update(symbols or {})
+        self._rebuild_index()
+
+    @classmethod
+    def from_file(cls, path):
+        sym_map = cls()
+        skipped = 0
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                parsed = parse_symbol_line(line)
+                if parsed is None:
+                    skipped += _strip_comment(line) != ""
+                    continue
+                name, address, size = parsed
+                sym_map._addresses_by_name[name] = address # Later duplicates win, as with add()
+                if size:
+                    sym_map._sizes[name] = size
+        sym_map._rebuild_index() # One sort instead of an insert per symbol
+        print(f"SymbolMap: Loaded {len(sym_map)} symbols from {path}" + (f" ({skipped} lines skipped)." if skipped else "."))
+        return sym_map
+
+    def add(self, name, address, size=None):
+        if name in self._addresses_by_name:
+            if self._addresses_by_name[name] == address:
+                return
+            self._remove_from_index(name)
+        self._addresses_by_name[name] = address
+        if size:
+            self._sizes[name] = size
+        index = bisect.bisect_right(self._sorted_addresses, address)
+        self._sorted_addresses.insert(index, address)
+        self._sorted_names.insert(index, name)
+
+    def _rebuild_index(self):
+        ordered = sorted(self._addresses_by_name.items(), key=lambda item: item[1]) # Stable, so aliases keep file order
+        self._sorted_addresses = [address for _, address in ordered]
+        self._sorted_names = [name for name, _ in ordered]
+
+    def _remove_from_index(self, name):
+        address = self._addresses_by_name[name]
+        index = bisect.bisect_left(self._sorted_addresses, address)
+        while self._sorted_names[index] != name:
+            index += 1
+        del self._sorted_addresses[index]
+        del self._sorted_names[index]
+        self._sizes.pop(name, None)
+
+    def __len__(self):
+        return len(self._addresses_by_name)
+
+    def __contains__(self, name):
+        return name in self._addresses_by_name
+
+    def get_sym_addr(self, name):
+        """Address of a symbol. Raises KeyError if the map does not define it."""
+        return self._addresses_by_name[name]
+
+    def lookup(self, address):
+        """
+        (name, offset) of the symbol containing address: the nearest one at or below it. None if there is none,
+        or if that symbol's size is known and address lies past its end. Of aliases, the first added wins.
+        """
+        index = bisect.bisect_right(self._sorted_addresses, address) - 1
+        if index < 0:
+            return None
+        symbol_address = self._sorted_addresses[index]
+        index = bisect.bisect_left(self._sorted_addresses, symbol_address) # First alias at that address
+        name = self._sorted_names[index]
+        offset = address - symbol_address
+        size = self._sizes.get(name)
+        if size is not None and offset >= size:
+            return None
+        return name, offset
+
+    def format_address(self, address):
+        """'name+0x2 (0x400015BE)' when a symbol contains address, '0x400015BE' otherwise."""
+        found = self.lookup(address)
+        if found is None:
+            return f"0x{address:08X}"
+        name, offset = found
+        return f"{name}{f'+0x{offset:X}' if offset else ''} (0x{address:08X})"
+
+
+def resolve_definitions(definitions, sym_map):
+    """
+    Fills in the address keys of definitions that name a symbol, in place. Definitions keep any hard-coded
+    address when their symbol is missing from the map. Returns the names that could not be resolved.
+    """
+    missing = []
+    for definition in definitions:
+        for symbol_key, address_key in SYMBOL_KEYS.items():
+            name = definition.get(symbol_key)
+            if name is None:
+                continue
+            try:
+                definition[address_key] = sym_map.get_sym_addr(name)
+            except KeyError:
+                missing.append(name)
+    return missing
@@ -0,0 +1,131 @@
+# lib/timeseries_store.py
+
+# Central time-series history for every decoded channel. Each channel is a pair of preallocated float64
+# NumPy ring buffers (timestamp, value), 16 bytes per sample, shared by charts, the map cursor and analysis
+# code so that nothing keeps a private copy of the history.
+
+import numpy as np
+
+from lib.history_tiers import DEFAULT_TIERS, TieredHistory
+
+DEFAULT_CAPACITY = 8192 # Samples per channel, about 13 minutes at the 100 ms poll rate
+
+
+class ChannelHistory:
+    """Preallocated ring buffer of (timestamp, value) samples for one channel, in time order."""
+    def __init__(self, capacity=DEFAULT_CAPACITY, tiers=None):
+        self.capacity = capacity
+        self.times = np.empty(capacity, dtype=np.float64)
+        self.values = np.empty(capacity, dtype=np.float64)
+        self._head = 0  # Physical index of the next write
+        self.count = 0  # Number of valid samples
+        self.tiers = TieredHistory(tiers) if tiers else None # Downsampled min/mean/max history for long views
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, value):
+        """Appends one sample. Unavailable values (None or non-numeric) are stored as NaN."""
+        if not isinstance(value, (int, float)):
+            value = np.nan
+        self.times[self._head] = timestamp
+        self.values[self._head] = value
+        self._head = (self._head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        if self.tiers is not None:
+            self.tiers.append(timestamp, value)
+
+    def clear(self):
+        self._head = 0
+        self.count = 0
+        if self.tiers is not None:
+            self.tiers.clear()
+
+    @property
+    def span_s(self):
+        """Time covered by the full-resolution samples currently held."""
+        if self.count < 2:
+            return 0.0
+        return float(self.times[self._head - 1] - self.times[(self._head - self.count) % self.capacity])
+
+    def latest(self):
+        """Returns the most recent (timestamp, value), or None if empty."""
+        if self.count == 0:
+            return None
+        i = self._head - 1
+        return float(self.times[i]), float(self.values[i])
+
+    def segments(self):
+        """Returns the buffer contents as up to two (times, values) view pairs, oldest first. Never copies."""
+        if self.count < self.capacity:
+            return [(self.times[:self.count], self.values[:self.count])]
+        if self._head == 0:
+            return [(self.times, self.values)]
+        return [(self.times[self._head:], self.values[self._head:]),
+                (self.times[:self._head], self.values[:self._head])]
+
+    def window(self, t_start=None, t_end=None, lead_in=0):
+        """
+        Returns (times, values) for samples with t_start <= t <= t_end, plus up to lead_in samples before t_start.
+        The arrays are views into the ring (zero-copy) unless the window straddles the wrap point.
+        """
+        segments = self.segments()
+
+        # The segments concatenate to one sorted series, so global ranks are sums of per-segment ranks
+        lo = 0 if t_start is None else sum(int(np.searchsorted(t, t_start, side='left')) for t, _ in segments)
+        hi = self.count if t_end is None else sum(int(np.searchsorted(t, t_end, side='right')) for t, _ in segments)
+        lo = max(0, lo - lead_in)
+
+        selected = []
+        seg_base = 0
+        for seg_times, seg_values in segments:
+            seg_lo = max(lo - seg_base, 0)
+            seg_hi = min(hi - seg_base, len(seg_times))
+            if seg_hi > seg_lo:
+                selected.append((seg_times[seg_lo:seg_hi], seg_values[seg_lo:seg_hi]))
+            seg_base += len(seg_times)
+
+        if not selected:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+        if len(selected) == 1:
+            return selected[0]
+        return np.concatenate([s[0] for s in selected]), np.concatenate([s[1] for s in selected])
+
+
+class TimeSeriesStore:
+    def __init__(self, capacity=DEFAULT_CAPACITY, tiers=DEFAULT_TIERS):
+        self.capacity = capacity
+        self.tiers = tiers # Tier layout given to every channel, None for full resolution only
+        self.channels = {} # channel name -> ChannelHistory
+
+    def channel(self, name):
+        """Returns the history for a channel, creating it on first use."""
+        history = self.channels.get(name)
+        if history is None:
+            history = ChannelHistory(self.capacity, self.tiers)
+            self.channels[name] = history
+        return history
+
+    def append(self, name, timestamp, value):
+        self.channel(name).append(timestamp, value)
+
+    def append_sample(self, sample):
+        """Appends every scalar channel and every table column of a decoded Sample."""
+        timestamp = sample.timestamp
+        for name, value in sample.channel_items():
+            self.channel(name).append(timestamp, value)
+
+    def latest(self, name):
+        history = self.channels.get(name)
+        return history.latest() if history is not None else None
+
+    def window(self, name, t_start=None, t_end=None, lead_in=0):
+        return self.channel(name).window(t_start, t_end, lead_in)
+
+    def clear(self):
+        for history in self.channels.values():
+            history.clear()
+
+    def memory_bytes(self):
+        return sum(h.times.nbytes + h.values.nbytes + (h.tiers.memory_bytes() if h.tiers else 0) for h in self.channels.values())
@@ -0,0 +1,125 @@
+# lib/transport_timing.py
+
+# Request/frame model of the live-tuning CAN protocol, shared by LiveTuningAccess and the mock's transport
+# emulation. Reads and writes are split into buffer requests of at most 255 bytes; 1, 2 and 4 byte transfers
+# use their own single-frame opcodes, longer ones a header frame plus 8-byte data frames.
+
+import random
+import time
+
+MAX_BUFFER_CHUNK = 255 # Largest single buffer read or write supported by the ECU
+FRAME_PAYLOAD = 8
+
+# Bits in a standard (11-bit ID) data frame, excluding data: SOF, ID, RTR, IDE, r0, DLC, CRC, delimiters, ACK, EOF, IFS
+FRAME_OVERHEAD_BITS = 47
+STUFF_FACTOR = 1.1 # Average bit stuffing overhead on typical payloads
+
+
+class TransportTimeout(Exception):
+    pass
+
+
+def chunk_plan(size):
+    """Sizes of the requests a transfer of size bytes is split into."""
+    chunks = []
+    while size > 0:
+        chunk = min(size, MAX_BUFFER_CHUNK)
+        chunks.append(chunk)
+        size -= chunk
+    return chunks
+
+
+def _data_frames(chunk):
+    return [min(FRAME_PAYLOAD, chunk - offset) for offset in range(0, chunk, FRAME_PAYLOAD)]
+
+
+def read_frames(chunk):
+    """(request DLCs, response DLCs) of one read request."""
+    if chunk in (1, 2, 4):
+        return [4], [chunk] # Address only, answered in one frame
+    return [5], _data_frames(chunk) # Address + length, answered in 8-byte frames
+
+
+def write_frames(chunk):
+    """DLCs of the frames sent for one write request. Writes are not acknowledged."""
+    if chunk in (1, 2, 4):
+        return [4 + chunk] # Address + data in one frame
+    return [5] + _data_frames(chunk) # Address + length header, then the data
+
+
+def frame_time_s(dlc, bitrate, stuff_factor=STUFF_FACTOR):
+    return (FRAME_OVERHEAD_BITS + 8 * dlc) * stuff_factor / bitrate
+
+
+class TransportProfile:
+    """Cost model of one bus: bitrate, per-request turnaround, response timeout and frame loss."""
+    def __init__(self, bitrate=500000, request_latency_s=0.002, timeout_s=1.0, drop_rate=0.0, seed=0):
+        self.bitrate = bitrate
+        self.request_latency_s = request_latency_s # ECU and adapter turnaround per request
+        self.timeout_s = timeout_s                 # Matches the recv timeout in LiveTuningAccess
+        self.drop_rate = drop_rate                 # Probability that a request gets no response (or a write is lost)
+        self.seed = seed
+
+    def read_time_s(self, size):
+        total = 0.0
+        for chunk in chunk_plan(size):
+            requests, responses = read_frames(chunk)
+            total += self.request_latency_s + sum(frame_time_s(dlc, self.bitrate) for dlc in requests + responses)
+        return total
+
+    def write_time_s(self, size):
+        total = 0.0
+        for chunk in chunk_plan(size):
+            total += self.request_latency_s + sum(frame_time_s(dlc, self.bitrate) for dlc in write_frames(chunk))
+        return total
+
+
+class TransportEmulator:
+    """Sleeps for the modelled cost of each transfer and injects timeouts, so mock sessions run at bus speed."""
+    def __init__(self, profile=None):
+        self.profile = profile or TransportProfile()
+        self._random = random.Random(self.profile.seed)
+        self.requests = 0
+        self.frames = 0
+        self.drops = 0
+        self.busy_s = 0.0
+
+    def read(self, size):
+        """Waits out a read of size bytes. Raises TransportTimeout if a request is dropped."""
+        elapsed = 0.0
+        for chunk in chunk_plan(size):
+            requests, responses = read_frames(chunk)
+            self.requests += 1
+            if self._dropped():
+                self._wait(elapsed + self.profile.timeout_s)
+                raise TransportTimeout(f"No response to {chunk}-byte read request (emulated drop).")
+            self.frames += len(requests) + len(responses)
+            elapsed += self.profile.request_latency_s + sum(frame_time_s(dlc, self.profile.bitrate) for dlc in requests + responses)
+        self._wait(elapsed)
+
+    def write(self, size):
+        """Waits out a write of size bytes. Returns False if a request was dropped, i.e. the write did not arrive."""
+        elapsed = 0.0
+        delivered = True
+        for chunk in chunk_plan(size):
+            frames = write_frames(chunk)
+            self.requests += 1
+            self.frames += len(frames)
+            if self._dropped():
+                delivered = False
+            elapsed += self.profile.request_latency_s + sum(frame_time_s(dlc, self.profile.bitrate) for dlc in frames)
+        self._wait(elapsed)
+        return delivered
+
+    def _dropped(self):
+        if self.profile.drop_rate > 0 and self._random.random() < self.profile.drop_rate:
+            self.drops += 1
+            return True
+        return False
+
+    def _wait(self, seconds):
+        self.busy_s += seconds
+        time.sleep(seconds)
+
+    def summary(self):
+        return f"{self.requests} requests, {self.frames} frames, {self.drops} dropped, {self.busy_s:.2f} s on the bus"
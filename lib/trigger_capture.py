@@ -0,0 +1,123 @@
+# lib/trigger_capture.py
+
+# Event-triggered logging. Nothing touches the disk until a trigger from LOG_TRIGGERS holds. Then the seconds
+# leading up to the event are taken from the shared lib.timeseries_store.TimeSeriesStore the owner appends every
+# sample to, written to a new event log, and followed by the post-trigger window. A trigger holding again during the
+# post window extends it, so one knock burst makes one file. Triggers are compiled into a single
+# lib.conditions.ConditionSet. The store keeps numeric channels only, so pre-trigger rows have no Alarms entry.
+
+import os
+import re
+import time
+
+from lib.channel_decoder import GAUGE_TYPES, Sample, table_channel_name
+from lib.conditions import ConditionSet
+from lib.data_logger import CsvLogger
+from lib.diagnostics import get_logger
+from lib.ecu_definitions import ECU_DEFINITIONS, LOG_TRIGGERS
+
+log = get_logger(__name__)
+
+DEFAULT_PRE_S = 5.0
+DEFAULT_POST_S = 5.0
+
+
+def pre_trigger_capacity(poll_interval_s, triggers=None):
+    """Samples per channel a store needs to hold the longest pre-trigger window at this poll interval."""
+    triggers = triggers if triggers is not None else LOG_TRIGGERS
+    longest = max((t.get("pre_s", DEFAULT_PRE_S) for t in triggers), default=DEFAULT_PRE_S)
+    return int(longest / poll_interval_s) + 2
+
+
+class TriggerCapture:
+    def __init__(self, timeseries, triggers=None, poll_interval_s=0.1, log_dir="logs", definitions=None):
+        self.timeseries = timeseries # TimeSeriesStore holding the pre-trigger history, appended to by the owner
+        self.triggers = triggers if triggers is not None else LOG_TRIGGERS
+        self.definitions = definitions if definitions is not None else ECU_DEFINITIONS
+        self.log_dir = log_dir
+        self.conditions = ConditionSet([t["when"] for t in self.triggers], self.definitions)
+
+        self._pre_s = [t.get("pre_s", DEFAULT_PRE_S) for t in self.triggers]
+        self._post_samples = [max(1, int(round(t.get("post_s", DEFAULT_POST_S) / poll_interval_s))) for t in self.triggers]
+
+        self.logger = CsvLogger(self.definitions)
+        self._post_left = 0    # Samples still to write after the last trigger
+        self.events = []       # (trigger name, timestamp, filename) of every capture started
+        self.active_trigger = None # Name of the trigger that opened the current capture
+
+    @property
+    def is_capturing(self):
+        return self.logger.is_open
+
+    def process(self, sample):
+        """
+        Feeds one sample, after it has been appended to the store. Returns the name of the trigger that started a
+        capture on this sample, or None.
+        """
+        fired = self.conditions.evaluate(sample)
+        started = None
+        if self.is_capturing:
+            self.logger.write_sample(sample)
+            if fired.any():
+                self._post_left = max(self._post_left, max(self._post_samples[i] for i in fired.nonzero()[0]))
+            self._post_left -= 1
+            if self._post_left <= 0:
+                self._finish()
+        elif fired.any():
+            index = int(fired.nonzero()[0][0]) # First matching trigger in definition order names the event
+            started = self.triggers[index]["name"]
+            self._start(index, sample)
+        return started
+
+    def _stored_samples(self, t_start, t_end):
+        """Samples with t_start <= timestamp < t_end rebuilt from the store, oldest first."""
+        rows = {} # timestamp -> {channel: value}
+        for name, history in list(self.timeseries.channels.items()):
+            times, values = history.window(t_start, t_end)
+            for t, value in zip(times.tolist(), values.tolist()):
+                if t < t_end:
+                    rows.setdefault(t, {})[name] = None if value != value else value
+
+        samples = []
+        for t in sorted(rows):
+            values = rows[t]
+            sample = Sample(t)
+            for definition in self.definitions:
+                description = definition.get("description")
+                if definition.get("type") in GAUGE_TYPES:
+                    sample.values[description] = values.get(description)
+                elif definition.get("type") == "table":
+                    sample.tables[description] = [values.get(table_channel_name(description, c)) for c in definition["columns"]]
+            samples.append(sample)
+        return samples
+
+    def _start(self, index, sample):
+        name = self.triggers[index]["name"]
+        os.makedirs(self.log_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(sample.timestamp))
+        base = os.path.join(self.log_dir, f"event_{stamp}_{re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_')}")
+        filename = f"{base}.csv"
+        suffix = 1
+        while os.path.exists(filename): # Several events within one second
+            filename = f"{base}~{suffix}.csv"
+            suffix += 1
+        self.logger.open(filename)
+        for earlier in self._stored_samples(sample.timestamp - self._pre_s[index], sample.timestamp):
+            self.logger.write_sample(earlier)
+        self.logger.write_sample(sample)
+        self._post_left = self._post_samples[index]
+        self.active_trigger = name
+        self.events.append((name, sample.timestamp, filename))
+        log.info("'%s' fired, capturing to %s", name, filename)
+
+    def _finish(self):
+        log.info("Capture of '%s' complete (%s).", self.active_trigger, self.logger.filename)
+        self.logger.close()
+        self.active_trigger = None
+        self._post_left = 0
+
+    def close(self):
+        """Ends any capture in progress, keeping what was written."""
+        if self.is_capturing:
+            self._finish()
+        self.conditions.reset()
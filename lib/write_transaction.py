@@ -0,0 +1,144 @@
+# lib/write_transaction.py
+
+# Groups writes to any number of maps into one all-or-nothing batch. Staged writes are sorted and merged into
+# address order, small gaps between them are bridged with the bytes already in memory (cheaper on the bus than a
+# new buffer-write header), and the whole batch is written, read back and, if anything fails, restored from the
+# pre-image read at the start of the commit. The DataManager I/O lock is held throughout, so no other write
+# interleaves with the batch. Reads only take that lock on communicators that cannot match requests themselves:
+# over CAN, polls and map loads can still read between the batch's requests (never during one) and may see it
+# half-written, but nothing else changes the batch's memory while it runs.
+
+from lib.diagnostics import get_logger
+from lib.map_transforms import changed_runs, minimal_write_span
+
+log = get_logger(__name__)
+
+MERGE_GAP = 8 # Bridge gaps up to one CAN frame of payload rather than starting another buffer write
+
+
+class WriteTransactionError(Exception):
+    pass
+
+
+class WriteTransaction:
+    def __init__(self, data_manager, label=None, journal=None, merge_gap=MERGE_GAP):
+        self.data_manager = data_manager
+        self.label = label     # Name of the user action, shown in the undo history
+        self.journal = journal # EditJournal the committed changes are recorded in, None to leave no undo entry
+        self.merge_gap = merge_gap
+        self._staged = [] # (address, bytes) in staging order, later writes win where they overlap
+        self.committed = False
+        self.error = None      # Message describing why commit() failed
+        self.rolled_back = False
+        self.written = []      # (address, old_bytes, new_bytes) of each region actually changed by a successful commit
+
+    def stage(self, address, data):
+        if self.committed:
+            raise WriteTransactionError("Transaction already committed.")
+        if data:
+            self._staged.append((address, bytes(data)))
+
+    def stage_block(self, base_address, old_block, new_block, element_size=1):
+        """
+        Stages each run of elements that differ between two versions of a block starting at base_address. Unchanged
+        elements between runs are not staged, so the commit fills any gap it bridges from the ECU's own pre-image
+        rather than from old_block, which may be an out-of-date copy.
+        """
+        for offset, data in changed_runs(old_block, new_block, element_size):
+            self.stage(base_address + offset, data)
+
+    @property
+    def is_empty(self):
+        return not self._staged
+
+    def plan(self):
+        """Merged (address, length) regions the commit will touch, in address order."""
+        regions = []
+        for address, data in sorted(self._staged):
+            end = address + len(data)
+            if regions and address <= regions[-1][1] + self.merge_gap:
+                regions[-1][1] = max(regions[-1][1], end)
+            else:
+                regions.append([address, end])
+        return [(start, end - start) for start, end in regions]
+
+    def _overlay(self, start, pre_image):
+        """Region contents after applying every staged write that falls inside it, in staging order."""
+        block = bytearray(pre_image)
+        end = start + len(block)
+        for address, data in self._staged:
+            if address >= start and address + len(data) <= end:
+                block[address - start:address - start + len(data)] = data
+        return bytes(block)
+
+    def commit(self):
+        """Writes the batch. Returns True on success; on failure sets error, restores the pre-image and returns False."""
+        if self.committed:
+            raise WriteTransactionError("Transaction already committed.")
+        if not self.data_manager.is_connected():
+            self.error = "Not connected to a data source."
+            return False
+        if self.is_empty:
+            self.committed = True
+            return True
+
+        try:
+            return self._commit()
+        finally:
+            self.data_manager.flush_map_cache() # Evictions caused by the batch (and any rollback) are saved together
+
+    def _commit(self):
+        with self.data_manager._io_lock:
+            # Pre-image of every region, read before anything is written
+            regions = []
+            for start, length in self.plan():
+                pre_image = self.data_manager.read_data(start, length)
+                if pre_image is None or len(pre_image) != length:
+                    self.error = f"Failed to read pre-image at 0x{start:X} ({length} bytes)."
+                    return False
+                pre_image = bytes(pre_image)
+                regions.append((start, pre_image, self._overlay(start, pre_image)))
+
+            # Write only regions that change, trimmed to their changed bytes
+            changes = []
+            for start, pre_image, new_block in regions:
+                span = minimal_write_span(pre_image, new_block)
+                if span is None:
+                    continue
+                offset, data = span
+                changes.append((start + offset, pre_image[offset:offset + len(data)], data))
+
+            attempted = []
+            for address, old, new in changes:
+                attempted.append((address, old, new))
+                if not self.data_manager.write_data(address, new):
+                    self.error = f"Write failed at 0x{address:X} ({len(new)} bytes)."
+                    self._rollback(attempted)
+                    return False
+
+            # One readback pass over everything written
+            for address, old, new in changes:
+                readback = self.data_manager.read_data(address, len(new))
+                if readback is None or bytes(readback) != new:
+                    self.error = f"Verification failed at 0x{address:X}: data read back does not match."
+                    self._rollback(attempted)
+                    return False
+
+        self.written = changes
+        self.committed = True
+        if self.journal is not None:
+            self.journal.record(self.label, changes)
+        return True
+
+    def _rollback(self, attempted):
+        """Restores the pre-image of every region a write was attempted on, newest first."""
+        restored = True
+        for address, old, new in reversed(attempted):
+            if not self.data_manager.write_data(address, old):
+                restored = False
+        self.rolled_back = restored
+        if restored:
+            log.warning("%s Rolled back %d region(s).", self.error, len(attempted))
+        else:
+            log.error("%s Rollback incomplete, memory may be inconsistent.", self.error)
+            self.error += " Rollback incomplete."
@@ -2,25 +2,88 @@
 
 import sys
 import math
+import logging
 import os
 import time
-import csv
-import re
-from collections import deque
+import numpy as np
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QDialog, QLineEdit, QComboBox, QMessageBox,
-    QTableWidget, QTableWidgetItem, QHeaderView, QTabWidget, QLabel, QInputDialog, QGridLayout
+    QTableWidget, QTableWidgetItem, QHeaderView, QTabWidget, QLabel, QInputDialog, QGridLayout, QToolButton, QMenu, QShortcut, QProgressDialog, QCheckBox,
+    QPlainTextEdit, QListWidget, QListWidgetItem
 )
-from PyQt5.QtGui import QPainter, QBrush, QColor, QPen, QFont, QIntValidator, QResizeEvent, QDoubleValidator
-from PyQt5.QtCore import Qt, QTimer, QPointF, QRect, QSize
+from PyQt5.QtGui import QPainter, QBrush, QColor, QPen, QFont, QIntValidator, QResizeEvent, QDoubleValidator, QGuiApplication, QPolygonF, QKeySequence
+from PyQt5.QtCore import Qt, QTimer, QPointF, QRect, QSize, QObject, QRunnable, QThreadPool, pyqtSignal
 
 from lib.ecu_definitions import ECU_DEFINITIONS, MAPTABLE_COLOR_GRADIENT
 from lib.data_manager import DataManager
+from lib.channel_decoder import ChannelDecoder
+from lib.data_logger import CsvLogger, next_log_filename
+from lib.trigger_capture import TriggerCapture
+from lib.alarms import AlarmEngine
+from lib.burst_capture import BurstCapture, burst_capable, DEFAULT_DURATION_S
+from lib.chart_decimation import minmax_decimate
+from lib.timeseries_store import TimeSeriesStore, ChannelHistory
+from lib.map_loader import MapLoadJob, MapLoadCancelled
+from lib.map_codec import decode_map_data, encode_map_data
+from lib import map_transforms
+from lib.memory_zones import RAM_ZONE
+from lib.transport_timing import TransportProfile
+from lib.engine_simulator import EngineSimulator, DEFAULT_RATE_HZ
+from lib.symbol_map import DEFAULT_SYMBOL_MAP_PATH
+from lib.snapshot_store import SnapshotStore, map_changes
+from lib.diagnostics import configure as configure_diagnostics, get_logger
+
+log = get_logger("gui")
+
+
+class GaugeRenderClock(QObject):
+    """Single repaint clock shared by every GaugeWidget, capped at the display refresh rate.
+    Each frame repaints only the gauges marked dirty since the previous frame, and the clock stops while nothing changes."""
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._dirty_gauges = {} # id -> widget, insertion ordered so repaint order is stable
+
+        refresh_rate = 60.0
+        screen = QGuiApplication.primaryScreen()
+        if screen is not None and screen.refreshRate() > 0:
+            refresh_rate = screen.refreshRate()
+        self.frame_interval_ms = max(1, int(math.ceil(1000.0 / refresh_rate)))
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.frame_interval_ms)
+        self.timer.timeout.connect(self._render_frame)
+
+    def mark_dirty(self, gauge):
+        self._dirty_gauges[id(gauge)] = gauge
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def _render_frame(self):
+        if not self._dirty_gauges:
+            self.timer.stop() # Idle until the next mark_dirty
+            return
+        dirty_gauges = self._dirty_gauges
+        self._dirty_gauges = {}
+        for gauge in dirty_gauges.values():
+            gauge.update()
 
 
 class GaugeWidget(QWidget):
-    def __init__(self, description, unit, min_val=0, max_val=100, gauge_type=None, columns=None, offsets=None, parent=None):
+    # Chart time windows cycled by double-clicking a gauge_chart. Windows longer than LIVE_WINDOW_LIMIT_S
+    # are drawn from the downsampled history tiers as a min/max band with the mean line.
+    CHART_WINDOWS = ((10.0, "10 s"), (600.0, "10 min"), (3600.0, "1 h"), (6 * 3600.0, "6 h"))
+    LIVE_WINDOW_LIMIT_S = 60.0
+
+    def __init__(self, description, unit, min_val=0, max_val=100, gauge_type=None, columns=None, offsets=None, history=None, parent=None):
         super().__init__(parent)
         self.description = description
         self.unit = unit
@@ -40,27 +103,40 @@ class GaugeWidget(QWidget):
             self.setFixedSize(200, 150) # Make it taller for bars
 
         if self.gauge_type == "gauge_chart":
-            self.value_history = deque(maxlen=200)
-            self.chart_update_timer = QTimer(self)
-            self.chart_update_timer.timeout.connect(self.update)
-            self.chart_update_timer.start(50)
+            # Charts draw from the shared TimeSeriesStore history; the owner appends samples to it
+            self.history = history if history is not None else ChannelHistory()
+            self.chart_window_index = 0
+            self.chart_window_s, self.chart_window_label = self.CHART_WINDOWS[0]
+
+        # Repaints are batched onto the shared render clock instead of a timer per gauge
+        self.render_clock = GaugeRenderClock.instance()
 
     def set_value(self, value):
         if self.gauge_type in ["gauge_bar", "gauge_chart"]:
             # For single-value gauges, update _value and history
+            if self.gauge_type == "gauge_bar" and value == self._value:
+                return # Nothing changed, no repaint needed
             self._value = value
-            if self.gauge_type == "gauge_chart":
-                self.value_history.append((time.time(), value))
         elif self.gauge_type in ["gauge_table", "gauge_cylinder_bar_chart"]:  # Corrected line to include both types
             # For multi-value gauges (table and cylinder bar chart), expect a list of values
             if isinstance(value, list) and len(value) == len(self.columns):
+                if value == self._values:
+                    return # Nothing changed, no repaint needed
                 self._values = value
             else:
                 # Log a warning if the input type or length doesn't match expectations
                 print(f"Warning: set_value for '{self.description}' (type: {self.gauge_type}) received invalid data.")
                 print(f"Expected list of length {len(self.columns)}, got {type(value)} with length {len(value) if isinstance(value, list) else 'N/A'}")
                 self._values = [0.0] * len(self.columns)  # Reset to zeros for drawing, or consider ["N/A"] if you want explicit error display
-        self.update()  # Trigger paintEvent to redraw the gauge
+        self.render_clock.mark_dirty(self)  # Redrawn on the next shared frame
+
+    def mouseDoubleClickEvent(self, event):
+        if self.gauge_type == "gauge_chart":
+            # Cycle between the live window and the long-range trend windows
+            self.chart_window_index = (self.chart_window_index + 1) % len(self.CHART_WINDOWS)
+            self.chart_window_s, self.chart_window_label = self.CHART_WINDOWS[self.chart_window_index]
+            self.render_clock.mark_dirty(self)
+        super().mouseDoubleClickEvent(event)
 
     def paintEvent(self, event):
         painter = QPainter(self)
@@ -91,7 +167,8 @@ class GaugeWidget(QWidget):
         font.setPointSize(24)
         painter.setFont(font)
         value_rect = self.rect().adjusted(5, self.height() // 3, -5, -self.height() // 3)
-        painter.drawText(value_rect, Qt.AlignCenter, f"{self._value:.1f}")
+        numeric = isinstance(self._value, (int, float))
+        painter.drawText(value_rect, Qt.AlignCenter, f"{self._value:.1f}" if numeric else str(self._value)) # "N/A", "ERROR"
 
         # Bar Gauge drawing area
         bar_height = 20
@@ -105,7 +182,7 @@ class GaugeWidget(QWidget):
         painter.drawRect(bar_rect)
 
         # Calculate fill level based on value within min_val and max_val
-        normalized_value = (self._value - self.min_val) / (self.max_val - self.min_val)
+        normalized_value = (self._value - self.min_val) / (self.max_val - self.min_val) if numeric else 0
         normalized_value = max(0, min(1, normalized_value)) # Clamp between 0 and 1
 
         fill_width = bar_width * normalized_value
@@ -116,7 +193,9 @@ class GaugeWidget(QWidget):
         # Description, Unit, and Value on the top line
         font.setPointSize(14)
         painter.setFont(font)
-        top_text = f"{self.description} ({self.unit}): {self._value:.1f}"
+        top_text = f"{self.description} ({self.unit}): " + (f"{self._value:.1f}" if isinstance(self._value, (int, float)) else str(self._value))
+        if self.chart_window_index:
+            top_text += f" [{self.chart_window_label}]"
         
         # Rectangle for the top text
         text_rect = self.rect().adjusted(5, 5, -5, -self.height() // 4 * 3)
@@ -140,39 +219,74 @@ class GaugeWidget(QWidget):
         painter.setBrush(QBrush(QColor(40, 40, 40))) # Darker background for the chart area
         painter.drawRect(chart_rect)
 
-        if len(self.value_history) < 2:
-            return # Not enough data to draw a line
-
         # Calculate X-axis (time) range - typically last 10 seconds
-        current_time = time.time()
-        start_time_chart = current_time - 10
-        end_time_chart = current_time
+        end_time_chart = time.time()
+        start_time_chart = end_time_chart - self.chart_window_s
 
-        # Filter values within the last 10 seconds
-        visible_history = [(t, v) for t, v in self.value_history if t >= start_time_chart]
+        if self.chart_window_s > self.LIVE_WINDOW_LIMIT_S and self.history.tiers is not None:
+            self._paint_trend(painter, chart_rect, start_time_chart, end_time_chart)
+            self._paint_chart_reference_lines(painter, chart_rect)
+            return
+
+        if len(self.history) < 2:
+            return # Not enough data to draw a line
 
-        if len(visible_history) < 2:
+        # Zero-copy view of the visible window, reduced to at most four points per pixel column
+        window_times, window_values = self.history.window(start_time_chart, end_time_chart, lead_in=1)
+        decimated_x, decimated_values = minmax_decimate(window_times, window_values, start_time_chart, end_time_chart, chart_rect.width())
+        if len(decimated_x) < 2:
             return # Still not enough data after filtering
 
         # Draw the chart line
         painter.setPen(QPen(QColor(0, 200, 255), 2)) # Blue line for the chart data
 
-        points = []
-        for t, value in visible_history:
-            # Normalize time for X-axis (0 to 1 across the chart width)
-            time_normalized = (t - start_time_chart) / (end_time_chart - start_time_chart)
-            x = chart_rect.x() + time_normalized * chart_rect.width()
-
+        value_range = (self.max_val - self.min_val) or 1
+        polyline = QPolygonF()
+        for x, value in zip(decimated_x.tolist(), decimated_values.tolist()):
             # Normalize value for Y-axis (inverted because Y increases downwards)
-            value_normalized = (value - self.min_val) / (self.max_val - self.min_val)
+            value_normalized = (value - self.min_val) / value_range
             value_normalized = max(0, min(1, value_normalized)) # Clamp between 0 and 1
-            y = chart_rect.y() + (1 - value_normalized) * chart_rect.height()
-            points.append(QPointF(x, y))
+            polyline.append(QPointF(chart_rect.x() + x, chart_rect.y() + (1 - value_normalized) * chart_rect.height()))
+        painter.save()
+        painter.setClipRect(chart_rect) # The sample before the window lies left of the chart
+        painter.drawPolyline(polyline)
+        painter.restore()
+
+        self._paint_chart_reference_lines(painter, chart_rect)
+
+    def _paint_trend(self, painter, chart_rect, start_time_chart, end_time_chart):
+        # Bucket count is bounded by the chart width, so render time does not depend on the window length
+        tier = self.history.tiers.select_tier(self.chart_window_s, chart_rect.width())
+        starts, mins, means, maxs = tier.window(start_time_chart, end_time_chart)
+        valid = np.isfinite(means)
+        if valid.sum() < 2:
+            return
+
+        x_scale = chart_rect.width() / (end_time_chart - start_time_chart)
+        xs = (chart_rect.x() + (starts[valid] + tier.bucket_s / 2 - start_time_chart) * x_scale).tolist()
+        value_range = (self.max_val - self.min_val) or 1
+
+        def to_y(values):
+            normalized = np.clip((values - self.min_val) / value_range, 0, 1)
+            return (chart_rect.y() + (1 - normalized) * chart_rect.height()).tolist()
+
+        max_ys, mean_ys, min_ys = to_y(maxs[valid]), to_y(means[valid]), to_y(mins[valid])
 
-        # Connect the points to draw the line chart
-        for i in range(len(points) - 1):
-            painter.drawLine(points[i], points[i+1])
+        painter.save()
+        painter.setClipRect(chart_rect)
 
+        # Min/max envelope, then the mean line on top
+        band = QPolygonF([QPointF(x, y) for x, y in zip(xs, max_ys)] + [QPointF(x, y) for x, y in zip(reversed(xs), reversed(min_ys))])
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QBrush(QColor(0, 200, 255, 70)))
+        painter.drawPolygon(band)
+
+        painter.setPen(QPen(QColor(0, 200, 255), 2))
+        painter.setBrush(Qt.NoBrush)
+        painter.drawPolyline(QPolygonF([QPointF(x, y) for x, y in zip(xs, mean_ys)]))
+        painter.restore()
+
+    def _paint_chart_reference_lines(self, painter, chart_rect):
         # Draw min/max lines for reference on the chart
         painter.setPen(QPen(QColor(100, 100, 100), 1, Qt.DotLine)) # Dotted grey lines
         # Min line
@@ -296,6 +410,9 @@ class DataSourceDialog(QDialog):
         self.can_interface = None
         self.can_channel = None
         self.can_bitrate = None
+        self.transport_profile = None
+        self.engine_simulator = None
+        self.listen_broadcast = False
 
         main_layout = QVBoxLayout()
 
@@ -303,6 +420,7 @@ class DataSourceDialog(QDialog):
         self.source_combo = QComboBox()
         self.source_combo.addItem("Live CAN Data", "CAN")
         self.source_combo.addItem("RAM Dump File", "RAM")
+        self.source_combo.addItem("Offline Edit (saves to file)", "OFFLINE")
         self.source_combo.currentIndexChanged.connect(self.update_option_visibility)
         main_layout.addWidget(source_label)
         main_layout.addWidget(self.source_combo)
@@ -359,8 +477,46 @@ class DataSourceDialog(QDialog):
         ram_path_input_layout.addWidget(self.ram_path_input)
         ram_layout.addLayout(ram_path_input_layout)
 
+        # Optional real-bus timing for the file sources, to judge responsiveness and poll rates on a desk
+        self.emulate_checkbox = QCheckBox("Emulate CAN timing")
+        ram_layout.addWidget(self.emulate_checkbox)
+
+        emulate_layout = QHBoxLayout()
+        self.emulate_bitrate_input = QLineEdit("500000")
+        self.emulate_bitrate_input.setValidator(QIntValidator(1000, 10000000, self))
+        self.emulate_latency_input = QLineEdit("2")
+        self.emulate_latency_input.setValidator(QDoubleValidator(0.0, 1000.0, 2, self))
+        self.emulate_drop_input = QLineEdit("0")
+        self.emulate_drop_input.setValidator(QDoubleValidator(0.0, 100.0, 2, self))
+        emulate_layout.addWidget(QLabel("Bitrate:"))
+        emulate_layout.addWidget(self.emulate_bitrate_input)
+        emulate_layout.addWidget(QLabel("Latency (ms):"))
+        emulate_layout.addWidget(self.emulate_latency_input)
+        emulate_layout.addWidget(QLabel("Drop (%):"))
+        emulate_layout.addWidget(self.emulate_drop_input)
+        ram_layout.addLayout(emulate_layout)
+
+        # Seeded engine model driving the live channels, so gauges and logs show coherent signals without a car
+        self.simulate_checkbox = QCheckBox("Simulate engine (RAM Dump File only)")
+        ram_layout.addWidget(self.simulate_checkbox)
+
+        simulate_layout = QHBoxLayout()
+        self.simulate_rate_input = QLineEdit(f"{DEFAULT_RATE_HZ:g}")
+        self.simulate_rate_input.setValidator(QDoubleValidator(1.0, 10000.0, 1, self))
+        self.simulate_seed_input = QLineEdit("0")
+        self.simulate_seed_input.setValidator(QIntValidator(0, 2147483647, self))
+        simulate_layout.addWidget(QLabel("Rate (Hz):"))
+        simulate_layout.addWidget(self.simulate_rate_input)
+        simulate_layout.addWidget(QLabel("Seed:"))
+        simulate_layout.addWidget(self.simulate_seed_input)
+        ram_layout.addLayout(simulate_layout)
+
         main_layout.addWidget(self.ram_path_group)
 
+        # Channels in BROADCAST_DEFINITIONS are then read from the ECU's own frames instead of being polled
+        self.broadcast_checkbox = QCheckBox("Listen to ECU broadcast frames")
+        main_layout.addWidget(self.broadcast_checkbox)
+
         # Buttons
         button_layout = QHBoxLayout()
         ok_button = QPushButton("OK")
@@ -381,7 +537,7 @@ class DataSourceDialog(QDialog):
         if selected_type == "CAN":
             self.can_options_group.show()
             self.ram_path_group.hide()
-        elif selected_type == "RAM":
+        elif selected_type in ("RAM", "OFFLINE"):
             self.can_options_group.hide()
             self.ram_path_group.show()
         else:
@@ -390,11 +546,29 @@ class DataSourceDialog(QDialog):
 
     def accept(self):
         self.source_type = self.source_combo.currentData()
-        if self.source_type == "RAM":
+        self.listen_broadcast = self.broadcast_checkbox.isChecked()
+        if self.source_type in ("RAM", "OFFLINE"):
             self.ram_dump_path = self.ram_path_input.text().strip()
             # If the user clears the path, revert to default
             if not self.ram_dump_path:
                 self.ram_dump_path = os.path.normpath("./ram/calram.bin")
+            if self.emulate_checkbox.isChecked():
+                try:
+                    self.transport_profile = TransportProfile(
+                        bitrate=int(self.emulate_bitrate_input.text()),
+                        request_latency_s=float(self.emulate_latency_input.text()) / 1000.0,
+                        drop_rate=float(self.emulate_drop_input.text()) / 100.0
+                    )
+                except ValueError:
+                    QMessageBox.warning(self, "Input Error", "Please provide valid numbers for the CAN timing emulation.")
+                    return
+            if self.simulate_checkbox.isChecked():
+                try:
+                    self.engine_simulator = EngineSimulator(seed=int(self.simulate_seed_input.text()),
+                                                            rate_hz=float(self.simulate_rate_input.text()))
+                except ValueError:
+                    QMessageBox.warning(self, "Input Error", "Please provide a valid rate and seed for the engine simulation.")
+                    return
         elif self.source_type == "CAN":
             self.can_interface = self.interface_combo.currentText().strip()
             self.can_channel = self.channel_input.text().strip()
@@ -414,6 +588,50 @@ class DataSourceDialog(QDialog):
 
         super().accept()
 
+class _MapLoadSignals(QObject):
+    finished = pyqtSignal(object) # MapLoadJob
+
+
+class _MapLoadRunnable(QRunnable):
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+        self.signals = _MapLoadSignals()
+
+    def run(self):
+        if not self.job.cancelled:
+            try:
+                self.job.run()
+            except MapLoadCancelled:
+                pass
+            except Exception as e:
+                self.job.error = e
+        self.signals.finished.emit(self.job) # Delivered on the GUI thread
+
+
+class MapLoadQueue(QObject):
+    """Runs maptable reads on a background thread and hands the decoded maps back to the GUI thread."""
+    FOREGROUND_PRIORITY = 1
+    BACKGROUND_PRIORITY = 0
+
+    def __init__(self, data_manager, parent=None):
+        super().__init__(parent)
+        self.data_manager = data_manager
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1) # The bus is serial; one load at a time lets the visible tab jump the queue
+
+    def submit(self, definition, on_finished, background=False):
+        """Queues a load and returns its MapLoadJob. on_finished(job) is called on the GUI thread."""
+        job = MapLoadJob(definition, self.data_manager)
+        runnable = _MapLoadRunnable(job)
+        runnable.signals.finished.connect(on_finished)
+        self.pool.start(runnable, self.BACKGROUND_PRIORITY if background else self.FOREGROUND_PRIORITY)
+        return job
+
+    def wait_for_done(self, timeout_ms=-1):
+        return self.pool.waitForDone(timeout_ms)
+
+
 class MapTableWidget(QWidget):
     class _CustomTableWidget(QTableWidget):
         def __init__(self, *args, **kwargs):
@@ -431,11 +649,17 @@ class MapTableWidget(QWidget):
                     self._maptable_widget.draw_cursor(painter)
                     painter.end()
 
-    def __init__(self, maptable_definition, data_manager, parent=None):
+    load_finished = pyqtSignal(bool) # Emitted when a requested load completes (True) or is cancelled/fails (False)
+    edited = pyqtSignal() # Emitted after a write to this map has been committed and displayed
+
+    def __init__(self, maptable_definition, data_manager, timeseries=None, map_loader=None, parent=None):
         super().__init__(parent)
         self.definition = maptable_definition
         self.data_manager = data_manager
-        self.table = QTableWidget(self.definition["data_rows"], self.definition["data_cols"])
+        self.timeseries = timeseries # When set, the cursor reads the latest polled values instead of the bus
+        self.map_loader = map_loader # MapLoadQueue for background reads, None to read synchronously
+        self._load_job = None
+        self.decoded_map = None
 
         self._min_data_value = float('inf')
         self._max_data_value = float('-inf')
@@ -452,6 +676,12 @@ class MapTableWidget(QWidget):
         self.x_axis_unit_label.hide()
         self.layout.addWidget(self.x_axis_unit_label)
 
+        # Shown while a background load is in progress
+        self.loading_label = QLabel(f"Loading {self.definition['description']}...")
+        self.loading_label.setAlignment(Qt.AlignCenter)
+        self.loading_label.hide()
+        self.layout.addWidget(self.loading_label)
+
         table_and_y_unit_layout = QHBoxLayout()
         self.layout.addLayout(table_and_y_unit_layout)
 
@@ -517,11 +747,8 @@ class MapTableWidget(QWidget):
         self.min_data_val = float('inf') 
         self.max_data_val = float('-inf') 
 
-        # Load and display initial data
-        self._load_and_display_map_data()
-
-        # Connect signals for cell editing
-        self.table.itemChanged.connect(self._handle_cell_edit)
+        # Headers and placeholders until the first load completes
+        self._display_map_data(None)
 
     def _update_min_max_data_values(self, new_value):
         if new_value < self._min_data_value:
@@ -532,25 +759,58 @@ class MapTableWidget(QWidget):
     def _convert_to_scaled(self, raw_val, scale, offset):
         return (raw_val * scale) + offset
 
-    def _convert_to_raw(self, scaled_value, reverse_scale, reverse_offset, element_size):
-        raw_value_float = (scaled_value - reverse_offset) * reverse_scale
-        
-        raw_value = int(round(raw_value_float))
+    def request_load(self, background=False):
+        """Starts a background read of this map. The table shows a loading state until the result arrives."""
+        if not self.data_manager.is_connected() or self.map_loader is None:
+            self._load_and_display_map_data()
+            self.load_finished.emit(True)
+            return
+
+        self.cancel_load()
+        self._set_loading(True)
+        self._load_job = self.map_loader.submit(self.definition, self._on_map_loaded, background)
+
+    def cancel_load(self):
+        if self._load_job is not None:
+            self._load_job.cancel()
+            self._load_job = None
+            self._set_loading(False)
 
-        max_unsigned_val = (1 << (element_size * 8)) - 1
-        min_signed_val = -(1 << (element_size * 8 - 1))
-        max_signed_val = (1 << (element_size * 8 - 1)) - 1
+    @property
+    def is_loading(self):
+        return self._load_job is not None
 
-        if raw_value < 0:
-            raw_value = 0 
+    def _set_loading(self, loading):
+        self.loading_label.setVisible(loading)
+        self.table.setEnabled(not loading)
 
-        raw_value = max(0, min(raw_value, max_unsigned_val))
+    def _on_map_loaded(self, job):
+        if job is not self._load_job:
+            return # Superseded or cancelled, a newer request owns the table
+        self._load_job = None
+        self._set_loading(False)
 
-        return raw_value.to_bytes(element_size, 'big', signed=False)
+        if job.cancelled:
+            self.load_finished.emit(False)
+            return
+        if job.error is not None:
+            self._display_load_error(job.error)
+            self.load_finished.emit(False)
+            return
+        self._display_map_data(job.result)
+        self.load_finished.emit(True)
 
     def _load_and_display_map_data(self):
-        self.table.blockSignals(True)
+        """Synchronous load, only for when nothing is read over the bus (disconnected, or no MapLoadQueue)."""
+        if not self.data_manager.is_connected():
+            self._display_map_data(None)
+            return
+        try:
+            self._display_map_data(MapLoadJob(self.definition, self.data_manager).run())
+        except Exception as e:
+            self._display_load_error(e)
 
+    def _show_axis_units(self):
         x_axis_unit = self.definition['units'].get('x_axis', '')
         if x_axis_unit:
             self.x_axis_unit_label.setText(x_axis_unit)
@@ -565,113 +825,83 @@ class MapTableWidget(QWidget):
         else:
             self.y_axis_unit_label.hide()
 
-        if not self.data_manager.is_connected():
-            print(f"MapTableWidget: Not connected. Populating '{self.definition['description']}' with 'N/A'.")
-            x_values = [f"X{i}" for i in range(self.definition["data_cols"])]
-            self.table.setHorizontalHeaderLabels(x_values)
-            self.x_axis_values = []
-            self.y_axis_values = []
+    def _fill_cells(self, text):
+        for r in range(self.definition["data_rows"]):
+            for c in range(self.definition["data_cols"]):
+                item = QTableWidgetItem(text)
+                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+                self.table.setItem(r, c, item)
 
-            if "y_axis_address" in self.definition:
-                y_values = [f"Y{i}" for i in range(self.definition["data_rows"])]
-                self.table.setVerticalHeaderLabels(y_values)
-                self.table.verticalHeader().show()
-            else:
-                self.table.verticalHeader().hide()
+    def _display_map_data(self, decoded):
+        """Populates headers and cells from a DecodedMap, or with 'N/A' placeholders when decoded is None."""
+        self.table.blockSignals(True)
+        self._show_axis_units()
+        self.decoded_map = decoded
 
-            for r in range(self.definition["data_rows"]):
-                for c in range(self.definition["data_cols"]):
-                    item = QTableWidgetItem("N/A")
-                    item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                    self.table.setItem(r, c, item)
+        try:
+            if decoded is None:
+                if not self.data_manager.is_connected():
+                    log.info("Not connected. Populating '%s' with 'N/A'.", self.definition['description'])
+                x_values = [f"X{i}" for i in range(self.definition["data_cols"])]
+                self.table.setHorizontalHeaderLabels(x_values)
+                self.x_axis_values = []
+                self.y_axis_values = []
+
+                if "y_axis_address" in self.definition:
+                    y_values = [f"Y{i}" for i in range(self.definition["data_rows"])]
+                    self.table.setVerticalHeaderLabels(y_values)
+                    self.table.verticalHeader().show()
+                else:
+                    self.table.verticalHeader().hide()
 
-            self.table.blockSignals(False)
-            self.table.viewport().update()
-            return
+                self._fill_cells("N/A")
+                return
 
-        try:
-            x_axis_def = self.definition
-            x_raw_bytes = self.data_manager.read_data(x_axis_def["x_axis_address"], x_axis_def["x_axis_length"])
-            x_values_str = []
-            self.x_axis_values = []
-            if x_raw_bytes and len(x_raw_bytes) == x_axis_def["x_axis_length"]:
-                for i in range(0, x_axis_def["x_axis_length"], x_axis_def["x_axis_element_size"]):
-                    raw_val = int.from_bytes(x_raw_bytes[i:i+x_axis_def["x_axis_element_size"]], 'big', signed=False)
-                    scaled_val = self._convert_to_scaled(raw_val, x_axis_def["x_axis_scale"], x_axis_def["x_axis_offset"])
-                    self.x_axis_values.append(scaled_val)
-                    x_values_str.append(f"{int(round(scaled_val))}")
+            if decoded.x_axis is not None:
+                self.x_axis_values = decoded.x_axis.tolist()
+                x_values_str = [f"{int(round(v))}" for v in self.x_axis_values]
             else:
+                self.x_axis_values = []
                 x_values_str = [f"X{i} (Err)" for i in range(self.definition["data_cols"])]
-                print(f"Warning: Failed to read X-axis data for {self.definition['description']}")
+                log.warning("Failed to read X-axis data for %s", self.definition['description'])
             self.table.setHorizontalHeaderLabels(x_values_str)
 
-            y_values_str = []
             self.y_axis_values = []
-            if "y_axis_address" in self.definition:
-                y_axis_def = self.definition
-                y_raw_bytes = self.data_manager.read_data(y_axis_def["y_axis_address"], y_axis_def["y_axis_length"])
-                if y_raw_bytes and len(y_raw_bytes) == y_axis_def["y_axis_length"]:
-                    for i in range(0, y_axis_def["y_axis_length"], y_axis_def["y_axis_element_size"]):
-                        raw_val = int.from_bytes(y_raw_bytes[i:i+y_axis_def["y_axis_element_size"]], 'big', signed=False)
-                        scaled_val = self._convert_to_scaled(raw_val, y_axis_def["y_axis_scale"], y_axis_def["y_axis_offset"])
-                        self.y_axis_values.append(scaled_val)
-                        y_values_str.append(f"{int(round(scaled_val))}")
+            if decoded.has_y_axis:
+                if decoded.y_axis is not None:
+                    self.y_axis_values = decoded.y_axis.tolist()
+                    y_values_str = [f"{int(round(v))}" for v in self.y_axis_values]
                 else:
                     y_values_str = [f"Y{i} (Err)" for i in range(self.definition["data_rows"])]
-                    print(f"Warning: Failed to read Y-axis data for {self.definition['description']}")
+                    log.warning("Failed to read Y-axis data for %s", self.definition['description'])
                 self.table.setVerticalHeaderLabels(y_values_str)
                 self.table.verticalHeader().show()
             else:
                 self.table.verticalHeader().hide()
 
-            data_def = self.definition
-            data_block_length = data_def["data_rows"] * data_def["data_cols"] * data_def["data_element_size"]
-            data_raw_bytes = self.data_manager.read_data(data_def["data_address"], data_block_length)
-
-            if data_raw_bytes and len(data_raw_bytes) == data_block_length:
-                idx = 0
-                for r in range(data_def["data_rows"]):
-                    for c in range(data_def["data_cols"]):
-                        if idx + data_def["data_element_size"] <= len(data_raw_bytes):
-                            cell_raw_bytes = data_raw_bytes[idx : idx + data_def["data_element_size"]]
-                            cell_raw_val = int.from_bytes(cell_raw_bytes, 'big', signed=False)
-                            scaled_val = self._convert_to_scaled(cell_raw_val, data_def["data_scale"], data_def["data_offset"])
-
-                            item = QTableWidgetItem(f"{scaled_val:.1f}")
-                            self.table.setItem(r, c, item)
-                            item.setFlags(item.flags() | Qt.ItemIsEditable)
-                            idx += data_def["data_element_size"]
-                        else:
-                            item = QTableWidgetItem("N/A")
-                            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                            self.table.setItem(r, c, item)
-                            print(f"Warning: Incomplete data block for {self.definition['description']} at row {r}, col {c}")
-                            break
-
-                    if idx + data_def["data_element_size"] > len(data_raw_bytes) and c < data_def["data_cols"] -1 : 
-                         break
-
-                self._apply_color_gradient() 
-            else:
-                print(f"Warning: Failed to read data for {self.definition['description']}. Populating with 'Error'.")
-                for r in range(data_def["data_rows"]):
-                    for c in range(data_def["data_cols"]):
-                        item = QTableWidgetItem("Error")
-                        item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+            if decoded.data is not None:
+                for r, row_values in enumerate(decoded.data.tolist()):
+                    for c, scaled_val in enumerate(row_values):
+                        item = QTableWidgetItem(f"{scaled_val:.1f}")
                         self.table.setItem(r, c, item)
+                        item.setFlags(item.flags() | Qt.ItemIsEditable)
+                self._apply_color_gradient()
+            else:
+                log.warning("Failed to read data for %s. Populating with 'Error'.", self.definition['description'])
+                self._fill_cells("Error")
+        finally:
+            self.table.blockSignals(False)
+            self.table.viewport().update()
 
-        except Exception as e:
-            print(f"Error loading map data for {self.definition['description']}: {e}")
-            QMessageBox.critical(self, "Map Load Error", f"Failed to load map '{self.definition['description']}': {e}")
-            for r in range(self.definition["data_rows"]):
-                for c in range(self.definition["data_cols"]):
-                    item = QTableWidgetItem("Error")
-                    item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                    self.table.setItem(r, c, item)
+    def _display_load_error(self, error):
+        log.error("Error loading map data for %s: %s", self.definition['description'], error)
+        QMessageBox.critical(self, "Map Load Error", f"Failed to load map '{self.definition['description']}': {error}")
+        self.table.blockSignals(True)
+        try:
+            self._fill_cells("Error")
         finally:
             self.table.blockSignals(False)
             self.table.viewport().update()
-            self.table.repaint() 
 
     def _apply_color_gradient(self):
 
@@ -740,225 +970,158 @@ class MapTableWidget(QWidget):
                     except ValueError:
                         item.setBackground(QColor(255, 0, 0)) 
                     except Exception as e:
-                        print(f"Error applying color to cell [{r},{c}]: {e}")
+                        log.error("Error applying color to cell [%d,%d]: %s", r, c, e)
                         item.setBackground(QColor(200, 200, 200)) 
 
     def _handle_cell_edit(self, item):
-        self.table.blockSignals(True)
+        row = item.row()
+        col = item.column()
         try:
-            row = item.row()
-            col = item.column()
-            new_display_value_str = item.text()
-
-            try:
-                new_scaled_value = float(new_display_value_str)
-            except ValueError:
-                QMessageBox.warning(self, "Invalid Input", "Please enter a valid number.")
-                original_value = self._get_original_data_value(row, col)
-                item.setText(f"{original_value:.2f}")
-                return
-
-            data_def = self.definition
-
-            # Calculate address for the cell
-            offset_in_block = (row * data_def["data_cols"] + col) * data_def["data_element_size"]
-            target_address = data_def["data_address"] + offset_in_block
-
-            # Convert scaled float value back to raw bytes
-            raw_bytes_to_write = self._convert_to_raw(
-                new_scaled_value,
-                data_def["data_reverse_scale"],
-                data_def["data_reverse_offset"],
-                data_def["data_element_size"]
-            )
+            new_scaled_value = float(item.text())
+        except ValueError:
+            QMessageBox.warning(self, "Invalid Input", "Please enter a valid number.")
+            self._restore_cell(row, col)
+            return
 
-            # Write the data using DataManager
-            if self.data_manager.write_data(target_address, raw_bytes_to_write):
-                self._apply_color_gradient()
-            else:
-                QMessageBox.critical(self, "Write Error",
-                                     f"Failed to write changes to data source at address 0x{target_address:X}.")
-                # Revert cell content if write failed
-                original_value = self._get_original_data_value(row, col)
-                item.setText(f"{original_value:.2f}")
+        self.apply_transform(lambda values, mask: map_transforms.set_value(values, mask, new_scaled_value),
+                             [(row, row, col, col)], label=f"Set {self.definition['description']} [{row}, {col}]")
+        self._restore_cell(row, col) # Show the value as quantised, or the old value if the write failed
 
+    def _restore_cell(self, row, col):
+        """Shows the last known value of a cell in place of whatever was typed into it."""
+        self.table.blockSignals(True)
+        try:
+            item = self.table.item(row, col)
+            if item and self.decoded_map is not None and self.decoded_map.data is not None:
+                item.setText(f"{self.decoded_map.data[row, col]:.1f}")
         finally:
             self.table.blockSignals(False)
 
-    def _get_original_data_value(self, row, col): #
-        # Re-read the data from the data source to get the true original value (for robustness)
-        data_def = self.definition #
-        offset_in_block = (row * data_def["data_cols"] + col) * data_def["data_element_size"] #
-        target_address = data_def["data_address"] + offset_in_block #
-        length = data_def["data_element_size"] #
+    def selected_cell_ranges(self):
+        """Current selection as (top_row, bottom_row, left_col, right_col) tuples, for lib.map_transforms."""
+        return [(r.topRow(), r.bottomRow(), r.leftColumn(), r.rightColumn()) for r in self.table.selectedRanges()]
 
-        raw_bytes = self.data_manager.read_data(target_address, length) #
-        if raw_bytes: #
-            raw_val = int.from_bytes(raw_bytes, 'big', signed=False) #
-            scaled_val = self._convert_to_scaled(raw_val, data_def["data_scale"], data_def["data_offset"]) #
-            return scaled_val #
-        return 0.0 # Default if read fails #
+    def _current_map(self):
+        """
+        DecodedMap to edit against, or None while it is loading. A map without data is queued for a background
+        load rather than read here, so the GUI thread never waits on the bus; retry once load_finished is emitted.
+        """
+        if not self.is_loading and (self.decoded_map is None or self.decoded_map.data is None):
+            self.request_load()
+        if self.is_loading or self.decoded_map is None or self.decoded_map.data is None:
+            return None
+        return self.decoded_map
+
+    def show_unavailable(self):
+        """Tells the user why _current_map() returned None."""
+        description = self.definition['description']
+        if self.is_loading:
+            QMessageBox.information(self, "Map Loading", f"'{description}' is still loading. Try again once it is shown.")
+        else:
+            QMessageBox.critical(self, "Read Error", f"Failed to read current data of '{description}' from ECU/RAM dump.")
 
-    def adjust_selected_cells(self, adjustment_value, operation_type):
-        selected_ranges = self.table.selectedRanges()
-        if not selected_ranges:
-            QMessageBox.warning(self, "No Cells Selected", "Please select cells to adjust.")
-            return
+    def stage_transform(self, transaction, transform, ranges=None):
+        """
+        Applies transform(values, mask) -> new_values to the map (ranges=None for the whole map), quantises the
+        result through lib.map_codec and stages the changed bytes in transaction. Returns the new raw data block
+        for finish_transform() once the transaction commits, or None if the edit could not be prepared.
+        """
+        if not self.data_manager.is_connected():
+            QMessageBox.warning(self, "Not Connected", "Please connect to a data source first.")
+            return None
 
-        data_def = self.definition
-        
-        self.table.blockSignals(True)
-        
-        # Accumulate all changes for a single write operation, reads the entire block, modifies it in memory, then writes it back.
-        data_block_length = data_def["data_rows"] * data_def["data_cols"] * data_def["data_element_size"]
-        current_data_raw_bytes = self.data_manager.read_data(data_def["data_address"], data_block_length)
+        decoded = self._current_map()
+        if decoded is None:
+            self.show_unavailable()
+            return None
 
-        if not current_data_raw_bytes:
-            QMessageBox.critical(self, "Read Error", "Failed to read current data from ECU/RAM dump for adjustment.")
-            self.table.blockSignals(False)
+        data_def = self.definition
+        try:
+            mask = map_transforms.selection_mask(decoded.data.shape, ranges)
+            new_raw = encode_map_data(data_def, transform(decoded.data, mask))
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"An error occurred while adjusting '{data_def['description']}': {e}")
+            return None
+
+        transaction.stage_block(data_def["data_address"], decoded.raw_data, new_raw, data_def["data_element_size"])
+        return new_raw
+
+    def finish_transform(self, new_raw):
+        """Shows a committed edit from its raw block, without re-reading the map."""
+        decoded = self.decoded_map
+        old_values = decoded.data
+        decoded.raw_data = new_raw
+        decoded.data = decode_map_data(self.definition, new_raw) # Quantised values, as the ECU now holds them
+        self._refresh_cells(decoded.data, changed=decoded.data != old_values)
+        self.edited.emit()
+
+    def apply_written_bytes(self, address, data):
+        """Shows bytes written over this map from elsewhere (e.g. an undo) without re-reading the map."""
+        decoded = self.decoded_map
+        if decoded is None or decoded.data is None:
             return
+        start = self.definition["data_address"]
+        lo = max(address, start)
+        hi = min(address + len(data), start + len(decoded.raw_data))
+        if lo >= hi:
+            return
+        raw = bytearray(decoded.raw_data)
+        raw[lo - start:hi - start] = data[lo - address:hi - address]
+        self.finish_transform(bytes(raw))
+
+    def apply_transform(self, transform, ranges=None, label=None):
+        """Stages and commits a transform of this map alone, as one undo step. Returns True on success."""
+        transaction = self.data_manager.begin_transaction(label or f"Edit {self.definition['description']}")
+        new_raw = self.stage_transform(transaction, transform, ranges)
+        if new_raw is None:
+            return False
+        if not transaction.commit():
+            QMessageBox.critical(self, "Write Error",
+                                 f"Failed to write changes to '{self.definition['description']}': {transaction.error}")
+            self.request_load() # Show what the source actually holds
+            return False
+        self.finish_transform(new_raw)
+        return True
 
-        modified_data_bytes = bytearray(current_data_raw_bytes)
-
+    def _refresh_cells(self, values, changed=None):
+        """Rewrites cell text from values, only where changed is True if given, and recolours the map."""
+        self.table.blockSignals(True)
         try:
-            for selected_range in selected_ranges:
-                top_row = selected_range.topRow()
-                bottom_row = selected_range.bottomRow()
-                left_col = selected_range.leftColumn()
-                right_col = selected_range.rightColumn()
-
-                for r in range(top_row, bottom_row + 1):
-                    for c in range(left_col, right_col + 1):
-                        # Calculate offset within the data block for the current cell
-                        offset_in_block = (r * data_def["data_cols"] + c) * data_def["data_element_size"]
-                        
-                        # Extract current cell's raw bytes
-                        cell_raw_bytes = modified_data_bytes[offset_in_block : offset_in_block + data_def["data_element_size"]]
-                        
-                        # Convert to scaled value
-                        raw_val = int.from_bytes(cell_raw_bytes, 'big', signed=False)
-                        current_scaled_val = self._convert_to_scaled(raw_val, data_def["data_scale"], data_def["data_offset"])
-                        
-                        new_scaled_val = current_scaled_val
-                        if operation_type == "increment":
-                            new_scaled_val += adjustment_value
-                        elif operation_type == "decrement":
-                            new_scaled_val -= adjustment_value
-                        elif operation_type == "scale":
-                            new_scaled_val *= adjustment_value
-                        
-                        # Convert new scaled value back to raw bytes
-                        new_raw_bytes_for_cell = self._convert_to_raw(
-                            new_scaled_val,
-                            data_def["data_reverse_scale"],
-                            data_def["data_reverse_offset"],
-                            data_def["data_element_size"]
-                        )
-                        
-                        # Update the bytearray with the new raw bytes for the cell
-                        modified_data_bytes[offset_in_block : offset_in_block + data_def["data_element_size"]] = new_raw_bytes_for_cell
-
-                        # Update the QTableWidgetItem display
-                        item = self.table.item(r, c)
-                        if item:
-                            item.setText(f"{new_scaled_val:.2f}")
-                        else:
-                            item = QTableWidgetItem(f"{new_scaled_val:.2f}")
-                            self.table.setItem(r, c, item)
-                        
-            # After processing all selected cells, write the entire modified block back
-            if self.data_manager.write_data(data_def["data_address"], bytes(modified_data_bytes)):
-                self._apply_color_gradient() # Reapply gradient after successful write
-                self.table.viewport().update() # Force repaint
-                
-                self._apply_color_gradient()
-                self.table.viewport().update()
-
-                QMessageBox.information(self, "Adjustment Applied", "Selected cells adjusted and map reloaded.")
-            else:
-                QMessageBox.critical(self, "Write Error",
-                                    f"Failed to write adjusted data to source at address 0x{data_def['data_address']:X}.")
-                self._load_and_display_map_data() 
+            if changed is None:
+                changed = np.ones(values.shape, dtype=bool)
+            for r, c in zip(*np.nonzero(changed)):
+                item = self.table.item(r, c)
+                if item is None:
+                    item = QTableWidgetItem()
+                    item.setFlags(item.flags() | Qt.ItemIsEditable)
+                    self.table.setItem(r, c, item)
+                item.setText(f"{values[r, c]:.1f}")
+            self._apply_color_gradient()
         finally:
             self.table.blockSignals(False)
+            self.table.viewport().update()
 
-    def inc_data(self, increment_value): #
-        self._apply_batch_operation(lambda val, inc=increment_value: val + inc) #
-
-    def dec_data(self, decrement_value): #
-        self._apply_batch_operation(lambda val, dec=decrement_value: val - dec) #
-
-    def scale_data(self, scale_factor): #
-        self._apply_batch_operation(lambda val, factor=scale_factor: val * factor) #
-
-    def _apply_batch_operation(self, operation_func): #
-        if not self.data_manager.is_connected(): #
-            QMessageBox.warning(self, "Not Connected", "Please connect to a data source first.") #
-            return #
+    def adjust_selected_cells(self, adjustment_value, operation_type):
+        ranges = self.selected_cell_ranges()
+        if not ranges:
+            QMessageBox.warning(self, "No Cells Selected", "Please select cells to adjust.")
+            return False
 
-        data_def = self.definition #
-        data_block_length = data_def["data_rows"] * data_def["data_cols"] * data_def["data_element_size"] #
-        
-        # Read the entire data block
-        current_data_raw_bytes = self.data_manager.read_data(data_def["data_address"], data_block_length) #
+        if operation_type not in map_transforms.OPERATIONS:
+            QMessageBox.warning(self, "Invalid Operation", "Unknown adjustment operation.")
+            return False
+        operation = map_transforms.OPERATIONS[operation_type]
+        return self.apply_transform(lambda values, mask: operation(values, mask, adjustment_value), ranges,
+                                    label=f"{operation_type.capitalize()} {self.definition['description']}")
 
-        if not current_data_raw_bytes: #
-            QMessageBox.critical(self, "Read Error", "Failed to read current data from ECU/RAM dump.") #
-            return #
+    def inc_data(self, increment_value):
+        return self.apply_transform(lambda values, mask: map_transforms.increment(values, mask, increment_value))
 
-        # Convert to a mutable bytearray for easier manipulation
-        modified_data_bytes = bytearray(current_data_raw_bytes) #
-        
-        self.table.blockSignals(True) # Block signals during batch update #
+    def dec_data(self, decrement_value):
+        return self.apply_transform(lambda values, mask: map_transforms.decrement(values, mask, decrement_value))
 
-        try:
-            for r in range(data_def["data_rows"]): #
-                for c in range(data_def["data_cols"]): #
-                    # Calculate offset within the block
-                    offset_in_block = (r * data_def["data_cols"] + c) * data_def["data_element_size"] #
-                    
-                    # Extract raw bytes for this cell
-                    cell_raw_bytes = modified_data_bytes[offset_in_block : offset_in_block + data_def["data_element_size"]] #
-                    
-                    # Convert to integer and then to scaled float
-                    raw_val = int.from_bytes(cell_raw_bytes, 'big', signed=False) #
-                    scaled_val = self._convert_to_scaled(raw_val, data_def["data_scale"], data_def["data_offset"]) #
-                    
-                    # Apply the operation
-                    new_scaled_val = operation_func(scaled_val) #
-                    
-                    # Convert back to raw bytes
-                    new_raw_bytes_for_cell = self._convert_to_raw( #
-                        new_scaled_val, #
-                        data_def["data_reverse_scale"], #
-                        data_def["data_reverse_offset"], #
-                        data_def["data_element_size"] #
-                    ) #
-                    
-                    # Update the bytearray
-                    modified_data_bytes[offset_in_block : offset_in_block + data_def["data_element_size"]] = new_raw_bytes_for_cell #
-
-                    # Update the QTableWidgetItem (display only, no signal emitted)
-                    item = self.table.item(r, c) #
-                    if item: #
-                        item.setText(f"{new_scaled_val:.2f}") #
-                    else:
-                        item = QTableWidgetItem(f"{new_scaled_val:.2f}") #
-                        self.table.setItem(r, c, item) #
-                    # Update internal min/max for coloring
-                    self._update_min_max_data_values(new_scaled_val) #
-
-            # Write the entire modified block back to the data source
-            if self.data_manager.write_data(data_def["data_address"], bytes(modified_data_bytes)): #
-                QMessageBox.information(self, "Success", "Map data updated successfully.") #
-                self._apply_color_gradient() # Reapply gradient after successful write #
-                self.table.viewport().update() # Force repaint #
-            else:
-                QMessageBox.critical(self, "Write Error", #
-                                     f"Failed to write batch changes to data source at address 0x{data_def['data_address']:X}.") #
-                # Re-load data if write failed to revert to original state
-        finally:
-            self.table.blockSignals(False) #
+    def scale_data(self, scale_factor):
+        return self.apply_transform(lambda values, mask: map_transforms.scale(values, mask, scale_factor))
 
     def update_cursor_position(self):
         # Dynamic selection of cursor axes based on maptable units
@@ -976,30 +1139,36 @@ class MapTableWidget(QWidget):
             return
 
         try:
-            raw_x_axis_bytes = self.data_manager.read_data(x_axis_gauge_def["address"], x_axis_gauge_def["length"])
-            if raw_x_axis_bytes and len(raw_x_axis_bytes) == x_axis_gauge_def["length"]:
-                int_x_axis_value = int.from_bytes(raw_x_axis_bytes, byteorder='big', signed=False)
-                self.rpm_value = (int_x_axis_value * x_axis_gauge_def.get("scale", 1.0)) + x_axis_gauge_def.get("offset", 0)
-            else:
-                self.rpm_value = None
-                print(f"Warning: Could not read {x_axis_unit} for cursor or raw_x_axis_bytes is invalid.")
+            self.rpm_value = self._read_cursor_axis_value(x_axis_gauge_def)
+            if self.rpm_value is None:
+                log.warning("Could not read %s for cursor or raw_x_axis_bytes is invalid.", x_axis_unit)
 
-            raw_y_axis_bytes = self.data_manager.read_data(y_axis_gauge_def["address"], y_axis_gauge_def["length"])
-            if raw_y_axis_bytes and len(raw_y_axis_bytes) == y_axis_gauge_def["length"]:
-                int_y_axis_value = int.from_bytes(raw_y_axis_bytes, byteorder='big', signed=False)
-                self.load_value = (int_y_axis_value * y_axis_gauge_def.get("scale", 1.0)) + y_axis_gauge_def.get("offset", 0)
-            else:
-                self.load_value = None
-                print(f"Warning: Could not read {y_axis_unit} for cursor or raw_y_axis_bytes is invalid.")
+            self.load_value = self._read_cursor_axis_value(y_axis_gauge_def)
+            if self.load_value is None:
+                log.warning("Could not read %s for cursor or raw_y_axis_bytes is invalid.", y_axis_unit)
 
             self.table.viewport().update()
 
         except Exception as e:
-            print(f"Error updating cursor position: {e}")
+            log.error("Error updating cursor position: %s", e)
             self.rpm_value = None
             self.load_value = None
             self.table.viewport().update()
 
+    def _read_cursor_axis_value(self, gauge_def):
+        # The poll loop already stores every gauge in the shared history, so no extra bus read is needed
+        if self.timeseries is not None:
+            latest = self.timeseries.latest(gauge_def["description"])
+            if latest is None or latest[1] != latest[1]: # Missing or NaN
+                return None
+            return latest[1]
+
+        raw_bytes = self.data_manager.read_data(gauge_def["address"], gauge_def["length"])
+        if raw_bytes and len(raw_bytes) == gauge_def["length"]:
+            int_value = int.from_bytes(raw_bytes, byteorder='big', signed=False)
+            return (int_value * gauge_def.get("scale", 1.0)) + gauge_def.get("offset", 0)
+        return None
+
     def draw_cursor(self, painter):
         if self.rpm_value is None or self.load_value is None or \
            not self.x_axis_values or not self.y_axis_values:
@@ -1050,7 +1219,7 @@ class MapTableWidget(QWidget):
         elif len(self.x_axis_values) == 1:
             x_pos_in_cells = 0.0
         else:
-            print("DEBUG: No X-axis values. Cannot calculate X position.")
+            log.debug("No X-axis values. Cannot calculate X position.")
             return
 
 
@@ -1081,7 +1250,7 @@ class MapTableWidget(QWidget):
         elif len(self.y_axis_values) == 1:
             y_pos_in_cells = 0.0
         else:
-            print("DEBUG: No Y-axis values. Cannot calculate Y position.")
+            log.debug("No Y-axis values. Cannot calculate Y position.")
             return
 
         col_idx_int = int(math.floor(x_pos_in_cells))
@@ -1139,6 +1308,43 @@ class MapTableWidget(QWidget):
 
             painter.restore()
 
+class MapTableTab(QWidget):
+    """Lightweight tab page for a maptable. The MapTableWidget is built, and its data read, the first time the tab is shown."""
+    edited = pyqtSignal() # Re-emits MapTableWidget.edited
+    def __init__(self, maptable_definition, data_manager, timeseries=None, map_loader=None, parent=None):
+        super().__init__(parent)
+        self.definition = maptable_definition
+        self.data_manager = data_manager
+        self.timeseries = timeseries
+        self.map_loader = map_loader
+        self.maptable_widget = None
+        self.is_stale = True # True when the displayed data may not match the data source
+
+        self.layout = QVBoxLayout(self)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+
+    def ensure_widget(self):
+        """Builds the MapTableWidget on first use and returns it. Its data is loaded by refresh()."""
+        if self.maptable_widget is None:
+            self.maptable_widget = MapTableWidget(self.definition, self.data_manager, self.timeseries, self.map_loader)
+            self.maptable_widget.load_finished.connect(self._on_load_finished)
+            self.maptable_widget.edited.connect(self.edited)
+            self.layout.addWidget(self.maptable_widget)
+        return self.maptable_widget
+
+    def refresh(self, background=False):
+        """Re-reads the map from the data source. Tabs that were never shown are left to load on first show."""
+        if self.maptable_widget is None:
+            return
+        self.maptable_widget.request_load(background)
+
+    def cancel_refresh(self):
+        if self.maptable_widget is not None:
+            self.maptable_widget.cancel_load()
+
+    def _on_load_finished(self, success):
+        self.is_stale = not (success and self.data_manager.is_connected())
+
 class MockDataManager:
     def __init__(self, is_connected=True):
         self._connected = is_connected
@@ -1166,22 +1372,226 @@ class MockDataManager:
         print(f"Mock: Writing {len(data)} bytes to address {hex(address)}")
         return True
 
+class DiagnosticsPanel(QWidget):
+    """Newest diagnostics records from the ring, with a level selector. Summaries of rate-limited sites are flushed each second."""
+    LEVELS = [("Debug", logging.DEBUG), ("Info", logging.INFO), ("Warning", logging.WARNING), ("Error", logging.ERROR)]
+
+    def __init__(self, diagnostics, parent=None):
+        super().__init__(parent)
+        self.diagnostics = diagnostics
+        self._shown_version = -1
+
+        layout = QVBoxLayout(self)
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("Level:"))
+        self.level_combo = QComboBox()
+        for name, level in self.LEVELS:
+            self.level_combo.addItem(name, level)
+        self.level_combo.setCurrentIndex(self.level_combo.findData(diagnostics.logger.level))
+        self.level_combo.currentIndexChanged.connect(lambda: diagnostics.set_level(self.level_combo.currentData()))
+        controls.addWidget(self.level_combo)
+        controls.addStretch()
+        layout.addLayout(controls)
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setFont(QFont("Courier", 9))
+        layout.addWidget(self.text)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self._refresh)
+        self.timer.start()
+
+    def _refresh(self):
+        self.diagnostics.flush()
+        if not self.isVisible() or self.diagnostics.ring.version == self._shown_version:
+            return
+        self._shown_version = self.diagnostics.ring.version
+        lines = [f"{time.strftime('%H:%M:%S', time.localtime(created))} {level:<8} {name}: {message}"
+                 for created, level, name, message in self.diagnostics.ring.snapshot()]
+        self.text.setPlainText("\n".join(lines))
+        self.text.verticalScrollBar().setValue(self.text.verticalScrollBar().maximum())
+
+
+class BurstCaptureDialog(QDialog):
+    """Picks the definitions and duration of a burst capture."""
+    def __init__(self, definitions, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Burst Capture")
+        self.selected_definitions = []
+        self.duration_s = DEFAULT_DURATION_S
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Channels to poll back to back (fewer channels, higher rate):"))
+        self.channel_list = QListWidget()
+        for definition in definitions:
+            if burst_capable(definition):
+                item = QListWidgetItem(definition["description"])
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(Qt.Unchecked)
+                item.setData(Qt.UserRole, definition)
+                self.channel_list.addItem(item)
+        layout.addWidget(self.channel_list)
+
+        duration_layout = QHBoxLayout()
+        duration_layout.addWidget(QLabel("Duration (s):"))
+        self.duration_input = QLineEdit(f"{DEFAULT_DURATION_S:g}")
+        self.duration_input.setValidator(QDoubleValidator(0.1, 60.0, 2))
+        duration_layout.addWidget(self.duration_input)
+        layout.addLayout(duration_layout)
+
+        button_layout = QHBoxLayout()
+        start_button = QPushButton("Start")
+        cancel_button = QPushButton("Cancel")
+        start_button.clicked.connect(self.accept)
+        cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(start_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+
+    def accept(self):
+        self.selected_definitions = [self.channel_list.item(i).data(Qt.UserRole) for i in range(self.channel_list.count())
+                                     if self.channel_list.item(i).checkState() == Qt.Checked]
+        if not self.selected_definitions:
+            QMessageBox.warning(self, "Input Error", "Select at least one channel.")
+            return
+        if not self.duration_input.hasAcceptableInput():
+            QMessageBox.warning(self, "Input Error", "Please provide a duration between 0.1 and 60 s.")
+            return
+        self.duration_s = float(self.duration_input.text())
+        super().accept()
+
+
+class _BurstSignals(QObject):
+    finished = pyqtSignal(object) # BurstResult, or the exception raised by the capture
+
+
+class _BurstRunnable(QRunnable):
+    def __init__(self, capture, data_manager):
+        super().__init__()
+        self.capture = capture
+        self.data_manager = data_manager
+        self.signals = _BurstSignals()
+
+    def run(self):
+        try:
+            result = self.capture.run(self.data_manager)
+        except Exception as e:
+            result = e
+        self.signals.finished.emit(result) # Delivered on the GUI thread
+
+
+class BurstPlotWidget(QWidget):
+    """One lane per captured definition, table columns overlaid, each lane scaled to its own range."""
+    LINE_COLORS = [QColor(0, 200, 255), QColor(255, 170, 0), QColor(120, 230, 90), QColor(255, 90, 90),
+                   QColor(200, 120, 255), QColor(240, 240, 80)]
+
+    def __init__(self, result, parent=None):
+        super().__init__(parent)
+        self.result = result
+        self.lanes = {} # description -> column indices into result.values, in capture order
+        for index, (description, _) in enumerate(result.channels):
+            self.lanes.setdefault(description, []).append(index)
+        self.setMinimumSize(800, 160 * len(self.lanes))
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setBrush(QBrush(QColor(30, 30, 30)))
+        painter.drawRect(self.rect())
+        result = self.result
+        if len(result) < 2:
+            painter.setPen(Qt.white)
+            painter.drawText(self.rect(), Qt.AlignCenter, "Not enough samples to plot.")
+            return
+
+        lane_height = self.height() // len(self.lanes)
+        t_end = float(result.times[-1])
+        for lane_index, (description, columns) in enumerate(self.lanes.items()):
+            lane_rect = QRect(70, lane_index * lane_height + 20, self.width() - 80, lane_height - 30)
+            painter.setPen(Qt.white)
+            painter.drawText(QRect(5, lane_index * lane_height + 2, self.width() - 10, 16), Qt.AlignLeft, description)
+            painter.setBrush(QBrush(QColor(40, 40, 40)))
+            painter.drawRect(lane_rect)
+
+            lane_values = result.values[:, columns]
+            if not np.isfinite(lane_values).any():
+                continue
+            low, high = float(np.nanmin(lane_values)), float(np.nanmax(lane_values))
+            value_range = (high - low) or 1.0
+            painter.drawText(QRect(0, lane_rect.top(), 66, 16), Qt.AlignRight, f"{high:.1f}")
+            painter.drawText(QRect(0, lane_rect.bottom() - 16, 66, 16), Qt.AlignRight, f"{low:.1f}")
+
+            painter.save()
+            painter.setClipRect(lane_rect)
+            for color_index, column in enumerate(columns):
+                # Tens of thousands of samples reduce to at most four points per pixel column
+                decimated_x, decimated_values = minmax_decimate(result.times, result.values[:, column], 0.0, t_end, lane_rect.width())
+                polyline = QPolygonF()
+                for x, value in zip(decimated_x.tolist(), decimated_values.tolist()):
+                    polyline.append(QPointF(lane_rect.x() + x, lane_rect.bottom() - (value - low) / value_range * lane_rect.height()))
+                painter.setPen(QPen(self.LINE_COLORS[color_index % len(self.LINE_COLORS)], 1))
+                painter.drawPolyline(polyline)
+            painter.restore()
+
+        painter.setPen(Qt.white)
+        painter.drawText(QRect(70, self.height() - 16, self.width() - 80, 16), Qt.AlignRight, f"{t_end:.3f} s")
+
+
+class BurstPlotDialog(QDialog):
+    def __init__(self, result, parent=None):
+        super().__init__(parent)
+        self.result = result
+        self.setWindowTitle("Burst Capture Result")
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(result.summary()))
+        layout.addWidget(BurstPlotWidget(result))
+
+        button_layout = QHBoxLayout()
+        save_button = QPushButton("Save CSV")
+        save_button.clicked.connect(self._save)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        button_layout.addWidget(save_button)
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+    def _save(self):
+        filename = next_log_filename(base_filename="burst")
+        try:
+            self.result.save_csv(filename)
+        except IOError as e:
+            QMessageBox.critical(self, "Save Error", f"Could not save burst capture: {e}")
+            return
+        QMessageBox.information(self, "Burst Capture", f"Saved to {filename}")
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
+        self.diagnostics = configure_diagnostics()
         self.data_manager = DataManager()
+        if os.path.exists(DEFAULT_SYMBOL_MAP_PATH): # Must resolve definition symbols before the decoder splits them
+            self.data_manager.load_symbol_map(DEFAULT_SYMBOL_MAP_PATH)
         self.gauges = {}          # For gauge_bar and gauge_chart
         self.tables = {}          # For existing QTableWidget display (read-only tables)
-        self.maptables = {}       # For MapTableWidget (2D editable maps)
+        self.maptables = {}       # For MapTableTab (2D editable maps, built on first show)
         self.table_gauges = {}    # NEW: For single gauges displaying 1D table values
 
-        self.ordered_maptable_widgets = []
+        self.ordered_maptable_tabs = []
         self.current_maptable_widget = None
+        self.current_maptable_tab = None
 
+        self.decoder = ChannelDecoder()
+        self.data_logger = CsvLogger()
+        self.timeseries = TimeSeriesStore() # Shared history for charts, the map cursor and analysis
+        self.map_loader = MapLoadQueue(self.data_manager, self)
+        self.snapshots = SnapshotStore()
         self.is_logging = False
-        self.log_file = None
-        self.log_writer = None
-        self.log_header_written = False
+        self.trigger_capture = None # TriggerCapture while event logging is armed
+        self.alarms = AlarmEngine() # ALARM_DEFINITIONS, evaluated on every polled sample
+        self.burst = None # (BurstCapture, progress dialog) while a burst capture runs
 
         self.setWindowTitle("ECU Tuner - T6e")
         self.setGeometry(100, 100, 1000, 700)
@@ -1204,12 +1614,57 @@ class MainWindow(QMainWindow):
         self.reconnect_button.clicked.connect(self.show_data_source_dialog)
         control_bar.addWidget(self.reconnect_button)
 
+        # Shown while the ECU is not responding and polling is paused
+        self.link_status_label = QLabel("")
+        self.link_status_label.setStyleSheet("color: red; font-weight: bold;")
+        self.link_status_label.hide()
+        control_bar.addWidget(self.link_status_label)
+
         # Logging button
         self.log_button = QPushButton("Start Logging")
         self.log_button.clicked.connect(self._toggle_logging)
         self.log_button.setStyleSheet("background-color: lightgray;")
         control_bar.addWidget(self.log_button)
 
+        # Event logging: LOG_TRIGGERS write the seconds around each event to logs/event_*.csv
+        self.trigger_button = QPushButton("Arm Triggers")
+        self.trigger_button.clicked.connect(self._toggle_triggers)
+        self.trigger_button.setStyleSheet("background-color: lightgray;")
+        control_bar.addWidget(self.trigger_button)
+
+        # Polls a few channels at the full bus rate for a couple of seconds, pausing the normal poll
+        self.burst_button = QPushButton("Burst Capture")
+        self.burst_button.clicked.connect(self._start_burst)
+        control_bar.addWidget(self.burst_button)
+
+        # Calibration snapshots of the RAM zone, stored deduplicated under snapshots/
+        self.snapshot_button = QPushButton("Save Snapshot")
+        self.snapshot_button.clicked.connect(self._save_snapshot)
+        control_bar.addWidget(self.snapshot_button)
+
+        self.compare_button = QPushButton("Compare Snapshots")
+        self.compare_button.clicked.connect(self._compare_snapshots)
+        control_bar.addWidget(self.compare_button)
+
+        # Maps of a known calibration come from map_cache/ on connect; this forces a fresh read from the ECU
+        self.clear_cache_button = QPushButton("Clear Map Cache")
+        self.clear_cache_button.clicked.connect(self._clear_map_cache)
+        control_bar.addWidget(self.clear_cache_button)
+
+        # Undo/redo of maptable writes, replayed from the DataManager edit journal
+        self.undo_button = QPushButton("Undo")
+        self.undo_button.clicked.connect(self._undo_edit)
+        control_bar.addWidget(self.undo_button)
+
+        self.redo_button = QPushButton("Redo")
+        self.redo_button.clicked.connect(self._redo_edit)
+        control_bar.addWidget(self.redo_button)
+
+        QShortcut(QKeySequence.Undo, self, self._undo_edit)
+        QShortcut(QKeySequence.Redo, self, self._redo_edit)
+        QShortcut(QKeySequence("Ctrl+Y"), self, self._redo_edit) # QKeySequence.Redo is Ctrl+Shift+Z on some platforms
+        self._update_undo_actions()
+
         control_bar.addStretch()
 
         # Elements for maptable cell manipulation
@@ -1233,11 +1688,34 @@ class MainWindow(QMainWindow):
         self.scale_button.clicked.connect(lambda: self._adjust_maptable_cells("scale"))
         self.manipulation_layout.addWidget(self.scale_button)
 
+        # Bulk transforms over the selection, the Value box supplies the sigma or blend fraction
+        self.transform_combo = QComboBox()
+        self.transform_combo.addItems(["Smooth", "Interpolate", "Fill Rows", "Fill Cols", "Blend", "Clamp"])
+        self.manipulation_layout.addWidget(self.transform_combo)
+
+        self.transform_button = QPushButton("Apply")
+        self.transform_button.clicked.connect(self._apply_maptable_transform)
+        self.manipulation_layout.addWidget(self.transform_button)
+
+        # Maps ticked here receive the same edit, on their own selection, in one write transaction
+        self.link_button = QToolButton()
+        self.link_button.setText("Link Maps")
+        self.link_button.setPopupMode(QToolButton.InstantPopup)
+        self.link_menu = QMenu(self.link_button)
+        self.link_button.setMenu(self.link_menu)
+        self.manipulation_layout.addWidget(self.link_button)
+
         control_bar.addStretch()
         control_bar.addLayout(self.manipulation_layout)
 
         main_layout.addLayout(control_bar)
 
+        # Active alarms from ALARM_DEFINITIONS, hidden while none are raised
+        self.alarm_banner = QLabel("")
+        self.alarm_banner.setAlignment(Qt.AlignCenter)
+        self.alarm_banner.hide()
+        main_layout.addWidget(self.alarm_banner)
+
         self.tab_widget = QTabWidget()
         main_layout.addWidget(self.tab_widget)
         print(f"QTabWidget created and added to main layout.")
@@ -1274,7 +1752,8 @@ class MainWindow(QMainWindow):
                     unit=definition["unit"],
                     min_val=definition["min_val"],
                     max_val=definition["max_val"],
-                    gauge_type=definition["type"]
+                    gauge_type=definition["type"],
+                    history=self.timeseries.channel(definition["description"]) if definition["type"] == "gauge_chart" else None
                 )
                 self.gauges[definition["description"]] = gauge
                 self.gauge_layout.addWidget(gauge, gauge_row, gauge_col)
@@ -1335,10 +1814,12 @@ class MainWindow(QMainWindow):
 
             elif definition["type"] == "maptable":
                 try:
-                    maptable_widget = MapTableWidget(definition, self.data_manager)
-                    self.maptables[definition["description"]] = maptable_widget
-                    self.ordered_maptable_widgets.append(maptable_widget)
-                    tab_index = self.tab_widget.addTab(maptable_widget, definition["description"])
+                    maptable_tab = MapTableTab(definition, self.data_manager, self.timeseries, self.map_loader)
+                    self.maptables[definition["description"]] = maptable_tab
+                    self.ordered_maptable_tabs.append(maptable_tab)
+                    self.link_menu.addAction(definition["description"]).setCheckable(True)
+                    maptable_tab.edited.connect(self._update_undo_actions)
+                    tab_index = self.tab_widget.addTab(maptable_tab, definition["description"])
                     print(f"  - Added MAPTABLE '{definition['description']}' to tab index: {tab_index}. Total tabs now: {self.tab_widget.count()}")
 
                     if first_maptable_tab_index == -1:
@@ -1348,6 +1829,9 @@ class MainWindow(QMainWindow):
                     print(f"  - ERROR: Failed to create/add MapTableWidget for '{definition.get('description', 'N/A')}': {e}")
 
 
+        # Rate-limited warnings and errors from the poll, read/write and map paths
+        self.tab_widget.addTab(DiagnosticsPanel(self.diagnostics), "Diagnostics")
+
         print("\n--- Finalizing Tab Selection ---")
         if first_maptable_tab_index != -1:
             self.tab_widget.setCurrentIndex(first_maptable_tab_index)
@@ -1364,136 +1848,211 @@ class MainWindow(QMainWindow):
     def _adjust_maptable_cells(self, operation_type):
         self._on_tab_changed(self.tab_widget.currentIndex())
 
-        print(f"DEBUG: Adjusting map: {self.current_maptable_widget.definition['description'] if self.current_maptable_widget else 'None'}")
         if not self.current_maptable_widget:
             QMessageBox.warning(self, "No Map Selected", "Please select a map to adjust cells.")
             return
 
-        current_maptable = self.current_maptable_widget
-        data_def = current_maptable.definition
+        raw_value = self.value_input.text()
+        try:
+            if not raw_value:
+                adjustment_value = 1.0 if operation_type == "scale" else 0.0
+            else:
+                adjustment_value = float(raw_value)
+        except ValueError:
+            QMessageBox.warning(self, "Invalid Value", "Please enter a valid number for adjustment.")
+            return
+
+        if operation_type not in map_transforms.OPERATIONS:
+            QMessageBox.warning(self, "Invalid Operation", "Unknown adjustment operation.")
+            return
+        operation = map_transforms.OPERATIONS[operation_type]
+        self._apply_to_maps(lambda maptable: lambda values, mask: operation(values, mask, adjustment_value),
+                            f"{operation_type.capitalize()} {adjustment_value:g}")
+
+    def _apply_maptable_transform(self):
+        """Runs the transform chosen in the Transform combo over the selected cells of the current and linked maps."""
+        self._on_tab_changed(self.tab_widget.currentIndex())
 
-        selected_ranges = current_maptable.table.selectedRanges()
-        if not selected_ranges:
+        maptable = self.current_maptable_widget
+        if not maptable:
+            QMessageBox.warning(self, "No Map Selected", "Please select a map to adjust cells.")
+            return
+
+        ranges = maptable.selected_cell_ranges()
+        if not ranges:
             QMessageBox.information(self, "No Cells Selected", "Please select cells to adjust.")
             return
 
+        name = self.transform_combo.currentText()
         try:
-            total_data_length = data_def["data_rows"] * data_def["data_cols"] * data_def["data_element_size"]
-            current_data_bytes = bytearray(current_maptable.data_manager.read_data(data_def["data_address"], total_data_length))
-
-            if current_data_bytes is None or len(current_data_bytes) != total_data_length:
-                QMessageBox.critical(self, "Read Error", f"Failed to read expected amount of data from 0x{data_def['data_address']:X}. Expected {total_data_length} bytes, got {len(current_data_bytes)}.")
+            value = float(self.value_input.text()) if self.value_input.text() else None
+        except ValueError:
+            value = None
+
+        def axes(maptable):
+            decoded = maptable.decoded_map
+            return (decoded.x_axis, decoded.y_axis) if decoded is not None else (None, None)
+
+        if name == "Smooth":
+            sigma = value if value and value > 0 else 1.0 # Value box is the Gaussian sigma, in cells
+            make_transform = lambda m: lambda values, mask: map_transforms.smooth(values, mask, sigma=sigma)
+        elif name == "Interpolate":
+            make_transform = lambda m: lambda values, mask: map_transforms.interpolate_bilinear(values, mask, *axes(m))
+        elif name == "Fill Rows":
+            make_transform = lambda m: lambda values, mask: map_transforms.fill_linear(values, mask, "rows", *axes(m))
+        elif name == "Fill Cols":
+            make_transform = lambda m: lambda values, mask: map_transforms.fill_linear(values, mask, "cols", *axes(m))
+        elif name == "Blend":
+            transform = self._blend_transform(maptable, value)
+            if transform is not None:
+                maptable.apply_transform(transform, ranges, label=f"Blend {maptable.definition['description']}") # The target only fits the current map
+            return
+        elif name == "Clamp":
+            minimum, ok = QInputDialog.getDouble(self, "Clamp", "Minimum value:", 0.0, -1e9, 1e9, 2)
+            if not ok:
                 return
-
-            try:
-                raw_value = self.value_input.text()
-                if not raw_value:
-                    if operation_type == "scale":
-                        adjustment_value = 1.0
-                    else:
-                        adjustment_value = 0.0
-                else:
-                    adjustment_value = float(raw_value)
-            except ValueError:
-                QMessageBox.warning(self, "Invalid Value", "Please enter a valid number for adjustment.")
-                return    
-
-            # Define operations
-            if operation_type == "increment":
-                operation_func = lambda x: x + adjustment_value
-            elif operation_type == "decrement":
-                operation_func = lambda x: x - adjustment_value
-            elif operation_type == "scale":
-                operation_func = lambda x: x * adjustment_value # Use the float value directly
-            else:
-                QMessageBox.warning(self, "Invalid Operation", "Unknown adjustment operation.")
+            maximum, ok = QInputDialog.getDouble(self, "Clamp", "Maximum value:", 100.0, -1e9, 1e9, 2)
+            if not ok:
                 return
+            make_transform = lambda m: lambda values, mask: map_transforms.clamp(values, mask, minimum, maximum)
+        else:
+            QMessageBox.warning(self, "Invalid Operation", "Unknown transform.")
+            return
 
-            modified_data_bytes = bytearray(current_data_bytes)
-            # Store changes to apply visually after successful write
-            changes_to_apply_visually = []
-
-            for selected_range in selected_ranges:
-                for r in range(selected_range.topRow(), selected_range.bottomRow() + 1):
-                    for c in range(selected_range.leftColumn(), selected_range.rightColumn() + 1):
-                        offset_in_block = (r * data_def["data_cols"] + c) * data_def["data_element_size"]
-
-                        cell_raw_bytes = modified_data_bytes[offset_in_block : offset_in_block + data_def["data_element_size"]]
+        self._apply_to_maps(make_transform, name)
 
-                        # Re-read raw bytes from memory for each cell
-                        true_address = data_def["data_address"] + offset_in_block
-                        live_cell_bytes = current_maptable.data_manager.read_data(true_address, data_def["data_element_size"])
-                        if not live_cell_bytes or len(live_cell_bytes) != data_def["data_element_size"]:
-                            continue  # skip this cell
-                        raw_val = int.from_bytes(live_cell_bytes, 'big', signed=False)
-                        current_scaled_val = current_maptable._convert_to_scaled(raw_val, data_def["data_scale"], data_def["data_offset"])
+    def _linked_maptable_widgets(self):
+        """Maps ticked in the Link menu, other than the current one."""
+        linked = []
+        for action in self.link_menu.actions():
+            tab = self.maptables.get(action.text())
+            if action.isChecked() and tab is not None and tab.maptable_widget is not None and \
+               tab.maptable_widget is not self.current_maptable_widget:
+                linked.append(tab.maptable_widget)
+        return linked
 
+    def _apply_to_maps(self, make_transform, label):
+        """
+        Applies make_transform(maptable) to the selection of the current map and of every linked map, staged in
+        one transaction so the maps are written, verified and, on failure, rolled back together, and undone as one step.
+        """
+        maptables = [self.current_maptable_widget] + self._linked_maptable_widgets()
+        for maptable in maptables:
+            if not maptable.selected_cell_ranges():
+                QMessageBox.information(self, "No Cells Selected",
+                                        f"Please select cells to adjust in '{maptable.definition['description']}'.")
+                return
 
-                        new_scaled_val = operation_func(current_scaled_val)
-                        
-                        new_raw_bytes_for_cell = current_maptable._convert_to_raw(
-                            new_scaled_val,
-                            data_def["data_reverse_scale"],
-                            data_def["data_reverse_offset"],
-                            data_def["data_element_size"]
-                        )
-
-                        # Update the bytearray that will be written
-                        modified_data_bytes[offset_in_block : offset_in_block + data_def["data_element_size"]] = new_raw_bytes_for_cell
-                        
-                        # Store the visual change for later application
-                        changes_to_apply_visually.append((r, c, new_scaled_val))
+        names = ", ".join(m.definition['description'] for m in maptables)
+        transaction = self.data_manager.begin_transaction(f"{label} ({names})")
+        staged = []
+        for maptable in maptables:
+            new_raw = maptable.stage_transform(transaction, make_transform(maptable), maptable.selected_cell_ranges())
+            if new_raw is None:
+                return # Nothing has been written yet, the widget has reported the problem
+            staged.append((maptable, new_raw))
+
+        if not transaction.commit():
+            QMessageBox.critical(self, "Write Error", f"Failed to write changes to {names}: {transaction.error}")
+            for maptable in maptables:
+                maptable.request_load() # Show what the source actually holds
+            return
 
-            current_maptable.table.blockSignals(True) # Block signals during batch update
+        for maptable, new_raw in staged:
+            maptable.finish_transform(new_raw)
 
-            # Write the entire modified block back to the data source
-            if current_maptable.data_manager.write_data(data_def["data_address"], bytes(modified_data_bytes)):
-                
-                # Apply changes visually directly to the cells in the UI
-                for r, c, val in changes_to_apply_visually:
-                    item = current_maptable.table.item(r, c)
-                    if item:
-                        item.setText(f"{val:.2f}")
-                    else: # This case should ideally not happen if table is correctly initialized
-                        item = QTableWidgetItem(f"{val:.2f}")
-                        item.setTextAlignment(Qt.AlignCenter)
-                        current_maptable.table.setItem(r, c, item)
-
-                current_maptable._apply_color_gradient() # Reapply gradient after successful write
-                current_maptable.table.repaint() # Ensure immediate repaint of the affected table
-            else:
-                QMessageBox.critical(self, "Write Error", f"Failed to write batch changes to data source at address 0x{data_def['data_address']:X}.")
-                # If write failed, reload the table from the data_manager to show actual state (revert changes)
-                current_maptable._load_and_display_map_data()
-                current_maptable._apply_color_gradient() 
-                current_maptable.table.repaint()
+    def _undo_edit(self):
+        group = self.data_manager.undo()
+        if group is None:
+            if self.data_manager.journal.can_undo:
+                QMessageBox.critical(self, "Undo Failed", f"Failed to undo: {self.data_manager.last_error}")
+            return
+        self._show_replayed(group, undo=True)
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"An error occurred during map adjustment: {e}")
-        finally:
-            current_maptable.table.blockSignals(False)
-            current_maptable.table.viewport().update()
+    def _redo_edit(self):
+        group = self.data_manager.redo()
+        if group is None:
+            if self.data_manager.journal.can_redo:
+                QMessageBox.critical(self, "Redo Failed", f"Failed to redo: {self.data_manager.last_error}")
+            return
+        self._show_replayed(group, undo=False)
+
+    def _show_replayed(self, group, undo):
+        """Patches the replayed bytes into every open map they overlap."""
+        print(f"{'Undid' if undo else 'Redid'}: {group.label}")
+        for tab in self.ordered_maptable_tabs:
+            if tab.maptable_widget is None:
+                continue
+            for address, old, new in group.deltas:
+                tab.maptable_widget.apply_written_bytes(address, old if undo else new)
+        self._update_undo_actions()
+
+    def _update_undo_actions(self):
+        journal = self.data_manager.journal
+        self.undo_button.setEnabled(journal.can_undo)
+        self.redo_button.setEnabled(journal.can_redo)
+        self.undo_button.setToolTip(f"Undo {journal.peek_undo().label} (Ctrl+Z)" if journal.can_undo else "Nothing to undo")
+        self.redo_button.setToolTip(f"Redo {journal.peek_redo().label} (Ctrl+Y)" if journal.can_redo else "Nothing to redo")
+
+    def _blend_transform(self, maptable, factor):
+        """Asks for a map with the same shape and returns a transform blending toward it, or None if cancelled."""
+        shape = (maptable.definition["data_rows"], maptable.definition["data_cols"])
+        candidates = [tab for tab in self.ordered_maptable_tabs
+                      if tab.definition is not maptable.definition and
+                      (tab.definition["data_rows"], tab.definition["data_cols"]) == shape]
+        if not candidates:
+            QMessageBox.information(self, "Blend", "No other map has the same dimensions.")
+            return None
+
+        names = [tab.definition["description"] for tab in candidates]
+        name, ok = QInputDialog.getItem(self, "Blend", "Blend toward:", names, 0, False)
+        if not ok:
+            return None
+
+        source = candidates[names.index(name)].ensure_widget()
+        target = source._current_map()
+        if target is None:
+            source.show_unavailable()
+            return None
+
+        factor = 0.5 if factor is None else min(max(factor, 0.0), 1.0) # Value box is the blend fraction, 0..1
+        target_values = target.data.copy()
+        return lambda values, mask: map_transforms.blend(values, mask, target_values, factor)
 
     def show_data_source_dialog(self):
         dialog = DataSourceDialog(self.data_manager, self)
         if dialog.exec_() == QDialog.Accepted:
             
-            if dialog.source_type == "RAM":
+            if dialog.source_type in ("RAM", "OFFLINE"):
                 connection_successful = self.data_manager.connect_source(
-                    "mock_can",
-                    ram_dump_path=dialog.ram_dump_path
+                    "mock_can" if dialog.source_type == "RAM" else "offline_edit",
+                    ram_dump_path=dialog.ram_dump_path,
+                    transport_profile=dialog.transport_profile,
+                    engine_simulator=dialog.engine_simulator,
+                    listen_broadcast=dialog.listen_broadcast
                 )
             elif dialog.source_type == "CAN":
                 connection_successful = self.data_manager.connect_source(
                     "real_can",
                     interface=dialog.can_interface,
                     channel=dialog.can_channel,
-                    bitrate=dialog.can_bitrate
+                    bitrate=dialog.can_bitrate,
+                    listen_broadcast=dialog.listen_broadcast
                 )
             else:
                 connection_successful = False 
 
+            self._update_undo_actions() # Connecting clears the edit journal
+            self.alarms.reset() # Alarms and derived channel history of the previous source do not carry over
+            self.decoder.reset()
+            self._update_alarm_banner()
+
             if connection_successful:
+                firmware = self.data_manager.firmware
+                if firmware is not None and self.data_manager.definitions is None:
+                    QMessageBox.warning(self, "Unknown Firmware",
+                                        f"Firmware '{firmware.firmware_id}' has no definition set. "
+                                        "Addresses assume P138 and may be wrong; avoid writing maps.")
                 self.reconnect_button.setText("Connected")
                 self.reconnect_button.setStyleSheet("background-color: lightgray;")
                 self.reconnect_button.setEnabled(False)
@@ -1502,6 +2061,8 @@ class MainWindow(QMainWindow):
                 if not self.timer.isActive():
                     self.timer.start()
             else:
+                if self.data_manager.last_error:
+                    QMessageBox.critical(self, "Connection Error", f"Failed to connect to data source: {self.data_manager.last_error}")
                 self.reconnect_button.setText("Reconnect Source")
                 self.reconnect_button.setEnabled(True)
 
@@ -1519,32 +2080,114 @@ class MainWindow(QMainWindow):
                 self.data_manager.disconnect_source() 
                 print("Disconnected source due to dialog cancellation.")
 
+    def _clear_map_cache(self):
+        if self.data_manager.map_cache is None:
+            QMessageBox.information(self, "Clear Map Cache", "No map cache is in use for this connection.")
+            return
+        self.data_manager.map_cache.clear()
+        self.update_all_maptables()
+
     def update_all_maptables(self):
-        print("Main Window: Forcing reload of all maptables.")
-        for maptable_widget in self.maptables.values():
-            maptable_widget._load_and_display_map_data()
+        """Marks every maptable stale, loads the visible one first and the other built ones in the background."""
+        print("Main Window: Marking all maptables stale.")
+        for maptable_tab in self.ordered_maptable_tabs:
+            maptable_tab.is_stale = True
+
+        if self.current_maptable_tab is not None:
+            self.current_maptable_tab.refresh()
+
+        # Tabs that were never shown load on first show, only already-built ones need a background refresh
+        for maptable_tab in self.ordered_maptable_tabs:
+            if maptable_tab is not self.current_maptable_tab and maptable_tab.maptable_widget is not None:
+                maptable_tab.refresh(background=True)
 
     def _on_tab_changed(self, index):
         current_widget = self.tab_widget.widget(index)
+
+        # A load still pending for the tab being left is abandoned; the tab stays stale and reloads when shown again
+        if self.current_maptable_tab is not None and self.current_maptable_tab is not current_widget:
+            self.current_maptable_tab.cancel_refresh()
         
-        if isinstance(current_widget, MapTableWidget):
-            self.current_maptable_widget = current_widget
-            print(f"DEBUG: Switched to tab {index}. Current MapTableWidget set to: {self.current_maptable_widget.definition['description']}")
+        if isinstance(current_widget, MapTableTab):
+            self.current_maptable_tab = current_widget
+            self.current_maptable_widget = current_widget.ensure_widget()
+            if current_widget.is_stale and self.data_manager.is_connected():
+                current_widget.refresh() # Also promotes a queued background load to the front
+            log.debug("Switched to tab %d. Current MapTableWidget set to: %s", index, self.current_maptable_widget.definition['description'])
         else:
+            self.current_maptable_tab = None
             self.current_maptable_widget = None
-            print(f"DEBUG: Switched to tab {index} (not a MapTableWidget). Current MapTableWidget set to None.")
-
-    def _get_next_log_filename(self):
-        log_dir = "logs"
-        os.makedirs(log_dir, exist_ok=True)
-        base_filename = "gauge_log"
-        extension = ".csv"
-        i = 1
-        while True:
-            filename = os.path.join(log_dir, f"{base_filename}_{i:03d}{extension}")
-            if not os.path.exists(filename):
-                return filename
-            i += 1
+            log.debug("Switched to tab %d (not a MapTableWidget). Current MapTableWidget set to None.", index)
+
+    def _save_snapshot(self):
+        if not self.data_manager.is_connected():
+            QMessageBox.warning(self, "Not Connected", "Please connect to a data source first.")
+            return
+        label, ok = QInputDialog.getText(self, "Save Snapshot", "Label:")
+        if not ok:
+            return
+
+        zone_name, base_address, size, _ = RAM_ZONE
+        block_size = self.snapshots.block_size
+        progress = QProgressDialog(f"Reading {zone_name}...", "Cancel", 0, size, self)
+        progress.setWindowModality(Qt.WindowModal)
+        image = bytearray()
+        # Read block by block so the progress dialog stays responsive over CAN
+        while len(image) < size:
+            if progress.wasCanceled():
+                return
+            chunk = self.data_manager.read_data(base_address + len(image), min(block_size, size - len(image)))
+            if chunk is None:
+                progress.close()
+                QMessageBox.critical(self, "Read Error", f"Failed to read {zone_name} at 0x{base_address + len(image):X}.")
+                return
+            image.extend(chunk)
+            progress.setValue(len(image))
+            QApplication.processEvents()
+        progress.close()
+
+        snapshot_id = self.snapshots.save(image, base_address, label)
+        QMessageBox.information(self, "Snapshot Saved", f"Saved snapshot {snapshot_id}.")
+
+    def _compare_snapshots(self):
+        manifests = self.snapshots.list_snapshots()
+        if len(manifests) < 2:
+            QMessageBox.information(self, "Compare Snapshots", "At least two snapshots are needed to compare.")
+            return
+
+        names = [f"{m['id']}  {m['label']}".rstrip() for m in manifests]
+        old_name, ok = QInputDialog.getItem(self, "Compare Snapshots", "Older snapshot:", names, len(names) - 2, False)
+        if not ok:
+            return
+        new_name, ok = QInputDialog.getItem(self, "Compare Snapshots", "Newer snapshot:", names, len(names) - 1, False)
+        if not ok:
+            return
+        old_id, new_id = manifests[names.index(old_name)]["id"], manifests[names.index(new_name)]["id"]
+
+        try:
+            ranges = self.snapshots.diff(old_id, new_id)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Compare Snapshots", f"Failed to compare snapshots: {e}")
+            return
+
+        if not ranges:
+            QMessageBox.information(self, "Compare Snapshots", "The snapshots are identical.")
+            return
+
+        lines = [f"{sum(length for _, length in ranges)} bytes changed in {len(ranges)} range(s)."]
+        for change in map_changes(ranges, ECU_DEFINITIONS):
+            if change.part == "data":
+                cells = ", ".join(f"[{r}, {c}]" for r, c in change.cells[:20])
+            else:
+                cells = ", ".join(str(i) for i in change.cells[:20])
+            more = f" and {len(change.cells) - 20} more" if len(change.cells) > 20 else ""
+            lines.append(f"{change.description} ({change.part}): {len(change.cells)} cell(s): {cells}{more}")
+        if self.data_manager.sym_map is not None:
+            lines.append("Changed ranges:")
+            lines.extend(f"  {self.data_manager.format_address(address)}: {length} byte(s)" for address, length in ranges[:20])
+            if len(ranges) > 20:
+                lines.append(f"  ... and {len(ranges) - 20} more")
+        QMessageBox.information(self, "Compare Snapshots", "\n".join(lines))
 
     def _toggle_logging(self):
         if not self.data_manager.is_connected():
@@ -1556,18 +2199,13 @@ class MainWindow(QMainWindow):
             self.is_logging = False
             self.log_button.setText("Start Logging")
             self.log_button.setStyleSheet("background-color: lightgray;")
-            if self.log_file:
-                self.log_file.close()
-                self.log_file = None
-                self.log_writer = None
-            self.log_header_written = False
+            self.data_logger.close()
             print("Logging stopped.")
         else:
             # Start logging
             try:
-                log_filename = self._get_next_log_filename()
-                self.log_file = open(log_filename, 'w', newline='')
-                self.log_writer = csv.writer(self.log_file)
+                log_filename = next_log_filename()
+                self.data_logger.open(log_filename)
                 self.is_logging = True
                 self.log_button.setText("Stop Logging")
                 self.log_button.setStyleSheet("background-color: lightgreen;")
@@ -1578,6 +2216,65 @@ class MainWindow(QMainWindow):
                 self.log_button.setText("Start Logging")
                 self.log_button.setStyleSheet("background-color: lightgray;")
 
+    def _toggle_triggers(self):
+        if self.trigger_capture is not None:
+            self.trigger_capture.close()
+            self.trigger_capture = None
+            self.trigger_button.setText("Arm Triggers")
+            self.trigger_button.setStyleSheet("background-color: lightgray;")
+            return
+        if not self.data_manager.is_connected():
+            QMessageBox.warning(self, "Logging Error", "Cannot arm triggers: No data source connected.")
+            return
+        self.trigger_capture = TriggerCapture(self.timeseries, poll_interval_s=self.timer.interval() / 1000.0)
+        self.trigger_button.setText("Triggers Armed")
+        self.trigger_button.setStyleSheet("background-color: lightgreen;")
+
+    def _start_burst(self):
+        if self.burst is not None:
+            return
+        if not self.data_manager.is_connected():
+            QMessageBox.warning(self, "Burst Capture", "Cannot start a burst capture: No data source connected.")
+            return
+        dialog = BurstCaptureDialog(self.decoder.definitions, self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+
+        capture = BurstCapture(dialog.selected_definitions, dialog.duration_s)
+        self.timer.stop() # The burst gets the bus to itself
+        progress = QProgressDialog("Burst capture running...", "Stop", 0, 0, self)
+        progress.setWindowTitle("Burst Capture")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.canceled.connect(capture.stop)
+        progress.show()
+        self.burst = (capture, progress)
+
+        runnable = _BurstRunnable(capture, self.data_manager)
+        runnable.signals.finished.connect(self._burst_finished)
+        QThreadPool.globalInstance().start(runnable)
+
+    def _burst_finished(self, result):
+        _, progress = self.burst
+        self.burst = None
+        progress.canceled.disconnect()
+        progress.close()
+        if self.data_manager.is_connected():
+            self.timer.start()
+        if isinstance(result, Exception):
+            QMessageBox.critical(self, "Burst Capture", f"Burst capture failed: {result}")
+            return
+        BurstPlotDialog(result, self).exec_()
+
+    def _update_alarm_banner(self):
+        severity = self.alarms.active_severity()
+        if severity is None:
+            self.alarm_banner.hide()
+            return
+        color = "red" if severity == "critical" else "orange"
+        self.alarm_banner.setStyleSheet(f"background-color: {color}; color: white; font-weight: bold; padding: 4px;")
+        self.alarm_banner.setText("ALARM: " + ", ".join(self.alarms.active_names()))
+        self.alarm_banner.show()
+
     def update_gui_data(self):
         """
         This method is called periodically by the timer to update all GUI elements
@@ -1586,295 +2283,97 @@ class MainWindow(QMainWindow):
         if not self.data_manager.is_connected():
             return
 
-        gauge_values = {}  # Stores processed (scaled/calculated) values for all simple gauges.
-                        # Keys will be 'DESCRIPTION_VALUE' (e.g., 'RPM_VALUE').
-                        # Used for display, logging, and as dependencies for other calculations.
-        raw_gauge_values = {}  # Stores raw integer values directly from the ECU for simple gauges.
-                            # Keys will be 'DESCRIPTION_RAW' (e.g., 'RPM_RAW', 'MAF_RAW').
-
-        # Pass 1: Read raw data for ALL definitions with an address and process simple gauges
-        # This pass is crucial for populating 'raw_gauge_values' which might be used by calculated gauges in the second pass, and for updating simple gauges.
-        for definition in ECU_DEFINITIONS:
-            description = definition.get("description", "Unknown")
-
-            # Only process definitions that have a direct address and length (sensor readings, not maps)
-            if "address" not in definition or "length" not in definition:
-                continue 
+        if not self.data_manager.is_responding():
+            # Keep the last values on screen rather than blocking on reads the breaker would refuse anyway
+            self.link_status_label.setText(f"ECU not responding, retrying in {self.data_manager.breaker.seconds_to_probe():.1f} s")
+            self.link_status_label.show()
+            self.reconnect_button.setEnabled(True) # Allow switching source while the link is down
+            return
+        if self.link_status_label.isVisible():
+            self.link_status_label.hide()
+            self.reconnect_button.setEnabled(False)
+
+        sample = self.decoder.poll(self.data_manager)
+        if self.alarms.process(sample):
+            self._update_alarm_banner()
+        self.timeseries.append_sample(sample)
+
+        # Simple and calculated gauges
+        for description, gauge_display_object in self.gauges.items():
+            if description in sample.errors:
+                gauge_display_object.set_value("ERROR")
+            elif sample.values.get(description) is not None:
+                gauge_display_object.set_value(sample.values[description])
+            else:
+                gauge_display_object.set_value("N/A")
 
+        # 1D "table" definitions update both the QTableWidget and the bar chart GaugeWidget
+        for definition in self.decoder.table_definitions:
+            description = definition["description"]
+            table_values = sample.tables.get(description)
             try:
-                raw_bytes = self.data_manager.read_data(definition["address"], definition["length"])
-
-                if raw_bytes is None or len(raw_bytes) != definition["length"]:
-                    print(f"Warning: Could not read {definition.get('length')} bytes for '{description}'. Length mismatch or None. Skipping raw data for this definition.")
-                    raw_gauge_values.pop(f"{description}_RAW", None)
-                    if definition.get("type") in ["gauge_bar", "gauge_chart"] and "calculation" not in definition:
-                        gauge_values.pop(f"{description}_VALUE", None)
-                        gauge_display_object = self.gauges.get(description)
-                        if gauge_display_object:
-                            gauge_display_object.set_value("N/A")
-                    continue
-
-                if definition.get("type") in ["gauge_bar", "gauge_chart"]:
-                    int_value = int.from_bytes(raw_bytes, byteorder='big', signed=False) # Simple gauges are already big-endian, keep as is
-                    raw_gauge_values[f"{description}_RAW"] = int_value
-
-                    if "calculation" not in definition:
-                        scale = definition.get("scale", 1.0)
-                        offset = definition.get("offset", 0)
-                        scaled_value = (int_value * scale) + offset
-
-                        gauge_values[f"{description}_VALUE"] = scaled_value
-
-                        gauge_display_object = self.gauges.get(description)
-                        if gauge_display_object:
-                            gauge_display_object.set_value(scaled_value)
-                        else:
-                            print(f"Warning: Gauge display object for '{description}' not found in self.gauges during Pass 1.")
-                elif definition.get("type") == "table":
-                    # Store the raw_bytes for the table definition directly for later use in Pass 3.
-                    raw_gauge_values[f"{description}_RAW_BLOCK"] = raw_bytes
-
-            except Exception as e:
-                print(f"Error processing gauge '{description}' data in Pass 1: {e}")
-                raw_gauge_values.pop(f"{description}_RAW", None)
-                gauge_values.pop(f"{description}_VALUE", None)
-                if definition.get("type") in ["gauge_bar", "gauge_chart"]:
-                    gauge_display_object = self.gauges.get(description)
-                    if gauge_display_object:
-                        gauge_display_object.set_value("N/A")
-
-
-        # Pass 2: Process calculated gauges
-        for definition in ECU_DEFINITIONS:
-            if definition.get("type") in ["gauge_bar", "gauge_chart"] and "calculation" in definition:
-                description = definition.get("description", "Unknown Calculated Gauge")
-                try:
-                    calculation_info = definition["calculation"]
-                    calculation_type = calculation_info.get("type")
-
-                    if calculation_type == "formula":
-                        formula_string = calculation_info.get("formula_string")
-                        dependencies = calculation_info.get("dependencies", [])
-
-                        if not formula_string:
-                            print(f"Error: Calculated gauge '{description}' has no 'formula_string'. Skipping.")
-                            continue
-
-                        formula_scope = {}
-                        all_dependencies_met = True
-
-                        for key, value in calculation_info.items():
-                            if key not in ["type", "formula_string", "dependencies"]:
-                                formula_scope[key] = value
-
-                        for dep_desc in dependencies:
-                            value_key = f"{dep_desc}_VALUE"
-                            if value_key in gauge_values and gauge_values[value_key] is not None:
-                                formula_scope[value_key] = gauge_values[value_key]
-                            elif f"{dep_desc}_VALUE" in formula_string:
-                                print(f"Error updating calculated gauge '{description}': Missing or None dependency: '{value_key}'. Formula: '{formula_string}'")
-                                all_dependencies_met = False
-                                break
-
-                            raw_key = f"{dep_desc}_RAW"
-                            if raw_key in raw_gauge_values and raw_gauge_values[raw_key] is not None:
-                                formula_scope[raw_key] = raw_gauge_values[raw_key]
-                            elif f"{dep_desc}_RAW" in formula_string:
-                                print(f"Error updating calculated gauge '{description}': Missing or None dependency: '{raw_key}'. Formula: '{formula_string}'")
-                                all_dependencies_met = False
-                                break
-                        
-                        if not all_dependencies_met:
-                            gauge_display_object = self.gauges.get(description)
-                            if gauge_display_object:
-                                gauge_display_object.set_value("N/A")
-                            gauge_values.pop(f"{description}_VALUE", None)
-                            continue
-
-                        required_vars_in_formula = set(re.findall(r'\b[A-Za-z_][A-Za-z0-9_]*\b', formula_string))
-                        required_vars_in_formula = {v for v in required_vars_in_formula if v not in formula_scope}
-                        
-                        for var_name in required_vars_in_formula:
-                            if var_name not in formula_scope:
-                                print(f"Error updating calculated gauge '{description}': Variable '{var_name}' from formula is not in scope. Formula: '{formula_string}', Scope: {formula_scope}")
-                                all_dependencies_met = False
-                                break
-                        
-                        if not all_dependencies_met:
-                            gauge_display_object = self.gauges.get(description)
-                            if gauge_display_object:
-                                gauge_display_object.set_value("N/A")
-                            gauge_values.pop(f"{description}_VALUE", None)
-                            continue
-
-                        for key, value in list(formula_scope.items()):
-                            if isinstance(value, (int, float)):
-                                continue
-                            try:
-                                formula_scope[key] = float(value)
-                            except (ValueError, TypeError):
-                                print(f"Error: Could not convert '{key}' value '{value}' to number for '{description}' calculation. Setting to N/A.")
-                                all_dependencies_met = False
-                                break
-
-                        if not all_dependencies_met:
-                            gauge_display_object = self.gauges.get(description)
-                            if gauge_display_object:
-                                gauge_display_object.set_value("N/A")
-                            gauge_values.pop(f"{description}_VALUE", None)
-                            continue
-
-                        calculated_value = eval(formula_string, {"__builtins__": None}, formula_scope)
-
-                        gauge_display_object = self.gauges.get(description)
-                        if gauge_display_object:
-                            gauge_display_object.set_value(calculated_value)
+                table_display_widget = self.tables.get(description)
+                if table_display_widget:
+                    display_unit = definition.get("unit", "")
+                    for col_idx, element_scaled_val in enumerate(table_values):
+                        if element_scaled_val is None:
+                            display_string = "N/A"
+                        elif description == "Ignition Timing":
+                            display_string = f"{-element_scaled_val:.1f}{display_unit}"
                         else:
-                            print(f"Warning: Gauge display object for calculated gauge '{description}' not found in self.gauges.")
-
-                        gauge_values[f"{description}_VALUE"] = calculated_value
-
-                except Exception as e:
-                    print(f"Critical Error updating calculated gauge '{description}': {e}. Formula String: '{formula_string}', Scope: {formula_scope}")
-                    gauge_display_object = self.gauges.get(description)
-                    if gauge_display_object:
-                        gauge_display_object.set_value("ERROR")
-                    gauge_values.pop(f"{description}_VALUE", None)
+                            display_string = f"{element_scaled_val:.1f} {display_unit}"
 
+                        item = QTableWidgetItem(display_string)
+                        item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+                        table_display_widget.setItem(0, col_idx, item)
 
-        # Pass 3: Process 1D "table" definitions and update both QTableWidget and new GaugeWidget
-        for definition in ECU_DEFINITIONS:
-            if definition.get("type") == "table":
-                description = definition.get("description", "Unknown Table")
-                try:
-                    if "address" not in definition or "length" not in definition:
-                        print(f"Warning: Table '{description}' definition missing address or length. Skipping.")
-                        continue
-
-                    raw_bytes = raw_gauge_values.get(f"{description}_RAW_BLOCK")
-                    
-                    if raw_bytes is None or len(raw_bytes) != definition["length"]:
-                        print(f"Warning: Could not retrieve raw data block for table '{description}'. Length mismatch or None.")
-                        table_display_widget = self.tables.get(description)
-                        if table_display_widget:
-                            for col_idx in range(len(definition["columns"])):
-                                item = QTableWidgetItem("N/A")
-                                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                                table_display_widget.setItem(0, col_idx, item)
-                        
-                        table_gauge_obj = self.table_gauges.get(description)
-                        if table_gauge_obj:
-                            table_gauge_obj.set_value(["N/A"] * len(definition["columns"]))
-                        continue
+                table_gauge_obj = self.table_gauges.get(description)
+                if table_gauge_obj:
+                    table_gauge_obj.set_value([v if v is not None else "N/A" for v in table_values])
 
+            except Exception as e:
+                log.error("Error updating table '%s': %s", description, e)
+                if description in self.tables:
                     table_display_widget = self.tables.get(description)
-                    current_table_gauge_values = [] 
-
-                    if table_display_widget and "columns" in definition:
-                        element_size = definition.get("element_size", 1)
-                        definition_scale = definition.get("scale", 1.0)
-                        definition_offsets = definition.get("offset", []) 
-
-                        for col_idx, _ in enumerate(definition["columns"]):
-                            start_byte = col_idx * element_size
-                            end_byte = start_byte + element_size
-                            
-                            if end_byte <= len(raw_bytes):
-                                element_bytes = raw_bytes[start_byte : end_byte]
-                                # Corrected: Reverting to byteorder='big' as per global format
-                                element_int_val = int.from_bytes(element_bytes, byteorder='big', signed=False) 
-
-                                current_offset = 0 
-                                if isinstance(definition_offsets, list) and col_idx < len(definition_offsets):
-                                    current_offset = definition_offsets[col_idx]
-                                else:
-                                    print(f"Warning: Offset list too short or invalid for column {col_idx} in '{description}'. Using default 0 offset.")
-
-                                element_scaled_val = (element_int_val * definition_scale) + current_offset
-                                
-                                current_table_gauge_values.append(element_scaled_val)
-
-                                display_unit = definition.get("unit", "")
-                                display_string = ""
-                                if description == "Ignition Timing":
-                                    display_string = f"{-element_scaled_val:.1f}{display_unit}"
-                                else:
-                                    display_string = f"{element_scaled_val:.1f} {display_unit}"
-
-                                item = QTableWidgetItem(display_string)
-                                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                                table_display_widget.setItem(0, col_idx, item)
-                            else:
-                                table_display_widget.setItem(0, col_idx, QTableWidgetItem("N/A"))
-                                table_display_widget.item(0, col_idx).setFlags(table_display_widget.item(0, col_idx).flags() & ~Qt.ItemIsEditable)
-                                current_table_gauge_values.append("N/A") 
-                    
-                    table_gauge_obj = self.table_gauges.get(description)
-                    if table_gauge_obj:
-                        table_gauge_obj.set_value(current_table_gauge_values)
-
-                except Exception as e:
-                    print(f"Error updating table '{description}': {e}")
-                    if description in self.tables:
-                        table_display_widget = self.tables.get(description)
-                        for col_idx in range(len(definition["columns"])):
-                            item = QTableWidgetItem("ERROR")
-                            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                            table_display_widget.setItem(0, col_idx, item)
-                    table_gauge_obj = self.table_gauges.get(description)
-                    if table_gauge_obj:
-                        table_gauge_obj.set_value(["ERROR"] * len(definition["columns"]))
-
+                    for col_idx in range(len(definition["columns"])):
+                        item = QTableWidgetItem("ERROR")
+                        item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+                        table_display_widget.setItem(0, col_idx, item)
+                table_gauge_obj = self.table_gauges.get(description)
+                if table_gauge_obj:
+                    table_gauge_obj.set_value(["ERROR"] * len(definition["columns"]))
 
         # Update map table cursor (for 2D maptables)
         if self.current_maptable_widget and self.data_manager.is_connected():
             self.current_maptable_widget.update_cursor_position()
 
         # Log gauge data if logging is active
-        if self.is_logging and self.log_writer:
-            if not self.log_header_written:
-                log_header = ["Timestamp"]
-                for def_item in ECU_DEFINITIONS:
-                    if def_item.get("type") in ["gauge_bar", "gauge_chart"]:
-                        log_header.append(def_item["description"])
-                    elif def_item.get("type") == "table":
-                        for col_name in def_item["columns"]:
-                            log_header.append(f"{def_item['description']}_{re.sub(r'[^0-9]', '', col_name)}")
-                self.log_writer.writerow(log_header)
-                self.log_header_written = True
-
-            row_data = [time.time()]
-            for def_item in ECU_DEFINITIONS:
-                if def_item.get("type") in ["gauge_bar", "gauge_chart"]:
-                    value_to_log = gauge_values.get(f"{def_item['description']}_VALUE")
-                    if value_to_log is not None:
-                        row_data.append(f"{value_to_log:.2f}")
-                    else:
-                        row_data.append("N/A")
-                elif def_item.get("type") == "table":
-                    table_gauge_obj = self.table_gauges.get(def_item["description"])
-                    if table_gauge_obj and table_gauge_obj._values:
-                        for value_to_log in table_gauge_obj._values:
-                            if isinstance(value_to_log, (int, float)):
-                                if def_item["description"] == "Ignition Timing":
-                                    row_data.append(f"{-value_to_log:.2f}")
-                                else:
-                                    row_data.append(f"{value_to_log:.2f}")
-                            else:
-                                row_data.append("N/A")
-                    else:
-                        for _ in def_item["columns"]:
-                            row_data.append("N/A")
-            self.log_writer.writerow(row_data)
+        if self.is_logging:
+            self.data_logger.write_sample(sample)
+
+        if self.trigger_capture is not None:
+            self.trigger_capture.process(sample)
+            capturing = self.trigger_capture.active_trigger
+            self.trigger_button.setText(f"Capturing: {capturing}" if capturing else "Triggers Armed")
 
     def closeEvent(self, event):
         print("Closing application...")
         if self.timer.isActive():
             self.timer.stop() 
 
+        # Abandon queued map loads and let any in-flight read finish before the bus is closed
+        for maptable_tab in self.ordered_maptable_tabs:
+            maptable_tab.cancel_refresh()
+        self.map_loader.wait_for_done(2000)
+        if self.burst is not None:
+            self.burst[0].stop()
+            QThreadPool.globalInstance().waitForDone(2000)
+
         # Stop logging and close file if active
         if self.is_logging:
             self._toggle_logging() # This will stop logging and close the file
+        if self.trigger_capture is not None:
+            self._toggle_triggers() # Keeps a capture in progress
 
         self.data_manager.shutdown()
         
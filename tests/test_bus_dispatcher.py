@@ -0,0 +1,127 @@
+# tests/test_bus_dispatcher.py
+
+# Response correlation in lib.bus_dispatcher against a fake ECU that answers word reads with the address it was
+# asked for, and can drop or delay chosen answers. Run with: python -m unittest discover tests
+
+import queue
+import threading
+import time
+import unittest
+
+from lib.bus_dispatcher import BusDispatcher
+
+RESPONSE_ID = 0x7A0
+READ_ID = 0x50
+WRITE_ID = 0x60
+TIMEOUT_S = 0.2
+GRACE_S = 0.1
+
+
+class Frame:
+    def __init__(self, arbitration_id, data):
+        self.arbitration_id = arbitration_id
+        self.data = bytes(data)
+        self.dlc = len(self.data)
+
+
+class FakeEcuBus:
+    """
+    Answers each word read (READ_ID + 4-byte address) with the address itself, after an optional delay. Other
+    frames get no answer. Sent frames and answers are logged in order in events.
+    """
+    def __init__(self, drop=(), delay_s=None):
+        self.drop = set(drop)          # Addresses whose first answer is lost
+        self.delay_s = delay_s or {}   # Address -> seconds before its first answer is sent
+        self.events = []               # ("sent", arbitration ID) and ("answered", address)
+        self._received = queue.Queue()
+
+    def send(self, message):
+        self.events.append(("sent", message.arbitration_id))
+        if message.arbitration_id != READ_ID:
+            return
+        address = message.data[:4]
+        key = int.from_bytes(address, 'big')
+        if key in self.drop:
+            self.drop.discard(key)
+            return
+        delay = self.delay_s.pop(key, 0.0)
+        answer = Frame(RESPONSE_ID, address)
+        if delay:
+            threading.Timer(delay, self._answer, args=(answer,)).start()
+        else:
+            self._answer(answer)
+
+    def _answer(self, answer):
+        self.events.append(("answered", int.from_bytes(answer.data, 'big')))
+        self._received.put(answer)
+
+    def recv(self, timeout=None):
+        try:
+            return self._received.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class BusDispatcherTest(unittest.TestCase):
+    def _dispatcher(self, bus):
+        dispatcher = BusDispatcher(bus, RESPONSE_ID, ghost_grace_s=GRACE_S)
+        dispatcher.start()
+        self.addCleanup(dispatcher.close)
+        return dispatcher
+
+    def _read(self, dispatcher, address):
+        return dispatcher.request(Frame(READ_ID, address.to_bytes(4, 'big')), [4], f"read 0x{address:X}", timeout=TIMEOUT_S)
+
+    def test_dropped_answer_fails_only_its_own_read(self):
+        dispatcher = self._dispatcher(FakeEcuBus(drop={0x1000}))
+        with self.assertRaises(TimeoutError):
+            self._read(dispatcher, 0x1000)
+        for address in range(0x2000, 0x2005):
+            self.assertEqual(self._read(dispatcher, address), address.to_bytes(4, 'big'))
+        self.assertEqual(dispatcher.orphan_count, 0)
+
+    def test_late_answer_is_absorbed_by_its_ghost(self):
+        dispatcher = self._dispatcher(FakeEcuBus(delay_s={0x1000: TIMEOUT_S + GRACE_S / 2}))
+        with self.assertRaises(TimeoutError):
+            self._read(dispatcher, 0x1000)
+        self.assertEqual(self._read(dispatcher, 0x2000), (0x2000).to_bytes(4, 'big'))
+        self.assertEqual(dispatcher.orphan_count, 0)
+
+    def test_write_waits_for_the_outstanding_read(self):
+        bus = FakeEcuBus(delay_s={0x1000: TIMEOUT_S / 2})
+        dispatcher = self._dispatcher(bus)
+        reader = threading.Thread(target=self._read, args=(dispatcher, 0x1000))
+        reader.start()
+        while ("sent", READ_ID) not in bus.events:
+            time.sleep(0.001)
+        dispatcher.send(Frame(WRITE_ID, b"\x00\x00\x20\x00\x01"))
+        reader.join()
+        self.assertEqual(bus.events, [("sent", READ_ID), ("answered", 0x1000), ("sent", WRITE_ID)])
+
+    def test_concurrent_reads_with_a_dropped_answer_never_mix_up_data(self):
+        dispatcher = self._dispatcher(FakeEcuBus(drop={0x1111}))
+        results = {}
+
+        def reader(base):
+            for i in range(10):
+                address = base + i
+                try:
+                    results[address] = self._read(dispatcher, address)
+                except TimeoutError:
+                    results[address] = None
+
+        threads = [threading.Thread(target=reader, args=(base,)) for base in (0x1111, 0x2222, 0x3333)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        failed = [address for address, data in results.items() if data is None]
+        self.assertEqual(failed, [0x1111])
+        for address, data in results.items():
+            if data is not None:
+                self.assertEqual(data, address.to_bytes(4, 'big'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+# tests/test_write_transaction.py
+
+# Planning, overlay, readback verify and rollback in lib.write_transaction against a fake DataManager backed by a
+# bytearray, which can fail or corrupt chosen writes. Run with: python -m unittest discover tests
+
+import threading
+import unittest
+
+from lib.write_transaction import MERGE_GAP, WriteTransaction
+
+BASE = 0x1000
+SIZE = 0x100
+
+
+class FakeDataManager:
+    """The part of DataManager a WriteTransaction uses, over BASE..BASE + SIZE of memory."""
+    def __init__(self, fail_writes=(), corrupt_writes=()):
+        self.memory = bytearray(range(SIZE)) # Every byte differs from its neighbours, so bridged gaps show up
+        self.fail_writes = set(fail_writes)       # Addresses whose first write fails and changes nothing
+        self.corrupt_writes = set(corrupt_writes) # Addresses whose first write stores inverted bytes
+        self.writes = [] # (address, data) of every write that reached memory
+        self.flushes = 0
+        self._io_lock = threading.RLock()
+
+    def is_connected(self):
+        return True
+
+    def read_data(self, address, length):
+        return bytes(self.memory[address - BASE:address - BASE + length])
+
+    def write_data(self, address, data):
+        if address in self.fail_writes:
+            self.fail_writes.discard(address)
+            return False
+        if address in self.corrupt_writes:
+            self.corrupt_writes.discard(address)
+            data = bytes(b ^ 0xFF for b in data)
+        self.memory[address - BASE:address - BASE + len(data)] = data
+        self.writes.append((address, bytes(data)))
+        return True
+
+    def flush_map_cache(self):
+        self.flushes += 1
+
+
+class WriteTransactionTest(unittest.TestCase):
+    def test_plan_merges_regions_within_the_gap(self):
+        tx = WriteTransaction(FakeDataManager())
+        tx.stage(BASE + 0x40, b"\x01")
+        tx.stage(BASE, b"\x01\x02")
+        tx.stage(BASE + 2 + MERGE_GAP, b"\x03") # Gap of exactly MERGE_GAP bytes: bridged
+        tx.stage(BASE + 3 + 2 * MERGE_GAP + 1, b"\x04") # One byte further than the gap: a new region
+        self.assertEqual(tx.plan(), [
+            (BASE, 3 + MERGE_GAP),
+            (BASE + 3 + 2 * MERGE_GAP + 1, 1),
+            (BASE + 0x40, 1),
+        ])
+
+    def test_later_stage_wins_where_writes_overlap(self):
+        dm = FakeDataManager()
+        tx = WriteTransaction(dm)
+        tx.stage(BASE + 0x10, b"\xAA\xAA\xAA")
+        tx.stage(BASE + 0x11, b"\xBB")
+        self.assertTrue(tx.commit())
+        self.assertEqual(dm.memory[0x10:0x13], b"\xAA\xBB\xAA")
+
+    def test_writes_only_changed_bytes_and_bridges_gaps_from_memory(self):
+        dm = FakeDataManager()
+        tx = WriteTransaction(dm)
+        tx.stage(BASE + 0x20, bytes([0x20, 0x99])) # First byte unchanged
+        tx.stage(BASE + 0x24, bytes([0x98]))
+        self.assertTrue(tx.commit())
+        self.assertEqual(tx.written, [(BASE + 0x21, bytes([0x21, 0x22, 0x23, 0x24]), bytes([0x99, 0x22, 0x23, 0x98]))])
+        self.assertEqual(dm.writes, [(BASE + 0x21, bytes([0x99, 0x22, 0x23, 0x98]))])
+        self.assertEqual(dm.flushes, 1)
+
+    def test_unchanged_batch_writes_nothing(self):
+        dm = FakeDataManager()
+        tx = WriteTransaction(dm)
+        tx.stage(BASE + 0x30, bytes([0x30, 0x31]))
+        self.assertTrue(tx.commit())
+        self.assertEqual(tx.written, [])
+        self.assertEqual(dm.writes, [])
+
+    def test_failed_write_restores_the_pre_image(self):
+        dm = FakeDataManager(fail_writes={BASE + 0x80})
+        original = bytes(dm.memory)
+        tx = WriteTransaction(dm)
+        tx.stage(BASE + 0x10, b"\xEE\xEE")
+        tx.stage(BASE + 0x80, b"\xEE\xEE")
+        self.assertFalse(tx.commit())
+        self.assertIn("Write failed at 0x1080", tx.error)
+        self.assertTrue(tx.rolled_back)
+        self.assertFalse(tx.committed)
+        self.assertEqual(bytes(dm.memory), original)
+
+    def test_failed_verify_restores_the_pre_image(self):
+        dm = FakeDataManager(corrupt_writes={BASE + 0x80})
+        original = bytes(dm.memory)
+        tx = WriteTransaction(dm)
+        tx.stage(BASE + 0x10, b"\xEE\xEE")
+        tx.stage(BASE + 0x80, b"\xEE\xEE")
+        self.assertFalse(tx.commit())
+        self.assertIn("Verification failed at 0x1080", tx.error)
+        self.assertTrue(tx.rolled_back)
+        self.assertEqual(bytes(dm.memory), original)
+        self.assertEqual(dm.flushes, 1)
+
+    def test_incomplete_rollback_is_reported(self):
+        class RestoreFails(FakeDataManager):
+            def write_data(self, address, data):
+                if self.writes: # Every write after the first fails, including the restoring one
+                    return False
+                return super().write_data(address, data)
+
+        tx = WriteTransaction(RestoreFails(corrupt_writes={BASE + 0x10}))
+        tx.stage(BASE + 0x10, b"\xEE")
+        self.assertFalse(tx.commit())
+        self.assertFalse(tx.rolled_back)
+        self.assertTrue(tx.error.endswith("Rollback incomplete."))
+
+
+if __name__ == "__main__":
+    unittest.main()